@@ -0,0 +1,156 @@
+"""store sparse embeddings as packed term-id blobs
+
+Revision ID: 0005_packed_sparse_embeddings
+Revises: 0004_recommendation_outcomes
+Create Date: 2026-03-09
+"""
+
+import hashlib
+from typing import Sequence, Union
+
+import numpy as np
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0005_packed_sparse_embeddings"
+down_revision: Union[str, None] = "0004_recommendation_outcomes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+MAX_TERM_LENGTH = 128
+
+embedding_metadata = sa.table(
+    "embedding_metadata",
+    sa.column("id", sa.Integer()),
+    sa.column("payload", sa.JSON()),
+    sa.column("vector_blob", sa.LargeBinary()),
+)
+embedding_vocabulary = sa.table(
+    "embedding_vocabulary",
+    sa.column("id", sa.Integer()),
+    sa.column("term", sa.String()),
+)
+
+
+def _stored_term(term: str) -> str:
+    # Kept in step with src.rag.vocabulary.stored_term, inlined so later code changes
+    # cannot alter what this migration writes.
+    if len(term) <= MAX_TERM_LENGTH:
+        return term
+    digest = hashlib.sha256(term.encode("utf-8")).hexdigest()[:16]
+    return f"{term[: MAX_TERM_LENGTH - len(digest) - 1]}#{digest}"
+
+
+def _register_terms(bind, terms: set[str], term_ids: dict[str, int]) -> None:
+    # Ids come from the database: explicit ids would not advance the Postgres sequence
+    # and the next insert by the application would collide with them.
+    new_terms = sorted(term for term in terms if term not in term_ids)
+    if not new_terms:
+        return
+    keys = {_stored_term(term): term for term in new_terms}
+    bind.execute(embedding_vocabulary.insert(), [{"term": key} for key in keys])
+    stored = list(keys)
+    for start in range(0, len(stored), BATCH_SIZE):
+        rows = bind.execute(
+            sa.select(embedding_vocabulary.c.id, embedding_vocabulary.c.term).where(
+                embedding_vocabulary.c.term.in_(stored[start : start + BATCH_SIZE])
+            )
+        ).all()
+        term_ids.update({keys[row.term]: row.id for row in rows})
+
+
+def _iter_batches(bind, *columns):
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(embedding_metadata.c.id, *columns)
+            .where(embedding_metadata.c.id > last_id)
+            .order_by(embedding_metadata.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.create_table(
+        "embedding_vocabulary",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("term", sa.String(length=128), nullable=False, unique=True),
+    )
+    op.add_column("embedding_metadata", sa.Column("vector_blob", sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    term_ids: dict[str, int] = {}
+    for rows in _iter_batches(bind, embedding_metadata.c.payload):
+        embeddings: list[tuple[int, dict, dict]] = []
+        for row in rows:
+            payload = dict(row.payload or {})
+            embedding = payload.pop("embedding", None)
+            if not isinstance(embedding, dict):
+                continue
+            weights = {
+                term: float(weight)
+                for term, weight in embedding.items()
+                if isinstance(term, str) and isinstance(weight, int | float)
+            }
+            embeddings.append((row.id, payload, weights))
+        _register_terms(
+            bind, {term for _, _, weights in embeddings for term in weights}, term_ids
+        )
+        updates: list[dict] = []
+        for row_id, payload, weights in embeddings:
+            pairs = sorted((term_ids[term], weight) for term, weight in weights.items())
+            ids = np.array([p[0] for p in pairs], dtype="<i4")
+            values = np.array([p[1] for p in pairs], dtype="<f4")
+            updates.append(
+                {
+                    "row_id": row_id,
+                    "new_payload": payload,
+                    "blob": ids.tobytes() + values.tobytes(),
+                }
+            )
+        if updates:
+            bind.execute(
+                embedding_metadata.update()
+                .where(embedding_metadata.c.id == sa.bindparam("row_id"))
+                .values(
+                    payload=sa.bindparam("new_payload"), vector_blob=sa.bindparam("blob")
+                ),
+                updates,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    terms = dict(
+        bind.execute(sa.select(embedding_vocabulary.c.id, embedding_vocabulary.c.term)).all()
+    )
+    blob_columns = (embedding_metadata.c.payload, embedding_metadata.c.vector_blob)
+    for rows in _iter_batches(bind, *blob_columns):
+        updates: list[dict] = []
+        for row in rows:
+            if row.vector_blob is None:
+                continue
+            size = len(row.vector_blob) // 8
+            ids = np.frombuffer(row.vector_blob, dtype="<i4", count=size)
+            weights = np.frombuffer(row.vector_blob, dtype="<f4", count=size, offset=size * 4)
+            payload = dict(row.payload or {})
+            payload["embedding"] = {
+                terms[int(term_id)]: float(weight)
+                for term_id, weight in zip(ids, weights, strict=True)
+            }
+            updates.append({"row_id": row.id, "new_payload": payload})
+        if updates:
+            bind.execute(
+                embedding_metadata.update()
+                .where(embedding_metadata.c.id == sa.bindparam("row_id"))
+                .values(payload=sa.bindparam("new_payload")),
+                updates,
+            )
+    with op.batch_alter_table("embedding_metadata") as batch_op:
+        batch_op.drop_column("vector_blob")
+    op.drop_table("embedding_vocabulary")
@@ -0,0 +1,31 @@
+"""add corpus generation counter
+
+Revision ID: 0006_corpus_generation
+Revises: 0005_packed_sparse_embeddings
+Create Date: 2026-03-10
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0006_corpus_generation"
+down_revision: Union[str, None] = "0005_packed_sparse_embeddings"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        "corpus_generation",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("generation", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.bulk_insert(table, [{"id": 1, "generation": 0, "updated_at": datetime.utcnow()}])
+
+
+def downgrade() -> None:
+    op.drop_table("corpus_generation")
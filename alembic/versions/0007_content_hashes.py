@@ -0,0 +1,136 @@
+"""add content hashes and simhash fingerprints for ingestion dedup
+
+Revision ID: 0007_content_hashes
+Revises: 0006_corpus_generation
+Create Date: 2026-03-12
+"""
+
+import hashlib
+import re
+import unicodedata
+from datetime import UTC
+from typing import Sequence, Union
+
+import numpy as np
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0007_content_hashes"
+down_revision: Union[str, None] = "0006_corpus_generation"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+documents = sa.table(
+    "documents",
+    sa.column("id", sa.Integer()),
+    sa.column("content", sa.Text()),
+    sa.column("ticker", sa.String()),
+    sa.column("source", sa.String()),
+    sa.column("published_at", sa.DateTime()),
+    sa.column("content_hash", sa.String()),
+    sa.column("simhash", sa.BigInteger()),
+)
+document_chunks = sa.table(
+    "document_chunks",
+    sa.column("id", sa.Integer()),
+    sa.column("content", sa.Text()),
+    sa.column("ticker", sa.String()),
+    sa.column("source", sa.String()),
+    sa.column("content_hash", sa.String()),
+)
+
+# Frozen copies of src.data_ingestion.dedup as of this revision, so later changes to
+# the application's hashing never alter what this migration writes.
+_WORD = re.compile(r"\w+")
+
+
+def _normalize(text):
+    return " ".join(_WORD.findall(unicodedata.normalize("NFKC", text).casefold()))
+
+
+def _scope(ticker, source, published_at=None):
+    day = ""
+    if published_at is not None:
+        if published_at.tzinfo is not None:
+            published_at = published_at.astimezone(UTC)
+        day = published_at.date().isoformat()
+    return "\x1f".join([ticker or "", source, day])
+
+
+def _content_hash(text, scope):
+    return hashlib.sha256(f"{scope}\x1e{_normalize(text)}".encode()).hexdigest()
+
+
+def _simhash(text, shingle=2):
+    words = _normalize(text).split()
+    shingles = [
+        " ".join(words[i : i + shingle]) for i in range(max(1, len(words) - shingle + 1))
+    ]
+    digests = b"".join(
+        hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest() for item in shingles
+    )
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = (2 * bits.astype(np.int32) - 1).sum(axis=0)
+    value = int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _document_values(row):
+    scope = _scope(row.ticker, row.source, row.published_at)
+    return {"content_hash": _content_hash(row.content, scope), "simhash": _simhash(row.content)}
+
+
+def _chunk_values(row):
+    return {"content_hash": _content_hash(row.content, _scope(row.ticker, row.source))}
+
+
+def _backfill(bind, table, columns, values) -> None:
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, *[table.c[name] for name in columns])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam("row_id"))
+            .values({name: sa.bindparam(f"new_{name}") for name in values(rows[0])}),
+            [
+                {"row_id": row.id, **{f"new_{k}": v for k, v in values(row).items()}}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.add_column("documents", sa.Column("simhash", sa.BigInteger(), nullable=True))
+    op.add_column(
+        "document_chunks", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+
+    bind = op.get_bind()
+    _backfill(
+        bind, documents, ["content", "ticker", "source", "published_at"], _document_values
+    )
+    _backfill(bind, document_chunks, ["content", "ticker", "source"], _chunk_values)
+
+    op.create_index("ix_documents_content_hash", "documents", ["content_hash"])
+    op.create_index("ix_document_chunks_content_hash", "document_chunks", ["content_hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_document_chunks_content_hash", table_name="document_chunks")
+    op.drop_index("ix_documents_content_hash", table_name="documents")
+    with op.batch_alter_table("document_chunks") as batch_op:
+        batch_op.drop_column("content_hash")
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_column("simhash")
+        batch_op.drop_column("content_hash")
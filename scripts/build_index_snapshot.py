@@ -0,0 +1,31 @@
+"""Index every chunk and write the BM25 / sparse-matrix snapshot loaded at API boot.
+
+Workers started afterwards load the snapshot and only replay chunks ingested since.
+Requires INDEX_SNAPSHOT_PATH (or --path).
+
+    INDEX_SNAPSHOT_PATH=data/processed/index_snapshot.bin \\
+        PYTHONPATH=. python scripts/build_index_snapshot.py
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from src.common.db import SessionLocal
+from src.common.settings import get_settings
+from src.rag.snapshot import save_index_snapshot
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default=get_settings().index_snapshot_path)
+    args = parser.parse_args()
+    if not args.path:
+        raise SystemExit("INDEX_SNAPSHOT_PATH is not set")
+    with SessionLocal() as session:
+        size = save_index_snapshot(session, args.path)
+    print(f"wrote {size} bytes to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
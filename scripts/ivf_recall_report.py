@@ -0,0 +1,85 @@
+"""Recall@k versus latency of the IVF index against exhaustive dense search.
+
+With --pq-subvectors, also reports product-quantization recall per code size, with
+and without full-precision reranking.
+
+Uses the chunks in the configured database, or a synthetic corpus with --synthetic.
+Queries are sampled chunk vectors with a little Gaussian noise added.
+
+    PYTHONPATH=. python scripts/ivf_recall_report.py --top-k 10 --nprobe 1 4 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import asdict
+
+import numpy as np
+
+from src.common.db import SessionLocal
+from src.rag.ann_benchmark import benchmark_ivf, benchmark_pq
+from src.rag.dense_index import get_dense_index, get_dense_provider
+
+
+def _synthetic_texts(rows: int, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    # Zipf-like term frequencies give the skewed clusters real corpora have.
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    return [" ".join(rng.choice(vocabulary, size=40, p=weights)) for _ in range(rows)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--pq-subvectors", type=int, nargs="*", default=[])
+    parser.add_argument("--pq-rerank", type=int, nargs="+", default=[0, 100])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, default=0, help="rows of synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    provider = get_dense_provider()
+    if args.synthetic:
+        texts = _synthetic_texts(args.synthetic, args.seed)
+        vectors = provider.embed_many(texts)
+    else:
+        with SessionLocal() as session:
+            dense = get_dense_index(session)
+            vectors = dense.vectors.copy()
+        if not vectors.shape[0]:
+            raise SystemExit("no chunks in the database; ingest documents or pass --synthetic")
+
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(vectors.shape[0], min(args.queries, vectors.shape[0]), replace=False)
+    queries = vectors[sample] + rng.normal(0, 0.05, size=(sample.shape[0], vectors.shape[1]))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    summary = benchmark_ivf(
+        vectors,
+        queries.astype(np.float32),
+        top_k=args.top_k,
+        nprobes=tuple(args.nprobe),
+        n_lists=args.n_lists,
+    )
+    report = asdict(summary)
+    if args.pq_subvectors:
+        report["pq"] = [
+            asdict(point)
+            for point in benchmark_pq(
+                vectors,
+                queries.astype(np.float32),
+                top_k=args.top_k,
+                subvectors=tuple(args.pq_subvectors),
+                reranks=tuple(args.pq_rerank),
+            )
+        ]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
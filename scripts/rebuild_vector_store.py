@@ -0,0 +1,33 @@
+"""Re-embed every chunk and publish it as a new vector-store version.
+
+Workers pick the new version up on their next dense query. Requires VECTOR_STORE_DIR.
+
+    VECTOR_STORE_DIR=data/processed/vector_store PYTHONPATH=. python scripts/rebuild_vector_store.py
+"""
+
+from __future__ import annotations
+
+from src.common.db import SessionLocal
+from src.rag.dense_index import DenseVectorIndex, get_dense_provider, get_vector_store
+
+
+def main() -> None:
+    store = get_vector_store()
+    if store is None:
+        raise SystemExit("VECTOR_STORE_DIR is not set")
+    provider = get_dense_provider()
+    index = DenseVectorIndex(provider)
+    with SessionLocal() as session:
+        index.refresh(session)
+    version = store.publish(
+        index.chunk_ids,
+        index.vectors,
+        index.attributes,
+        model_name=provider.model_name,
+        high_water_mark=index.high_water_mark,
+    )
+    print(f"published {version} ({len(index)} chunks) to {store.root}")
+
+
+if __name__ == "__main__":
+    main()
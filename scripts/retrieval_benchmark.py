@@ -0,0 +1,113 @@
+"""QPS, latency, peak RSS and recall@k of each retrieval provider on a synthetic corpus.
+
+Generates a seeded finance corpus of --chunks chunks into its own sqlite database under
+data/benchmarks (reused by later runs with the same size and seed), loads it through
+the ingestion pipeline and measures every provider in a fresh process against the
+exhaustive ranking of its scoring family. Dense providers are measured once per
+--embedding-providers entry. Results are written as JSON under data/benchmarks,
+named after the time and commit, so runs can be compared across commits.
+
+    PYTHONPATH=. python scripts/retrieval_benchmark.py --chunks 10000 --queries 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+from dataclasses import asdict
+from datetime import UTC, datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+OUTPUT_DIR = ROOT / "data" / "benchmarks"
+PROVIDERS = ["sparse-local", "segmented", "bm25", "sharded", "dense", "lsm", "pq", "ivf"]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--providers", nargs="+", default=PROVIDERS)
+    parser.add_argument("--embedding-providers", nargs="+", default=None)
+    parser.add_argument("--batch-size", type=int, default=500, help="documents per ingest")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    corpus_db = OUTPUT_DIR / f"corpus-{args.chunks}-s{args.seed}.sqlite3"
+    corpus_marker = corpus_db.with_suffix(".json")
+    # src.common.db binds its engine at import, so these must be set first; the
+    # provider processes inherit them.
+    os.environ["DATABASE_URL"] = f"sqlite:///{corpus_db}"
+    os.environ["INGEST_DEDUP"] = "off"
+    os.environ["RETRIEVAL_CACHE_MAX_ENTRIES"] = "0"
+
+    from src.common.bootstrap import bootstrap_database
+    from src.common.db import SessionLocal
+    from src.common.settings import get_settings
+    from src.rag.retrieval_benchmark import (
+        benchmark_providers,
+        load_synthetic_corpus,
+        synthetic_queries,
+    )
+
+    if corpus_marker.exists():
+        corpus = json.loads(corpus_marker.read_text(encoding="utf-8"))
+    else:
+        # A half-loaded corpus from an interrupted run is rebuilt from scratch.
+        corpus_db.unlink(missing_ok=True)
+        bootstrap_database()
+        with SessionLocal() as session:
+            load = load_synthetic_corpus(
+                session, args.chunks, seed=args.seed, batch_size=args.batch_size
+            )
+        corpus = {"database": corpus_db.name, "seed": args.seed, **asdict(load)}
+        corpus_marker.write_text(json.dumps(corpus, indent=2), encoding="utf-8")
+
+    settings = get_settings()
+    embedding_providers = args.embedding_providers or [settings.dense_embedding_provider]
+    queries = synthetic_queries(args.queries, args.seed)
+    points = benchmark_providers(
+        args.providers, embedding_providers, queries, top_k=args.top_k
+    )
+    commit = _git_commit()
+    now = datetime.now(UTC)
+    report = {
+        "commit": commit,
+        "created_at": now.isoformat(timespec="seconds"),
+        "corpus": corpus,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "settings": {
+            "embedding_provider": settings.embedding_provider,
+            "dense_embedding_dim": settings.dense_embedding_dim,
+            "cpu_count": os.cpu_count(),
+        },
+        "points": [point if isinstance(point, dict) else asdict(point) for point in points],
+    }
+    stamp = now.strftime("%Y%m%dT%H%M%SZ")
+    output = args.output or OUTPUT_DIR / f"retrieval-{args.chunks}-{stamp}-{commit}.json"
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
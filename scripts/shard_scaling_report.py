@@ -0,0 +1,96 @@
+"""Query throughput of the sharded BM25 index per shard count on a synthetic corpus.
+
+Queries are issued from --clients threads at once, half of them ticker-filtered, and
+compared against the single-process InvertedIndex. Scaling is bounded by CPU count.
+
+    PYTHONPATH=. python scripts/shard_scaling_report.py --shards 1 2 4 8 --rows 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
+
+from src.rag.filters import RetrievalFilters
+from src.rag.inverted_index import InvertedIndex
+from src.rag.sharded_index import ShardedIndex
+
+TICKERS = [f"T{i:03d}" for i in range(200)]
+
+
+def _corpus(rows: int, seed: int) -> list[tuple]:
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    return [
+        (f"chunk-{i}", " ".join(rng.choice(vocabulary, size=60, p=weights)),
+         TICKERS[i % len(TICKERS)], "synthetic", None)
+        for i in range(rows)
+    ]
+
+
+def _queries(count: int, seed: int) -> list[tuple[str, RetrievalFilters]]:
+    rng = np.random.default_rng(seed + 1)
+    return [
+        (
+            " ".join(f"term{t}" for t in rng.integers(0, 300, size=4)),
+            RetrievalFilters(ticker=TICKERS[i % len(TICKERS)] if i % 2 else None),
+        )
+        for i in range(count)
+    ]
+
+
+def _throughput(search, queries, clients: int, top_k: int) -> float:
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(lambda item: search(item[0], item[1], top_k), queries))
+    return round(len(queries) / (perf_counter() - started), 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = _corpus(args.rows, args.seed)
+    queries = _queries(args.queries, args.seed)
+
+    single = InvertedIndex()
+    for chunk_id, content, ticker, source, published_at in rows:
+        single.add(chunk_id, content, ticker=ticker, source=source, published_at=published_at)
+    report = {
+        "rows": args.rows,
+        "queries": args.queries,
+        "clients": args.clients,
+        "single_process_qps": _throughput(
+            lambda q, f, k: single.search(q, top_k=k, filters=f), queries, args.clients, args.top_k
+        ),
+        "sharded_qps": {},
+    }
+    for shards in args.shards:
+        index = ShardedIndex(shards)
+        try:
+            index.add_rows(rows)
+            report["sharded_qps"][shards] = _throughput(
+                lambda q, f, k, index=index: index.search_many([q], top_ks=[k], filters=f),
+                queries,
+                args.clients,
+                args.top_k,
+            )
+        finally:
+            index.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Tokens per second of the shared tokenizer versus the per-module regex it replaced.
+
+Runs over a synthetic corpus (or the chunks in the configured database with --database)
+and over short repeated queries, which hit the tokenizer's LRU cache. `interned` also maps
+every token to its interned integer id, as lexical retrieval scoring does.
+
+    PYTHONPATH=. python scripts/tokenizer_benchmark.py --documents 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from time import perf_counter
+
+import numpy as np
+from sqlalchemy import select
+
+from src.common.db import SessionLocal
+from src.core.models import DocumentChunk
+from src.rag.tokenizer import Tokenizer
+
+_LEGACY = re.compile(r"[a-zA-Z0-9]{3,}")
+
+
+def _synthetic_texts(rows: int, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    words = [f"term{i}" for i in range(5000)] + ["AAPL", "Q3", "revenue", "guidance", "a"]
+    return [" ".join(rng.choice(words, size=120)) + "." for _ in range(rows)]
+
+
+def _rate(tokens: int, seconds: float) -> float:
+    return round(tokens / seconds, 1) if seconds > 0 else 0.0
+
+
+def _time(fn, repeats: int) -> tuple[int, float]:
+    best = float("inf")
+    tokens = 0
+    for _ in range(repeats):
+        started = perf_counter()
+        tokens = fn()
+        best = min(best, perf_counter() - started)
+    return tokens, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--database", action="store_true", help="use stored chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.database:
+        with SessionLocal() as session:
+            texts = list(session.scalars(select(DocumentChunk.content)))
+        if not texts:
+            raise SystemExit("no chunks in the database; ingest documents first")
+    else:
+        texts = _synthetic_texts(args.documents, args.seed)
+    queries = [f"what did {texts[i % len(texts)][:40]} say" for i in range(50)]
+    queries = [queries[i % len(queries)] for i in range(args.queries)]
+
+    tokenizer = Tokenizer()
+    results = {}
+    for name, corpus in (("documents", texts), ("queries", queries)):
+        legacy_tokens, legacy_seconds = _time(
+            lambda corpus=corpus: sum(len(_LEGACY.findall(text.lower())) for text in corpus),
+            args.repeats,
+        )
+        shared_tokens, shared_seconds = _time(
+            lambda corpus=corpus: sum(len(terms) for terms in tokenizer.tokenize_many(corpus)),
+            args.repeats,
+        )
+        interned_tokens, interned_seconds = _time(
+            lambda corpus=corpus: sum(ids.size for ids in tokenizer.term_ids_many(corpus)),
+            args.repeats,
+        )
+        results[name] = {
+            "texts": len(corpus),
+            "legacy_tokens_per_second": _rate(legacy_tokens, legacy_seconds),
+            "tokens_per_second": _rate(shared_tokens, shared_seconds),
+            "speedup": round(legacy_seconds / shared_seconds, 2) if shared_seconds else None,
+            "interned_tokens_per_second": _rate(interned_tokens, interned_seconds),
+        }
+    info = tokenizer.cache_info()
+    results["cache"] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    results["vocabulary"] = {"terms": tokenizer.vocabulary_size, "resets": tokenizer.resets}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,29 @@
 from __future__ import annotations
 
+import json
 import subprocess
+from collections.abc import Iterator
 from contextlib import asynccontextmanager
 from datetime import UTC, datetime
 from typing import Annotated
 
-from fastapi import Depends, FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import desc, select, text
 from sqlalchemy.orm import Session
 
 from src.common.bootstrap import bootstrap_database
-from src.common.db import get_db_session
+from src.common.db import SessionLocal, get_db_session
 from src.common.errors import ErrorResponse
+from src.common.llm_gateway import close_llm_gateways
 from src.common.logging import configure_logging, get_correlation_id, get_logger, set_correlation_id
-from src.common.observability import MetricsMiddleware, metrics_response, setup_tracing
+from src.common.observability import (
+    MetricsMiddleware,
+    StageTimer,
+    metrics_response,
+    setup_tracing,
+)
 from src.common.settings import get_settings
 from src.core.models import MarketPriceSnapshot
 from src.core.recommendation_outcomes import OutcomeInput, record_outcome, summarize_outcomes
@@ -23,8 +31,20 @@ from src.data_ingestion.pipelines.document_ingestion import ingest_documents
 from src.data_ingestion.pipelines.jobs import run_market_snapshot_job
 from src.data_ingestion.schemas import IngestDocumentInput
 from src.rag.chunking_benchmark import ChunkingBenchmarkCase, benchmark_chunkers
-from src.rag.evaluation import QaEvalCase, evaluate_qa_cases
-from src.rag.qa import answer_question
+from src.rag.evaluation import LatencyPercentiles, QaEvalCase, evaluate_qa_cases
+from src.rag.ivf_index import close_ivf_index
+from src.rag.qa import (
+    Citation,
+    QaQuery,
+    QaResult,
+    QaStreamEvent,
+    answer_question,
+    answer_questions,
+    stream_from_retrieved,
+)
+from src.rag.retrieval import retrieve_chunks
+from src.rag.sharded_index import close_sharded_index
+from src.rag.snapshot import SnapshotError, load_index_snapshot
 from src.signals import compute_daily_sentiment_signals
 
 settings = get_settings()
@@ -33,11 +53,26 @@ setup_tracing(settings.app_name)
 logger = get_logger("api")
 
 
+def _warm_start_indexes(path: str) -> None:
+    try:
+        with SessionLocal() as session:
+            counts = load_index_snapshot(session, path)
+    except SnapshotError as exc:
+        logger.warning("index_snapshot_skipped", path=path, reason=str(exc))
+        return
+    logger.info("index_snapshot_loaded", path=path, **counts)
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     bootstrap_database()
+    if settings.index_snapshot_path:
+        _warm_start_indexes(settings.index_snapshot_path)
     logger.info("app_start", app_name=settings.app_name, env=settings.app_env)
     yield
+    close_llm_gateways()
+    close_sharded_index()
+    close_ivf_index()
     logger.info("app_stop", app_name=settings.app_name, env=settings.app_env)
 
 
@@ -52,6 +87,9 @@ class IngestRequest(BaseModel):
 class IngestResponse(BaseModel):
     documents_ingested: int
     chunks_ingested: int
+    duplicate_documents: int = 0
+    near_duplicate_documents: int = 0
+    duplicate_chunks: int = 0
 
 
 class QaRequest(BaseModel):
@@ -61,6 +99,8 @@ class QaRequest(BaseModel):
     source: str | None = None
     date_from: datetime | None = None
     date_to: datetime | None = None
+    exhaustive: bool | None = None
+    debug: bool = False
 
 
 class QaCitation(BaseModel):
@@ -78,6 +118,19 @@ class QaResponse(BaseModel):
     confidence: float
     answer_provider: str
     citations: list[QaCitation]
+    scanned_rows: int | None = None
+    cached: bool = False
+    latency_ms: float | None = None
+    prompt_tokens: int | None = None
+    debug_timings: dict[str, float] | None = None
+
+
+class QaBatchRequest(BaseModel):
+    items: list[QaRequest] = Field(min_length=1, max_length=500)
+
+
+class QaBatchResponse(BaseModel):
+    results: list[QaResponse]
 
 
 class QaEvalCaseRequest(BaseModel):
@@ -93,6 +146,7 @@ class QaEvalCaseRequest(BaseModel):
 
 class QaEvalRequest(BaseModel):
     cases: list[QaEvalCaseRequest] = Field(min_length=1)
+    parallelism: int | None = Field(default=None, ge=1, le=64)
 
 
 class QaEvalCaseResponse(BaseModel):
@@ -101,6 +155,14 @@ class QaEvalCaseResponse(BaseModel):
     citation_count: int
     passed: bool
     reasons: list[str]
+    retrieval_ms: float
+    generation_ms: float
+
+
+class LatencyPercentilesResponse(BaseModel):
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
 
 
 class QaEvalResponse(BaseModel):
@@ -108,6 +170,8 @@ class QaEvalResponse(BaseModel):
     pass_rate: float
     citation_coverage: float
     avg_confidence: float
+    retrieval_latency: LatencyPercentilesResponse
+    generation_latency: LatencyPercentilesResponse
     cases: list[QaEvalCaseResponse]
 
 
@@ -253,15 +317,46 @@ async def ingest_documents_route(
 ) -> IngestResponse:
     summary = ingest_documents(session, payload.documents)
     return IngestResponse(
-        documents_ingested=summary.documents_ingested, chunks_ingested=summary.chunks_ingested
+        documents_ingested=summary.documents_ingested,
+        chunks_ingested=summary.chunks_ingested,
+        duplicate_documents=summary.duplicate_documents,
+        near_duplicate_documents=summary.near_duplicate_documents,
+        duplicate_chunks=summary.duplicate_chunks,
     )
 
 
 @app.post("/qa", response_model=QaResponse)
 async def qa_route(
-    payload: QaRequest, session: Annotated[Session, Depends(get_db_session)]
+    payload: QaRequest, response: Response, session: Annotated[Session, Depends(get_db_session)]
 ) -> QaResponse:
-    result = answer_question(
+    with StageTimer() as timer:
+        result = answer_question(
+            session,
+            payload.question,
+            top_k=payload.top_k,
+            ticker=payload.ticker,
+            source=payload.source,
+            date_from=payload.date_from,
+            date_to=payload.date_to,
+            exhaustive=payload.exhaustive,
+        )
+    response.headers["Server-Timing"] = timer.server_timing()
+    body = _qa_response(result)
+    if payload.debug:
+        body.debug_timings = timer.milliseconds()
+    return body
+
+
+@app.post("/qa/stream")
+async def qa_stream_route(
+    payload: QaRequest, session: Annotated[Session, Depends(get_db_session)]
+) -> StreamingResponse:
+    if payload.debug:
+        # Stage timings are only complete once generation ends, after the headers are sent.
+        raise HTTPException(status_code=422, detail="debug is not supported on /qa/stream")
+    # Retrieval finishes before the response starts, so the stream never needs the
+    # request's database session.
+    retrieved = retrieve_chunks(
         session,
         payload.question,
         top_k=payload.top_k,
@@ -269,23 +364,79 @@ async def qa_route(
         source=payload.source,
         date_from=payload.date_from,
         date_to=payload.date_to,
+        exhaustive=payload.exhaustive,
+    )
+    return StreamingResponse(
+        _sse_events(stream_from_retrieved(payload.question, retrieved)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+def _sse_events(events: Iterator[QaStreamEvent]) -> Iterator[str]:
+    for item in events:
+        if item.event == "citations":
+            data = [_qa_citation(c).model_dump(mode="json") for c in item.data]
+        else:
+            data = item.data
+        yield f"event: {item.event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/qa/batch", response_model=QaBatchResponse)
+def qa_batch_route(
+    payload: QaBatchRequest,
+    response: Response,
+    session: Annotated[Session, Depends(get_db_session)],
+) -> QaBatchResponse:
+    # A plain def runs in the threadpool: the batch blocks on retrieval and generation for
+    # its whole duration, which would otherwise stall the event loop.
+    with StageTimer() as timer:
+        results = answer_questions(
+            session,
+            [
+                QaQuery(
+                    question=item.question,
+                    top_k=item.top_k,
+                    ticker=item.ticker,
+                    source=item.source,
+                    date_from=item.date_from,
+                    date_to=item.date_to,
+                    exhaustive=item.exhaustive,
+                )
+                for item in payload.items
+            ],
+        )
+    response.headers["Server-Timing"] = timer.server_timing()
+    bodies = [_qa_response(result) for result in results]
+    for item, body in zip(payload.items, bodies, strict=True):
+        if item.debug:
+            # Retrieval and generation overlap across items, so timings cover the batch.
+            body.debug_timings = timer.milliseconds()
+    return QaBatchResponse(results=bodies)
+
+
+def _qa_response(result: QaResult) -> QaResponse:
     return QaResponse(
         answer=result.answer,
         confidence=result.confidence,
         answer_provider=result.answer_provider,
-        citations=[
-            QaCitation(
-                chunk_id=c.chunk_id,
-                document_id=c.document_id,
-                source=c.source,
-                ticker=c.ticker,
-                published_at=c.published_at,
-                excerpt=c.excerpt,
-                score=c.score,
-            )
-            for c in result.citations
-        ],
+        citations=[_qa_citation(c) for c in result.citations],
+        scanned_rows=result.scanned_rows,
+        cached=result.cached,
+        latency_ms=result.latency_ms,
+        prompt_tokens=result.prompt_tokens,
+    )
+
+
+def _qa_citation(citation: Citation) -> QaCitation:
+    return QaCitation(
+        chunk_id=citation.chunk_id,
+        document_id=citation.document_id,
+        source=citation.source,
+        ticker=citation.ticker,
+        published_at=citation.published_at,
+        excerpt=citation.excerpt,
+        score=citation.score,
     )
 
 
@@ -324,9 +475,11 @@ async def list_market_snapshots(
 
 
 @app.post("/qa/evaluate", response_model=QaEvalResponse)
-async def qa_evaluate_route(
+def qa_evaluate_route(
     payload: QaEvalRequest, session: Annotated[Session, Depends(get_db_session)]
 ) -> QaEvalResponse:
+    # A plain def runs in the threadpool, like /qa/batch: evaluation blocks until every
+    # case has been answered.
     summary = evaluate_qa_cases(
         session,
         [
@@ -342,12 +495,15 @@ async def qa_evaluate_route(
             )
             for case in payload.cases
         ],
+        parallelism=payload.parallelism,
     )
     return QaEvalResponse(
         total_cases=summary.total_cases,
         pass_rate=summary.pass_rate,
         citation_coverage=summary.citation_coverage,
         avg_confidence=summary.avg_confidence,
+        retrieval_latency=_latency_response(summary.retrieval_latency),
+        generation_latency=_latency_response(summary.generation_latency),
         cases=[
             QaEvalCaseResponse(
                 question=item.question,
@@ -355,12 +511,20 @@ async def qa_evaluate_route(
                 citation_count=item.citation_count,
                 passed=item.passed,
                 reasons=item.reasons,
+                retrieval_ms=item.retrieval_ms,
+                generation_ms=item.generation_ms,
             )
             for item in summary.cases
         ],
     )
 
 
+def _latency_response(latency: LatencyPercentiles) -> LatencyPercentilesResponse:
+    return LatencyPercentilesResponse(
+        p50_ms=latency.p50_ms, p95_ms=latency.p95_ms, p99_ms=latency.p99_ms
+    )
+
+
 @app.post("/signals/sentiment/compute", response_model=SentimentComputeResponse)
 async def compute_sentiment_route(
     payload: SentimentComputeRequest, session: Annotated[Session, Depends(get_db_session)]
@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+import httpx
+
+from src.common.observability import LLM_REQUEST_COUNTER
+from src.common.settings import get_settings
+
+# Statuses worth another attempt; other 4xx responses mean the request itself is wrong.
+_RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LlmGatewayError(RuntimeError):
+    pass
+
+
+class CircuitOpenError(LlmGatewayError):
+    """Raised without contacting the provider while the circuit breaker is open."""
+
+
+class GatewayBusyError(LlmGatewayError):
+    """Raised when no rate-limit token or concurrency slot frees up within the timeout."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second up to `burst`.
+
+    A non-positive `rate` disables the limit.
+    """
+
+    def __init__(
+        self, rate: float, burst: int, *, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _wait_seconds(self) -> float:
+        """Take a token if one is available, else return how long until one is."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self, timeout: float) -> bool:
+        if self.rate <= 0:
+            return True
+        deadline = self._clock() + timeout
+        while True:
+            wait = self._wait_seconds()
+            if wait == 0.0:
+                return True
+            if self._clock() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed.
+
+    After `failure_threshold` consecutive failures calls are rejected for
+    `reset_seconds`; then a single trial call is let through, and its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_seconds: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in _RETRYABLE_STATUSES
+    return isinstance(exc, httpx.TransportError)
+
+
+class LlmGateway:
+    """Shared client for one LLM provider endpoint.
+
+    Requests go through a pooled keep-alive `httpx.Client`, a token-bucket rate limit
+    and a concurrency cap. Connection errors, timeouts, 429 and 5xx responses are
+    retried with full-jitter exponential backoff; every failed attempt also counts
+    toward the circuit breaker, and once it opens calls fail immediately with
+    `CircuitOpenError` so callers can fall back without waiting on the provider.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        timeout_seconds: float = 20.0,
+        max_connections: int = 20,
+        max_concurrency: int = 8,
+        rate_per_second: float = 0.0,
+        burst: int = 20,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.25,
+        max_backoff_seconds: float = 4.0,
+        breaker_failures: int = 5,
+        breaker_reset_seconds: float = 30.0,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+        )
+
+    def close(self) -> None:
+        self._client.close()
+
+    @contextmanager
+    def _admitted(self, timeout: float) -> Iterator[None]:
+        """Hold a rate-limit token and a concurrency slot for one attempt."""
+        if self.breaker.state == "open":
+            self._reject()
+        if not self.bucket.acquire(timeout) or not self._slots.acquire(timeout=timeout):
+            LLM_REQUEST_COUNTER.labels("busy").inc()
+            raise GatewayBusyError(f"no capacity for {self.base_url} within {timeout}s")
+        try:
+            # Checked again with capacity in hand, so a half-open trial is never stranded.
+            if not self.breaker.allow():
+                self._reject()
+            yield
+        finally:
+            self._slots.release()
+
+    def _reject(self) -> None:
+        LLM_REQUEST_COUNTER.labels("rejected").inc()
+        raise CircuitOpenError(f"circuit open for {self.base_url}")
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> float | None:
+        """Record a failed attempt; return the backoff before retrying, or None to give up."""
+        if not _retryable(exc):
+            # The provider answered, so the breaker treats it as healthy.
+            self.breaker.record_success()
+            LLM_REQUEST_COUNTER.labels("error").inc()
+            return None
+        self.breaker.record_failure()
+        if attempt >= self.max_retries or self.breaker.state != "closed":
+            LLM_REQUEST_COUNTER.labels("error").inc()
+            return None
+        LLM_REQUEST_COUNTER.labels("retry").inc()
+        ceiling = min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+        delay = random.uniform(0.0, ceiling)
+        if isinstance(exc, httpx.HTTPStatusError):
+            retry_after = exc.response.headers.get("Retry-After", "")
+            if retry_after.replace(".", "", 1).isdigit():
+                delay = max(delay, min(self.max_backoff_seconds, float(retry_after)))
+        return delay
+
+    def _succeeded(self) -> None:
+        self.breaker.record_success()
+        LLM_REQUEST_COUNTER.labels("ok").inc()
+
+    def post_json(
+        self,
+        path: str,
+        payload: dict,
+        *,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> dict:
+        timeout = timeout or self.timeout_seconds
+        attempt = 0
+        while True:
+            with self._admitted(timeout):
+                try:
+                    response = self._client.post(
+                        path, json=payload, headers=headers, timeout=timeout
+                    )
+                    response.raise_for_status()
+                    body = response.json()
+                except Exception as exc:
+                    delay = self._retry_delay(exc, attempt)
+                    if delay is None:
+                        raise
+                else:
+                    self._succeeded()
+                    return body
+            time.sleep(delay)
+            attempt += 1
+
+    def stream_lines(
+        self,
+        path: str,
+        payload: dict,
+        *,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> Iterator[str]:
+        """Yield the response body line by line.
+
+        Attempts are only retried before the first line arrives; a stream that breaks
+        later raises to the caller, which has already consumed part of it.
+        """
+        timeout = timeout or self.timeout_seconds
+        attempt = 0
+        while True:
+            started = False
+            with self._admitted(timeout):
+                try:
+                    with self._client.stream(
+                        "POST", path, json=payload, headers=headers, timeout=timeout
+                    ) as response:
+                        response.raise_for_status()
+                        for line in response.iter_lines():
+                            started = True
+                            yield line
+                except GeneratorExit:
+                    # The caller stopped reading; the provider itself was responding.
+                    self._succeeded()
+                    raise
+                except Exception as exc:
+                    if started:
+                        if _retryable(exc):
+                            self.breaker.record_failure()
+                        else:
+                            self.breaker.record_success()
+                        LLM_REQUEST_COUNTER.labels("error").inc()
+                        raise
+                    delay = self._retry_delay(exc, attempt)
+                    if delay is None:
+                        raise
+                else:
+                    self._succeeded()
+                    return
+            time.sleep(delay)
+            attempt += 1
+
+
+_gateways: dict[str, tuple[tuple, LlmGateway]] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_llm_gateway(base_url: str) -> LlmGateway:
+    """Return the process-wide gateway for `base_url`, rebuilt when its settings change.
+
+    Callers for the same provider share one connection pool, rate limit and breaker;
+    per-call timeouts are passed to `post_json`/`stream_lines`.
+    """
+    settings = get_settings()
+    config = (
+        settings.llm_max_connections,
+        settings.llm_max_concurrency,
+        settings.llm_rate_per_second,
+        settings.llm_burst,
+        settings.llm_max_retries,
+        settings.llm_backoff_seconds,
+        settings.llm_breaker_failures,
+        settings.llm_breaker_reset_seconds,
+    )
+    key = base_url.rstrip("/")
+    with _gateways_lock:
+        current = _gateways.get(key)
+        if current is None or current[0] != config:
+            if current is not None:
+                current[1].close()
+            gateway = LlmGateway(
+                key,
+                max_connections=config[0],
+                max_concurrency=config[1],
+                rate_per_second=config[2],
+                burst=config[3],
+                max_retries=config[4],
+                backoff_seconds=config[5],
+                breaker_failures=config[6],
+                breaker_reset_seconds=config[7],
+            )
+            _gateways[key] = (config, gateway)
+        return _gateways[key][1]
+
+
+def close_llm_gateways() -> None:
+    with _gateways_lock:
+        for _, gateway in _gateways.values():
+            gateway.close()
+        _gateways.clear()
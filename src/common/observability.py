@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import contextvars
+import threading
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 
 from fastapi import Request, Response
 from opentelemetry import trace
@@ -18,6 +21,88 @@ JOB_COUNTER = Counter(
     "finance_lm_job_runs_total", "Total job runs", ["job", "status"]
 )
 JOB_DURATION = Histogram("finance_lm_job_duration_seconds", "Job execution duration", ["job"])
+RETRIEVAL_CACHE_COUNTER = Counter(
+    "finance_lm_retrieval_cache_total", "Retrieval cache lookups", ["cache", "result"]
+)
+RETRIEVAL_SEGMENT_COUNTER = Counter(
+    "finance_lm_retrieval_segments_total",
+    "Time segments considered by segmented retrieval",
+    ["outcome"],
+)
+
+RERANK_COUNTER = Counter(
+    "finance_lm_rerank_total",
+    "Second-stage rerank passes by whether the latency budget ran out",
+    ["outcome"],
+)
+LLM_REQUEST_COUNTER = Counter(
+    "finance_lm_llm_requests_total",
+    "LLM gateway calls and attempts by outcome (ok, retry, error, busy, rejected)",
+    ["outcome"],
+)
+STAGE_LATENCY = Histogram(
+    "finance_lm_stage_latency_seconds",
+    "Latency of individual QA and retrieval pipeline stages",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+_stage_timer_ctx: contextvars.ContextVar[StageTimer | None] = contextvars.ContextVar(
+    "stage_timer", default=None
+)
+
+
+class StageTimer:
+    """Collects per-stage durations for one request.
+
+    While active (`with StageTimer() as timer:`), every `time_stage` block in the same
+    context adds its duration here as well as to the stage histogram. Repeated stages,
+    such as the pages of a scan, accumulate.
+    """
+
+    def __init__(self) -> None:
+        self.durations: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._token: contextvars.Token | None = None
+
+    def __enter__(self) -> StageTimer:
+        self._token = _stage_timer_ctx.set(self)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._token is not None:
+            _stage_timer_ctx.reset(self._token)
+            self._token = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def milliseconds(self) -> dict[str, float]:
+        with self._lock:
+            return {stage: round(seconds * 1000.0, 3) for stage, seconds in self.durations.items()}
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value, one metric per stage in first-seen order."""
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.milliseconds().items())
+
+
+def current_stage_timer() -> StageTimer | None:
+    return _stage_timer_ctx.get()
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """Observe the block's duration under `stage`, and on the active `StageTimer`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage).observe(elapsed)
+        timer = _stage_timer_ctx.get()
+        if timer is not None:
+            timer.add(stage, elapsed)
 
 
 def setup_tracing(service_name: str) -> None:
@@ -29,7 +29,41 @@ class Settings(BaseSettings):
     qa_openai_timeout_seconds: int = Field(default=20, alias="QA_OPENAI_TIMEOUT_SECONDS")
     openai_api_key: str | None = Field(default=None, alias="OPENAI_API_KEY")
     embedding_provider: str = Field(default="sparse-local", alias="EMBEDDING_PROVIDER")
+    dense_embedding_provider: str = Field(default="hashed-dense", alias="DENSE_EMBEDDING_PROVIDER")
+    dense_embedding_dim: int = Field(default=256, alias="DENSE_EMBEDDING_DIM")
     retrieval_provider: str = Field(default="sparse-local", alias="RETRIEVAL_PROVIDER")
+    vector_store_dir: str = Field(default="", alias="VECTOR_STORE_DIR")
+    vector_store_publish_rows: int = Field(default=5000, alias="VECTOR_STORE_PUBLISH_ROWS")
+    lsm_dir: str = Field(default="", alias="LSM_DIR")
+    lsm_memtable_rows: int = Field(default=2000, alias="LSM_MEMTABLE_ROWS")
+    lsm_merge_factor: int = Field(default=4, alias="LSM_MERGE_FACTOR")
+    ivf_n_lists: int = Field(default=0, alias="IVF_N_LISTS")
+    ivf_nprobe: int = Field(default=8, alias="IVF_NPROBE")
+    ivf_index_path: str = Field(default="", alias="IVF_INDEX_PATH")
+    pq_subvectors: int = Field(default=64, alias="PQ_SUBVECTORS")
+    pq_rerank_candidates: int = Field(default=100, alias="PQ_RERANK_CANDIDATES")
+    pq_scratch_dir: str = Field(default="data/processed", alias="PQ_SCRATCH_DIR")
+    index_snapshot_path: str = Field(default="", alias="INDEX_SNAPSHOT_PATH")
+    rerank_candidates: int = Field(default=0, alias="RERANK_CANDIDATES")
+    rerank_budget_ms: float = Field(default=25.0, alias="RERANK_BUDGET_MS")
+    rerank_recency_half_life_days: float = Field(
+        default=30.0, alias="RERANK_RECENCY_HALF_LIFE_DAYS"
+    )
+    retrieval_cache_max_entries: int = Field(default=1024, alias="RETRIEVAL_CACHE_MAX_ENTRIES")
+    retrieval_cache_ttl_seconds: float = Field(
+        default=300.0, alias="RETRIEVAL_CACHE_TTL_SECONDS"
+    )
+    retrieval_exhaustive: bool = Field(default=False, alias="RETRIEVAL_EXHAUSTIVE")
+    retrieval_scan_batch_size: int = Field(default=1000, alias="RETRIEVAL_SCAN_BATCH_SIZE")
+    retrieval_shards: int = Field(default=2, alias="RETRIEVAL_SHARDS")
+    qa_context_token_budget: int = Field(default=1500, alias="QA_CONTEXT_TOKEN_BUDGET")
+    qa_batch_parallelism: int = Field(default=8, alias="QA_BATCH_PARALLELISM")
+    qa_eval_parallelism: int = Field(default=4, alias="QA_EVAL_PARALLELISM")
+    answer_cache_max_entries: int = Field(default=1024, alias="ANSWER_CACHE_MAX_ENTRIES")
+    answer_cache_similarity: float = Field(default=0.98, alias="ANSWER_CACHE_SIMILARITY")
+    answer_cache_path: str = Field(default="", alias="ANSWER_CACHE_PATH")
+    ingest_dedup: str = Field(default="exact", alias="INGEST_DEDUP")
+    ingest_near_duplicate_distance: int = Field(default=6, alias="INGEST_NEAR_DUPLICATE_DISTANCE")
     chunker_provider: str = Field(default="simple", alias="CHUNKER_PROVIDER")
     chunk_max_chars: int = Field(default=800, alias="CHUNK_MAX_CHARS")
     chunk_overlap_chars: int = Field(default=120, alias="CHUNK_OVERLAP_CHARS")
@@ -46,6 +80,14 @@ class Settings(BaseSettings):
     sentiment_openai_timeout_seconds: int = Field(
         default=20, alias="SENTIMENT_OPENAI_TIMEOUT_SECONDS"
     )
+    llm_max_connections: int = Field(default=20, alias="LLM_MAX_CONNECTIONS")
+    llm_max_concurrency: int = Field(default=8, alias="LLM_MAX_CONCURRENCY")
+    llm_rate_per_second: float = Field(default=10.0, alias="LLM_RATE_PER_SECOND")
+    llm_burst: int = Field(default=20, alias="LLM_BURST")
+    llm_max_retries: int = Field(default=2, alias="LLM_MAX_RETRIES")
+    llm_backoff_seconds: float = Field(default=0.25, alias="LLM_BACKOFF_SECONDS")
+    llm_breaker_failures: int = Field(default=5, alias="LLM_BREAKER_FAILURES")
+    llm_breaker_reset_seconds: float = Field(default=30.0, alias="LLM_BREAKER_RESET_SECONDS")
 
 
 def _load_yaml_profile(app_env: str) -> dict[str, Any]:
@@ -72,7 +114,37 @@ def get_settings() -> Settings:
         "QA_OPENAI_BASE_URL": yaml_cfg.get("qa_openai_base_url"),
         "QA_OPENAI_TIMEOUT_SECONDS": yaml_cfg.get("qa_openai_timeout_seconds"),
         "EMBEDDING_PROVIDER": yaml_cfg.get("embedding_provider"),
+        "DENSE_EMBEDDING_PROVIDER": yaml_cfg.get("dense_embedding_provider"),
+        "DENSE_EMBEDDING_DIM": yaml_cfg.get("dense_embedding_dim"),
         "RETRIEVAL_PROVIDER": yaml_cfg.get("retrieval_provider"),
+        "VECTOR_STORE_DIR": yaml_cfg.get("vector_store_dir"),
+        "VECTOR_STORE_PUBLISH_ROWS": yaml_cfg.get("vector_store_publish_rows"),
+        "LSM_DIR": yaml_cfg.get("lsm_dir"),
+        "LSM_MEMTABLE_ROWS": yaml_cfg.get("lsm_memtable_rows"),
+        "LSM_MERGE_FACTOR": yaml_cfg.get("lsm_merge_factor"),
+        "IVF_N_LISTS": yaml_cfg.get("ivf_n_lists"),
+        "IVF_NPROBE": yaml_cfg.get("ivf_nprobe"),
+        "IVF_INDEX_PATH": yaml_cfg.get("ivf_index_path"),
+        "PQ_SUBVECTORS": yaml_cfg.get("pq_subvectors"),
+        "PQ_RERANK_CANDIDATES": yaml_cfg.get("pq_rerank_candidates"),
+        "PQ_SCRATCH_DIR": yaml_cfg.get("pq_scratch_dir"),
+        "INDEX_SNAPSHOT_PATH": yaml_cfg.get("index_snapshot_path"),
+        "RERANK_CANDIDATES": yaml_cfg.get("rerank_candidates"),
+        "RERANK_BUDGET_MS": yaml_cfg.get("rerank_budget_ms"),
+        "RERANK_RECENCY_HALF_LIFE_DAYS": yaml_cfg.get("rerank_recency_half_life_days"),
+        "RETRIEVAL_CACHE_MAX_ENTRIES": yaml_cfg.get("retrieval_cache_max_entries"),
+        "RETRIEVAL_CACHE_TTL_SECONDS": yaml_cfg.get("retrieval_cache_ttl_seconds"),
+        "RETRIEVAL_EXHAUSTIVE": yaml_cfg.get("retrieval_exhaustive"),
+        "RETRIEVAL_SCAN_BATCH_SIZE": yaml_cfg.get("retrieval_scan_batch_size"),
+        "RETRIEVAL_SHARDS": yaml_cfg.get("retrieval_shards"),
+        "QA_CONTEXT_TOKEN_BUDGET": yaml_cfg.get("qa_context_token_budget"),
+        "QA_BATCH_PARALLELISM": yaml_cfg.get("qa_batch_parallelism"),
+        "QA_EVAL_PARALLELISM": yaml_cfg.get("qa_eval_parallelism"),
+        "ANSWER_CACHE_MAX_ENTRIES": yaml_cfg.get("answer_cache_max_entries"),
+        "ANSWER_CACHE_SIMILARITY": yaml_cfg.get("answer_cache_similarity"),
+        "ANSWER_CACHE_PATH": yaml_cfg.get("answer_cache_path"),
+        "INGEST_DEDUP": yaml_cfg.get("ingest_dedup"),
+        "INGEST_NEAR_DUPLICATE_DISTANCE": yaml_cfg.get("ingest_near_duplicate_distance"),
         "CHUNKER_PROVIDER": yaml_cfg.get("chunker_provider"),
         "CHUNK_MAX_CHARS": yaml_cfg.get("chunk_max_chars"),
         "CHUNK_OVERLAP_CHARS": yaml_cfg.get("chunk_overlap_chars"),
@@ -85,6 +157,14 @@ def get_settings() -> Settings:
         "SENTIMENT_OPENAI_MODEL": yaml_cfg.get("sentiment_openai_model"),
         "SENTIMENT_OPENAI_BASE_URL": yaml_cfg.get("sentiment_openai_base_url"),
         "SENTIMENT_OPENAI_TIMEOUT_SECONDS": yaml_cfg.get("sentiment_openai_timeout_seconds"),
+        "LLM_MAX_CONNECTIONS": yaml_cfg.get("llm_max_connections"),
+        "LLM_MAX_CONCURRENCY": yaml_cfg.get("llm_max_concurrency"),
+        "LLM_RATE_PER_SECOND": yaml_cfg.get("llm_rate_per_second"),
+        "LLM_BURST": yaml_cfg.get("llm_burst"),
+        "LLM_MAX_RETRIES": yaml_cfg.get("llm_max_retries"),
+        "LLM_BACKOFF_SECONDS": yaml_cfg.get("llm_backoff_seconds"),
+        "LLM_BREAKER_FAILURES": yaml_cfg.get("llm_breaker_failures"),
+        "LLM_BREAKER_RESET_SECONDS": yaml_cfg.get("llm_breaker_reset_seconds"),
     }
     merged = {k: v for k, v in mapped.items() if v is not None and os.getenv(k) is None}
     return Settings(**merged)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.common.settings import get_settings
+from src.core.models import Document
+from src.rag.filters import to_naive_utc
+
+_WORD = re.compile(r"\w+")
+_MASK = (1 << 64) - 1
+
+
+def normalize_content(text: str) -> str:
+    """Case-, width- and punctuation-insensitive form used for hashing."""
+    return " ".join(_WORD.findall(unicodedata.normalize("NFKC", text).casefold()))
+
+
+def dedup_scope(ticker: str | None, source: str, published_at: datetime | None = None) -> str:
+    """Key two copies must share to count as duplicates.
+
+    Ticker, source and, when given, the UTC publication day: without them one
+    company's story would suppress another company's identically worded one.
+    """
+    day = to_naive_utc(published_at).date().isoformat() if published_at else ""
+    return "\x1f".join([ticker or "", source, day])
+
+
+def content_hash(text: str, scope: str = "") -> str:
+    return hashlib.sha256(f"{scope}\x1e{normalize_content(text)}".encode()).hexdigest()
+
+
+def simhash(text: str, *, shingle: int = 2) -> int:
+    """64-bit SimHash over word shingles, returned as a signed integer for storage.
+
+    Each shingle votes +1/-1 on every bit of its hash; near-identical texts share most
+    shingles and so end up a few bits apart.
+    """
+    words = normalize_content(text).split()
+    shingles = [
+        " ".join(words[i : i + shingle]) for i in range(max(1, len(words) - shingle + 1))
+    ]
+    digests = b"".join(
+        hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest() for item in shingles
+    )
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = (2 * bits.astype(np.int32) - 1).sum(axis=0)
+    value = int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK).bit_count()
+
+
+class SimHashIndex:
+    """Finds stored fingerprints within `max_distance` bits of a query fingerprint.
+
+    Fingerprints are split into `max_distance + 1` bands; two fingerprints that differ
+    in at most `max_distance` bits agree exactly on at least one band, so only the
+    entries sharing a band bucket need a Hamming-distance check. Buckets are also keyed
+    by `scope` (see `dedup_scope`), so only documents of the same scope are compared.
+    """
+
+    def __init__(self, *, max_distance: int = 6) -> None:
+        if not 0 <= max_distance < 64:
+            raise ValueError("max_distance must be between 0 and 63")
+        self.max_distance = max_distance
+        self.high_water_mark = 0
+        bands = max_distance + 1
+        width = 64 // bands
+        self._bands = [(i * width, 64 if i == bands - 1 else (i + 1) * width) for i in range(bands)]
+        self._buckets: dict[tuple[str, int, int], list[tuple[int, int]]] = {}
+        self._size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _keys(self, fingerprint: int, scope: str) -> list[tuple[str, int, int]]:
+        unsigned = fingerprint & _MASK
+        return [
+            (scope, band, (unsigned >> lo) & ((1 << (hi - lo)) - 1))
+            for band, (lo, hi) in enumerate(self._bands)
+        ]
+
+    def add(self, doc_id: int, fingerprint: int, scope: str = "") -> None:
+        with self._lock:
+            for key in self._keys(fingerprint, scope):
+                self._buckets.setdefault(key, []).append((doc_id, fingerprint))
+            self._size += 1
+
+    def find(self, fingerprint: int, scope: str = "") -> int | None:
+        """Id of the closest stored document of `scope` within `max_distance` bits, if any."""
+        best: tuple[int, int] | None = None
+        with self._lock:
+            for key in self._keys(fingerprint, scope):
+                for doc_id, other in self._buckets.get(key, ()):
+                    distance = hamming_distance(fingerprint, other)
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, doc_id)
+        return None if best is None else best[1]
+
+    def refresh(self, session: Session, *, batch_size: int = 5000) -> int:
+        """Add fingerprints of documents stored after the high-water mark."""
+        added = 0
+        with self._lock:
+            while True:
+                rows = session.execute(
+                    select(
+                        Document.id,
+                        Document.simhash,
+                        Document.ticker,
+                        Document.source,
+                        Document.published_at,
+                    )
+                    .where(Document.id > self.high_water_mark)
+                    .order_by(Document.id)
+                    .limit(batch_size)
+                ).all()
+                for row in rows:
+                    if row.simhash is not None:
+                        scope = dedup_scope(row.ticker, row.source, row.published_at)
+                        self.add(row.id, row.simhash, scope)
+                        added += 1
+                if rows:
+                    self.high_water_mark = rows[-1].id
+                if len(rows) < batch_size:
+                    return added
+
+
+_simhash_index: SimHashIndex | None = None
+_simhash_index_lock = threading.Lock()
+
+
+def get_simhash_index(session: Session) -> SimHashIndex:
+    """Return the process-wide index of committed documents, first catching up."""
+    global _simhash_index
+    max_distance = get_settings().ingest_near_duplicate_distance
+    with _simhash_index_lock:
+        if _simhash_index is None or _simhash_index.max_distance != max_distance:
+            _simhash_index = SimHashIndex(max_distance=max_distance)
+        index = _simhash_index
+    index.refresh(session)
+    return index
@@ -2,26 +2,53 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from src.common.logging import get_logger
 from src.common.settings import get_settings
 from src.core.models import Document, DocumentChunk, EmbeddingMetadata
+from src.data_ingestion.dedup import (
+    SimHashIndex,
+    content_hash,
+    dedup_scope,
+    get_simhash_index,
+    simhash,
+)
 from src.data_ingestion.schemas import IngestDocumentInput
 from src.rag.chunking import get_chunker
-from src.rag.embeddings import get_embedding_provider
+from src.rag.corpus import bump_corpus_generation
+from src.rag.dense_index import publish_dense_index
+from src.rag.embeddings import get_sparse_embedding_provider
+from src.rag.sparse_codec import PackedSparseVector
+from src.rag.vocabulary import get_vocabulary
+
+logger = get_logger("ingestion")
 
 
 @dataclass
 class IngestionSummary:
     documents_ingested: int
     chunks_ingested: int
+    duplicate_documents: int = 0
+    near_duplicate_documents: int = 0
+    duplicate_chunks: int = 0
+
+
+def _existing_hashes(session: Session, column, hashes: list[str]) -> set[str]:
+    if not hashes:
+        return set()
+    return set(session.execute(select(column).where(column.in_(hashes))).scalars())
 
 
 def ingest_documents(session: Session, docs: list[IngestDocumentInput]) -> IngestionSummary:
     settings = get_settings()
     docs_count = 0
     chunks_count = 0
-    embedding_provider = get_embedding_provider(settings.embedding_provider)
+    duplicate_docs = near_duplicate_docs = duplicate_chunks = 0
+    dedup = settings.ingest_dedup
+    embedding_provider = get_sparse_embedding_provider(settings.embedding_provider)
+    vocabulary = get_vocabulary()
     chunker = get_chunker(
         settings.chunker_provider,
         max_chars=settings.chunk_max_chars,
@@ -30,26 +57,79 @@ def ingest_documents(session: Session, docs: list[IngestDocumentInput]) -> Inges
         overlap_tokens=settings.chunk_overlap_tokens,
     )
 
+    # Committed documents come from the shared index; this batch's are tracked locally
+    # so a rolled-back batch never leaves fingerprints behind.
+    near_index = get_simhash_index(session) if dedup == "near" else None
+    batch_index = SimHashIndex(max_distance=settings.ingest_near_duplicate_distance)
+    batch_doc_hashes: set[str] = set()
+    batch_chunk_hashes: set[str] = set()
+
     for payload in docs:
+        scope = dedup_scope(payload.ticker, payload.source, payload.published_at)
+        doc_hash = content_hash(payload.content, scope)
+        fingerprint = simhash(payload.content)
+        if dedup != "off":
+            if doc_hash in batch_doc_hashes or _existing_hashes(
+                session, Document.content_hash, [doc_hash]
+            ):
+                duplicate_docs += 1
+                continue
+            if near_index is not None and (
+                near_index.find(fingerprint, scope) is not None
+                or batch_index.find(fingerprint, scope) is not None
+            ):
+                near_duplicate_docs += 1
+                continue
         doc = Document(
             source=payload.source,
             ticker=payload.ticker,
             title=payload.title,
             content=payload.content,
+            content_hash=doc_hash,
+            simhash=fingerprint,
             published_at=payload.published_at,
         )
         session.add(doc)
         session.flush()
         docs_count += 1
+        batch_doc_hashes.add(doc_hash)
+        batch_index.add(doc.id, fingerprint, scope)
 
         chunks = chunker.chunk(document_id=doc.id, text=payload.content)
-        for chunk in chunks:
+        # Chunks are scoped without the day, so a publisher's recurring boilerplate for
+        # a ticker is still dropped from later stories.
+        chunk_scope = dedup_scope(payload.ticker, payload.source)
+        chunk_hashes = [content_hash(chunk.content, chunk_scope) for chunk in chunks]
+        if dedup != "off":
+            # Boilerplate (disclaimers, bylines) repeats across otherwise distinct stories.
+            seen = batch_chunk_hashes | _existing_hashes(
+                session, DocumentChunk.content_hash, list(set(chunk_hashes))
+            )
+            kept = []
+            for chunk, chunk_hash in zip(chunks, chunk_hashes, strict=True):
+                if chunk_hash in seen:
+                    duplicate_chunks += 1
+                else:
+                    seen.add(chunk_hash)
+                    kept.append((chunk, chunk_hash))
+            chunks = [chunk for chunk, _ in kept]
+            chunk_hashes = [chunk_hash for _, chunk_hash in kept]
+        batch_chunk_hashes.update(chunk_hashes)
+        embeddings = [embedding_provider.embed(chunk.content) for chunk in chunks]
+        term_ids = vocabulary.get_or_create(
+            session, [term for embedding in embeddings for term in embedding]
+        )
+        for chunk, chunk_hash, embedding in zip(chunks, chunk_hashes, embeddings, strict=True):
+            vector = PackedSparseVector.from_pairs(
+                [term_ids[term] for term in embedding], list(embedding.values())
+            )
             session.add(
                 DocumentChunk(
                     document_id=doc.id,
                     chunk_id=chunk.chunk_id,
                     chunk_index=chunk.chunk_index,
                     content=chunk.content,
+                    content_hash=chunk_hash,
                     source=payload.source,
                     ticker=payload.ticker,
                     published_at=payload.published_at,
@@ -62,13 +142,32 @@ def ingest_documents(session: Session, docs: list[IngestDocumentInput]) -> Inges
                     chunk_id=chunk.chunk_id,
                     vector_provider=settings.embedding_provider,
                     model_name="sparse-termfreq-v1",
-                    payload={
-                        "char_count": len(chunk.content),
-                        "embedding": embedding_provider.embed(chunk.content),
-                    },
+                    payload={"char_count": len(chunk.content), "term_count": len(vector)},
+                    vector_blob=vector.to_bytes(),
                 )
             )
             chunks_count += 1
 
+    if chunks_count:
+        bump_corpus_generation(session)
     session.commit()
-    return IngestionSummary(documents_ingested=docs_count, chunks_ingested=chunks_count)
+    if chunks_count and settings.vector_store_dir:
+        try:
+            publish_dense_index(session, min_rows=settings.vector_store_publish_rows)
+        except Exception:
+            # The documents are committed; the next publish or rebuild catches up.
+            logger.exception("vector_store_publish_failed")
+    if duplicate_docs or near_duplicate_docs or duplicate_chunks:
+        logger.info(
+            "ingestion_duplicates_skipped",
+            duplicate_documents=duplicate_docs,
+            near_duplicate_documents=near_duplicate_docs,
+            duplicate_chunks=duplicate_chunks,
+        )
+    return IngestionSummary(
+        documents_ingested=docs_count,
+        chunks_ingested=chunks_count,
+        duplicate_documents=duplicate_docs,
+        near_duplicate_documents=near_duplicate_docs,
+        duplicate_chunks=duplicate_chunks,
+    )
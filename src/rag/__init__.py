@@ -1,3 +1,11 @@
+from src.rag.ann_benchmark import (
+    AnnBenchmarkPoint,
+    AnnBenchmarkSummary,
+    PqBenchmarkPoint,
+    benchmark_ivf,
+    benchmark_pq,
+)
+from src.rag.answer_cache import AnswerCache, CachedAnswer, get_answer_cache
 from src.rag.answer_generation import (
     AnswerGenerator,
     DeterministicAnswerGenerator,
@@ -12,35 +20,156 @@ from src.rag.chunking_benchmark import (
     ChunkingBenchmarkSummary,
     benchmark_chunkers,
 )
+from src.rag.context_packing import PackedContexts, estimate_tokens, pack_contexts
+from src.rag.dense_index import (
+    DenseVectorIndex,
+    get_dense_index,
+    get_vector_store,
+    publish_dense_index,
+)
 from src.rag.embeddings import (
+    DenseEmbeddingProvider,
     EmbeddingProvider,
+    HashedDenseEmbeddingProvider,
     SparseEmbeddingProvider,
     cosine_similarity_sparse,
     get_embedding_provider,
+    get_sparse_embedding_provider,
 )
 from src.rag.evaluation import (
+    LatencyPercentiles,
     QaEvalCase,
     QaEvalCaseResult,
     QaEvalSummary,
     evaluate_qa_cases,
 )
-from src.rag.qa import answer_question
-from src.rag.retrieval import RetrievedChunk, retrieve_chunks
+from src.rag.filters import ChunkAttributes, RetrievalFilters
+from src.rag.inverted_index import (
+    CorpusStats,
+    InvertedIndex,
+    get_inverted_index,
+    set_inverted_index,
+)
+from src.rag.ivf_index import (
+    DenseIvfIndex,
+    IvfIndex,
+    close_ivf_index,
+    get_ivf_index,
+    spherical_kmeans,
+)
+from src.rag.lsm_index import LsmSegment, LsmVectorIndex, get_lsm_index
+from src.rag.product_quantizer import (
+    ProductQuantizer,
+    QuantizedVectorIndex,
+    get_quantized_index,
+)
+from src.rag.qa import QaQuery, answer_from_retrieved, answer_question, answer_questions
+from src.rag.reranker import Reranker, RerankOutcome, RerankWeights
+from src.rag.retrieval import (
+    RetrievalCache,
+    RetrievalStats,
+    RetrievedChunk,
+    clear_retrieval_caches,
+    retrieve_chunks,
+    retrieve_chunks_batch,
+)
+from src.rag.retrieval_benchmark import (
+    CorpusLoad,
+    RetrievalBenchmarkPoint,
+    benchmark_providers,
+    load_synthetic_corpus,
+    synthetic_documents,
+    synthetic_queries,
+)
+from src.rag.segments import (
+    SegmentedIndex,
+    SegmentPruneStats,
+    TimeSegment,
+    get_segmented_index,
+)
+from src.rag.sharded_index import (
+    ShardedIndex,
+    close_sharded_index,
+    get_sharded_index,
+    shard_for_ticker,
+)
+from src.rag.snapshot import (
+    IndexSnapshot,
+    SnapshotError,
+    load_index_snapshot,
+    read_snapshot,
+    save_index_snapshot,
+    write_snapshot,
+)
+from src.rag.sparse_codec import PackedSparseVector, cosine_similarity_packed
+from src.rag.sparse_matrix import SparseScoringMatrix, get_scoring_matrix, set_scoring_matrix
+from src.rag.tokenizer import Tokenizer, get_tokenizer, term_counts_many, tokenize_many
+from src.rag.vector_store import MemmapVectorStore, VectorStoreSnapshot
+from src.rag.vocabulary import Vocabulary, get_vocabulary
 
 __all__ = [
     "EmbeddingProvider",
+    "DenseEmbeddingProvider",
+    "HashedDenseEmbeddingProvider",
     "SparseEmbeddingProvider",
     "cosine_similarity_sparse",
     "get_embedding_provider",
+    "get_sparse_embedding_provider",
+    "PackedSparseVector",
+    "cosine_similarity_packed",
+    "SparseScoringMatrix",
+    "get_scoring_matrix",
+    "set_scoring_matrix",
+    "DenseVectorIndex",
+    "get_dense_index",
+    "MemmapVectorStore",
+    "VectorStoreSnapshot",
+    "get_vector_store",
+    "publish_dense_index",
+    "IvfIndex",
+    "DenseIvfIndex",
+    "get_ivf_index",
+    "close_ivf_index",
+    "spherical_kmeans",
+    "AnnBenchmarkPoint",
+    "AnnBenchmarkSummary",
+    "benchmark_ivf",
+    "RetrievalBenchmarkPoint",
+    "CorpusLoad",
+    "benchmark_providers",
+    "load_synthetic_corpus",
+    "synthetic_documents",
+    "synthetic_queries",
+    "LsmSegment",
+    "LsmVectorIndex",
+    "get_lsm_index",
+    "ProductQuantizer",
+    "QuantizedVectorIndex",
+    "get_quantized_index",
+    "PqBenchmarkPoint",
+    "benchmark_pq",
+    "Tokenizer",
+    "get_tokenizer",
+    "term_counts_many",
+    "tokenize_many",
+    "Vocabulary",
+    "get_vocabulary",
     "AnswerGenerator",
     "DeterministicAnswerGenerator",
     "OpenAIAnswerGenerator",
     "SourceContext",
     "get_answer_generator",
+    "AnswerCache",
+    "CachedAnswer",
+    "get_answer_cache",
+    "PackedContexts",
+    "estimate_tokens",
+    "pack_contexts",
     "ChunkingBenchmarkCase",
     "ChunkingBenchmarkMetrics",
     "ChunkingBenchmarkSummary",
     "benchmark_chunkers",
+    "LatencyPercentiles",
     "QaEvalCase",
     "QaEvalCaseResult",
     "QaEvalSummary",
@@ -50,7 +179,37 @@ __all__ = [
     "SimpleChunker",
     "TokenChunker",
     "get_chunker",
+    "ChunkAttributes",
+    "RetrievalFilters",
+    "CorpusStats",
+    "InvertedIndex",
+    "get_inverted_index",
+    "set_inverted_index",
+    "ShardedIndex",
+    "get_sharded_index",
+    "close_sharded_index",
+    "shard_for_ticker",
+    "IndexSnapshot",
+    "SnapshotError",
+    "load_index_snapshot",
+    "read_snapshot",
+    "save_index_snapshot",
+    "write_snapshot",
+    "SegmentedIndex",
+    "SegmentPruneStats",
+    "TimeSegment",
+    "get_segmented_index",
+    "Reranker",
+    "RerankOutcome",
+    "RerankWeights",
+    "RetrievalCache",
+    "RetrievalStats",
     "RetrievedChunk",
+    "clear_retrieval_caches",
+    "QaQuery",
+    "answer_from_retrieved",
     "answer_question",
+    "answer_questions",
     "retrieve_chunks",
+    "retrieve_chunks_batch",
 ]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from time import perf_counter
+
+import numpy as np
+
+from src.rag.ivf_index import IvfIndex
+from src.rag.product_quantizer import ProductQuantizer
+from src.rag.sparse_matrix import top_k_indices
+
+
+@dataclass
+class AnnBenchmarkPoint:
+    nprobe: int
+    recall_at_k: float
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
+
+
+@dataclass
+class AnnBenchmarkSummary:
+    rows: int
+    queries: int
+    top_k: int
+    n_lists: int
+    build_ms: float
+    exhaustive: AnnBenchmarkPoint
+    points: list[AnnBenchmarkPoint]
+
+
+@dataclass
+class PqBenchmarkPoint:
+    subvectors: int
+    rerank: int
+    compression_ratio: float
+    recall_at_k: float
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
+
+
+def _point(nprobe: int, recalls: list[float], latencies_ms: list[float]) -> AnnBenchmarkPoint:
+    latencies = np.array(latencies_ms)
+    return AnnBenchmarkPoint(
+        nprobe=nprobe,
+        recall_at_k=round(float(np.mean(recalls)), 4),
+        mean_ms=round(float(latencies.mean()), 3),
+        p50_ms=round(float(np.percentile(latencies, 50)), 3),
+        p99_ms=round(float(np.percentile(latencies, 99)), 3),
+    )
+
+
+def _exhaustive_truth(
+    vectors: np.ndarray, queries: np.ndarray, top_k: int
+) -> tuple[list[set[int]], list[float]]:
+    truth: list[set[int]] = []
+    latencies_ms: list[float] = []
+    for query in queries:
+        t0 = perf_counter()
+        truth.append(set(top_k_indices(vectors @ query, top_k).tolist()))
+        latencies_ms.append((perf_counter() - t0) * 1000.0)
+    return truth, latencies_ms
+
+
+def _recall(found: set[int], expected: set[int]) -> float:
+    return len(found & expected) / len(expected) if expected else 1.0
+
+
+def benchmark_ivf(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    *,
+    top_k: int = 10,
+    nprobes: tuple[int, ...] = (1, 2, 4, 8, 16, 32),
+    n_lists: int | None = None,
+) -> AnnBenchmarkSummary:
+    """Recall@k and per-query latency of IVF search against exhaustive scoring.
+
+    Exhaustive search over the same vectors is the ground truth (its recall is 1.0),
+    so each point shows what a given `nprobe` trades away for its speed-up.
+    """
+    t0 = perf_counter()
+    index = IvfIndex.build(vectors, n_lists=n_lists)
+    build_ms = (perf_counter() - t0) * 1000.0
+
+    truth, exhaustive_ms = _exhaustive_truth(vectors, queries, top_k)
+
+    points: list[AnnBenchmarkPoint] = []
+    for nprobe in sorted({min(n, index.n_lists) for n in nprobes}):
+        recalls: list[float] = []
+        latencies: list[float] = []
+        for query, expected in zip(queries, truth, strict=True):
+            t0 = perf_counter()
+            hits = index.search(query, top_k=top_k, nprobe=nprobe)[0]
+            latencies.append((perf_counter() - t0) * 1000.0)
+            recalls.append(_recall({row for row, _ in hits}, expected))
+        points.append(_point(nprobe, recalls, latencies))
+
+    return AnnBenchmarkSummary(
+        rows=int(vectors.shape[0]),
+        queries=int(queries.shape[0]),
+        top_k=top_k,
+        n_lists=index.n_lists,
+        build_ms=round(build_ms, 2),
+        exhaustive=_point(index.n_lists, [1.0] * len(truth), exhaustive_ms),
+        points=points,
+    )
+
+
+def benchmark_pq(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    *,
+    top_k: int = 10,
+    subvectors: tuple[int, ...] = (32, 64, 128),
+    reranks: tuple[int, ...] = (0, 100),
+) -> list[PqBenchmarkPoint]:
+    """Recall@k of ADC search, with and without exact reranking, per code size.
+
+    `rerank=0` ranks by the quantized scores alone; otherwise that many ADC candidates
+    are rescored with the full-precision vectors.
+    """
+    truth, _ = _exhaustive_truth(vectors, queries, top_k)
+    points: list[PqBenchmarkPoint] = []
+    for m in subvectors:
+        quantizer = ProductQuantizer.train(vectors, m=m)
+        code_columns = np.ascontiguousarray(quantizer.encode(vectors).T)
+        for rerank in reranks:
+            recalls: list[float] = []
+            latencies: list[float] = []
+            for query, expected in zip(queries, truth, strict=True):
+                t0 = perf_counter()
+                approx = quantizer.adc_scores(quantizer.lookup_table(query), code_columns)
+                shortlist = top_k_indices(approx, max(top_k, rerank))
+                if rerank:
+                    exact = vectors[np.sort(shortlist)] @ query
+                    shortlist = np.sort(shortlist)[top_k_indices(exact, top_k)]
+                latencies.append((perf_counter() - t0) * 1000.0)
+                recalls.append(_recall(set(shortlist[:top_k].tolist()), expected))
+            point = _point(m, recalls, latencies)
+            points.append(
+                PqBenchmarkPoint(
+                    subvectors=m,
+                    rerank=rerank,
+                    compression_ratio=quantizer.compression_ratio,
+                    recall_at_k=point.recall_at_k,
+                    mean_ms=point.mean_ms,
+                    p50_ms=point.p50_ms,
+                    p99_ms=point.p99_ms,
+                )
+            )
+    return points
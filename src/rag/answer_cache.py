@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from src.common.observability import RETRIEVAL_CACHE_COUNTER
+from src.common.settings import get_settings
+from src.rag.retrieval import RetrievedChunk
+from src.rag.tokenizer import tokenize
+
+CitationKey = tuple[str, ...]
+
+_QUESTION_STOPWORDS = frozenset(
+    "about any are been being can could did does for from had has have how its our please "
+    "say said should tell that the their them there these they this those was were what "
+    "when where which who whom whose why will with would you your".split()
+)
+_SUFFIXES = ("ance", "ence", "ing", "ed", "es", "s", "e")
+_GUARD_TERM = re.compile(r"[a-z0-9]+")
+_PERIOD_WORDS = frozenset("first second third fourth half".split())
+_SHORT_FILLER = frozenset("a an as at be by do i if in is it me my of on or so to us we".split())
+
+
+def normalize_question(question: str) -> str:
+    """Question terms without filler words and common suffixes, for embedding.
+
+    "what did AAPL guide?" and "AAPL guidance?" both become "aapl guid".
+    """
+    terms = []
+    for term in tokenize(question):
+        if term in _QUESTION_STOPWORDS:
+            continue
+        for suffix in _SUFFIXES:
+            if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+                term = term[: -len(suffix)]
+                break
+        terms.append(term)
+    return " ".join(terms)
+
+
+def question_guard(question: str) -> str:
+    """Terms two questions must share exactly before their embeddings are compared.
+
+    Numbers ("2023", "fy24"), quarter and half names and short tokens ("q3", "h1") move
+    the embedding little or not at all, since the tokenizer drops terms under 3 chars.
+    """
+    terms = {
+        term
+        for term in _GUARD_TERM.findall(question.lower())
+        if term not in _SHORT_FILLER
+        and (len(term) < 3 or term in _PERIOD_WORDS or any(char.isdigit() for char in term))
+    }
+    return " ".join(sorted(terms))
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    answer_provider: str
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    guard: str
+    fingerprint: str
+    answer: CachedAnswer
+
+
+def citation_key(retrieved: list[RetrievedChunk]) -> CitationKey:
+    return tuple(sorted({chunk.chunk_id for chunk in retrieved}))
+
+
+def citation_fingerprint(retrieved: list[RetrievedChunk]) -> str:
+    """Digest of everything the answer was grounded on; changes when any cited chunk does."""
+    digest = hashlib.sha256()
+    for chunk in sorted(retrieved, key=lambda item: item.chunk_id):
+        published = chunk.published_at.isoformat() if chunk.published_at else ""
+        for field in (chunk.chunk_id, chunk.source, chunk.ticker or "", published, chunk.content):
+            digest.update(field.encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """Answers reused across questions that are worded alike and cite the same chunks.
+
+    Entries are grouped by model and the exact set of cited chunk ids; within a group a
+    lookup hits when the questions share their `question_guard` terms and the question
+    embeddings' cosine similarity reaches `threshold`.
+    Each entry keeps a fingerprint of the cited chunks' content and metadata, and is
+    dropped instead of served once it no longer matches. The in-memory tier is LRU;
+    with `path` set, entries are also written to a SQLite file shared by workers and
+    kept across restarts.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 1024,
+        threshold: float = 0.98,
+        path: str = "",
+        persistent_max_entries: int = 100_000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.path = path
+        self.persistent_max_entries = persistent_max_entries
+        self._entries: OrderedDict[tuple[str, CitationKey, str], _Entry] = OrderedDict()
+        self._buckets: dict[tuple[str, CitationKey], set[str]] = {}
+        self._lock = threading.RLock()
+        self._db: sqlite3.Connection | None = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                " model TEXT NOT NULL, citations TEXT NOT NULL, question TEXT NOT NULL,"
+                " vector BLOB NOT NULL, fingerprint TEXT NOT NULL, answer TEXT NOT NULL,"
+                " answer_provider TEXT NOT NULL, last_used REAL NOT NULL,"
+                " PRIMARY KEY (model, citations, question))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_answer_cache_last_used ON answer_cache (last_used)"
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answer_cache")
+
+    def lookup(
+        self,
+        model: str,
+        question: str,
+        question_vector: np.ndarray,
+        retrieved: list[RetrievedChunk],
+    ) -> CachedAnswer | None:
+        citations = citation_key(retrieved)
+        guard = question_guard(question)
+        fingerprint = citation_fingerprint(retrieved)
+        with self._lock:
+            answer = self._lookup_memory(model, citations, guard, question_vector, fingerprint)
+            if answer is None and self._db is not None:
+                answer = self._lookup_persistent(
+                    self._db, model, citations, guard, question_vector, fingerprint
+                )
+        RETRIEVAL_CACHE_COUNTER.labels("answers", "hit" if answer else "miss").inc()
+        return answer
+
+    def _lookup_memory(
+        self,
+        model: str,
+        citations: CitationKey,
+        guard: str,
+        vector: np.ndarray,
+        fingerprint: str,
+    ) -> CachedAnswer | None:
+        best: tuple[float, tuple[str, CitationKey, str]] | None = None
+        for question in list(self._buckets.get((model, citations), ())):
+            key = (model, citations, question)
+            entry = self._entries[key]
+            if entry.fingerprint != fingerprint:
+                self._discard(key)
+                RETRIEVAL_CACHE_COUNTER.labels("answers", "stale").inc()
+                continue
+            if entry.guard != guard:
+                continue
+            similarity = float(entry.vector @ vector)
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, key)
+        if best is None:
+            return None
+        self._entries.move_to_end(best[1])
+        return self._entries[best[1]].answer
+
+    def _lookup_persistent(
+        self,
+        db: sqlite3.Connection,
+        model: str,
+        citations: CitationKey,
+        guard: str,
+        vector: np.ndarray,
+        fingerprint: str,
+    ) -> CachedAnswer | None:
+        joined = "\n".join(citations)
+        rows = db.execute(
+            "SELECT question, vector, fingerprint, answer, answer_provider FROM answer_cache"
+            " WHERE model = ? AND citations = ?",
+            (model, joined),
+        ).fetchall()
+        best = None
+        for question, blob, stored_fingerprint, answer, answer_provider in rows:
+            if stored_fingerprint != fingerprint:
+                db.execute(
+                    "DELETE FROM answer_cache WHERE model = ? AND citations = ? AND question = ?",
+                    (model, joined, question),
+                )
+                RETRIEVAL_CACHE_COUNTER.labels("answers", "stale").inc()
+                continue
+            stored = np.frombuffer(blob, dtype=np.float32)
+            if stored.shape != vector.shape or question_guard(question) != guard:
+                continue
+            similarity = float(stored @ vector)
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, question, stored, CachedAnswer(answer, answer_provider))
+        if best is None:
+            return None
+        _, question, stored, answer = best
+        db.execute(
+            "UPDATE answer_cache SET last_used = ? WHERE model = ? AND citations = ?"
+            " AND question = ?",
+            (time.time(), model, joined, question),
+        )
+        # Promote into memory so the next lookup skips SQLite.
+        self._remember(
+            model, citations, question, _Entry(stored.copy(), guard, fingerprint, answer)
+        )
+        return answer
+
+    def store(
+        self,
+        model: str,
+        question: str,
+        question_vector: np.ndarray,
+        retrieved: list[RetrievedChunk],
+        answer: CachedAnswer,
+    ) -> None:
+        if not self.enabled:
+            return
+        citations = citation_key(retrieved)
+        vector = np.asarray(question_vector, dtype=np.float32)
+        entry = _Entry(vector, question_guard(question), citation_fingerprint(retrieved), answer)
+        with self._lock:
+            self._remember(model, citations, question, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answer_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        model,
+                        "\n".join(citations),
+                        question,
+                        vector.tobytes(),
+                        entry.fingerprint,
+                        answer.answer,
+                        answer.answer_provider,
+                        time.time(),
+                    ),
+                )
+                self._db.execute(
+                    "DELETE FROM answer_cache WHERE rowid IN (SELECT rowid FROM answer_cache"
+                    " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.persistent_max_entries,),
+                )
+
+    def _remember(self, model: str, citations: CitationKey, question: str, entry: _Entry) -> None:
+        key = (model, citations, question)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._buckets.setdefault((model, citations), set()).add(question)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: tuple[str, CitationKey, str]) -> None:
+        model, citations, question = key
+        self._entries.pop(key, None)
+        bucket = self._buckets.get((model, citations))
+        if bucket is not None:
+            bucket.discard(question)
+            if not bucket:
+                del self._buckets[(model, citations)]
+
+
+_answer_cache: AnswerCache | None = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Return the process-wide answer cache, rebuilt when its settings change."""
+    global _answer_cache
+    settings = get_settings()
+    config = (
+        settings.answer_cache_max_entries,
+        settings.answer_cache_similarity,
+        settings.answer_cache_path,
+    )
+    with _answer_cache_lock:
+        current = _answer_cache
+        if current is None or (current.max_entries, current.threshold, current.path) != config:
+            if current is not None:
+                current.close()
+            current = AnswerCache(max_entries=config[0], threshold=config[1], path=config[2])
+            _answer_cache = current
+        return current
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import json
+from collections.abc import Iterator
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Protocol
 
 import httpx
 
+from src.common.llm_gateway import get_llm_gateway
+
 
 @dataclass
 class SourceContext:
@@ -16,19 +20,59 @@ class SourceContext:
     excerpt: str
 
 
+def format_context(ctx: SourceContext) -> str:
+    """One evidence line of the chat prompt."""
+    return (
+        f"[{ctx.chunk_id}] source={ctx.source} ticker={ctx.ticker or 'N/A'} "
+        f"published_at={ctx.published_at.isoformat() if ctx.published_at else 'N/A'} "
+        f"excerpt={ctx.excerpt}"
+    )
+
+
+def chat_messages(question: str, contexts: list[SourceContext]) -> list[dict[str, str]]:
+    context_block = "\n".join(format_context(ctx) for ctx in contexts)
+    system_prompt = (
+        "You are a grounded financial QA assistant. "
+        "Answer only using the provided evidence excerpts. "
+        "If evidence is insufficient, say so clearly. "
+        "Cite chunk IDs in square brackets for each claim."
+    )
+    user_prompt = (
+        f"Question: {question}\n\n"
+        f"Evidence:\n{context_block}\n\n"
+        "Return a concise answer with citations."
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
 class AnswerGenerator(Protocol):
     def generate(self, question: str, contexts: list[SourceContext]) -> str | None:
         ...
 
+    def stream(self, question: str, contexts: list[SourceContext]) -> Iterator[str]:
+        """Yield the answer in pieces; yields nothing where `generate` returns None.
+
+        Raises if the answer breaks off part-way, so callers can fall back.
+        """
+        ...
+
 
 class DeterministicAnswerGenerator:
     def generate(self, question: str, contexts: list[SourceContext]) -> str | None:
         del question
-        summary_lines = [f"- [{ctx.chunk_id}] {ctx.excerpt}" for ctx in contexts[:3]]
+        summary_lines = [f"- [{ctx.chunk_id}] {ctx.excerpt[:220]}" for ctx in contexts[:3]]
         if not summary_lines:
             return "No grounded evidence was available to answer this question."
         return "Grounded summary from retrieved documents:\n" + "\n".join(summary_lines)
 
+    def stream(self, question: str, contexts: list[SourceContext]) -> Iterator[str]:
+        answer = self.generate(question, contexts)
+        if answer:
+            yield from answer.splitlines(keepends=True)
+
 
 class OpenAIAnswerGenerator:
     def __init__(
@@ -44,49 +88,31 @@ class OpenAIAnswerGenerator:
         self.base_url = base_url.rstrip("/")
         self.timeout_seconds = timeout_seconds
 
+    def _payload(self, question: str, contexts: list[SourceContext]) -> dict:
+        return {
+            "model": self.model,
+            "temperature": 0.1,
+            "messages": chat_messages(question, contexts),
+        }
+
+    @property
+    def _headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
     def generate(self, question: str, contexts: list[SourceContext]) -> str | None:
         if not self.api_key:
             return None
         if not contexts:
             return None
 
-        context_block = "\n".join(
-            [
-                (
-                    f"[{ctx.chunk_id}] source={ctx.source} ticker={ctx.ticker or 'N/A'} "
-                    f"published_at={ctx.published_at.isoformat() if ctx.published_at else 'N/A'} "
-                    f"excerpt={ctx.excerpt}"
-                )
-                for ctx in contexts
-            ]
-        )
-        system_prompt = (
-            "You are a grounded financial QA assistant. "
-            "Answer only using the provided evidence excerpts. "
-            "If evidence is insufficient, say so clearly. "
-            "Cite chunk IDs in square brackets for each claim."
-        )
-        user_prompt = (
-            f"Question: {question}\n\n"
-            f"Evidence:\n{context_block}\n\n"
-            "Return a concise answer with citations."
-        )
-        payload = {
-            "model": self.model,
-            "temperature": 0.1,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-        }
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        url = f"{self.base_url}/chat/completions"
-
+        payload = self._payload(question, contexts)
         try:
-            with httpx.Client(timeout=self.timeout_seconds) as client:
-                response = client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            body = response.json()
+            body = get_llm_gateway(self.base_url).post_json(
+                "/chat/completions",
+                payload,
+                headers=self._headers,
+                timeout=self.timeout_seconds,
+            )
             choices = body.get("choices") or []
             if not choices:
                 return None
@@ -98,6 +124,32 @@ class OpenAIAnswerGenerator:
         except Exception:
             return None
 
+    def stream(self, question: str, contexts: list[SourceContext]) -> Iterator[str]:
+        """Stream content deltas from the chat-completions server-sent events."""
+        if not self.api_key or not contexts:
+            return
+        payload = {**self._payload(question, contexts), "stream": True}
+        lines = get_llm_gateway(self.base_url).stream_lines(
+            "/chat/completions", payload, headers=self._headers, timeout=self.timeout_seconds
+        )
+        done = False
+        for line in lines:
+            if done or not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                done = True
+                continue
+            choices = json.loads(data).get("choices") or []
+            delta = choices[0].get("delta", {}) if choices else {}
+            content = delta.get("content")
+            if isinstance(content, str) and content:
+                yield content
+        if done:
+            return
+        # The server closed the stream without its terminating [DONE] event.
+        raise httpx.RemoteProtocolError("chat completion stream ended early")
+
 
 def get_answer_generator(
     provider_name: str,
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import re
 from dataclasses import dataclass
 from time import perf_counter
 
 from src.rag.chunking import get_chunker
+from src.rag.tokenizer import tokenize
 
 
 @dataclass
@@ -31,7 +31,7 @@ class ChunkingBenchmarkSummary:
 
 
 def _tokenize(text: str) -> set[str]:
-    return {t for t in re.findall(r"[a-zA-Z0-9]{3,}", text.lower())}
+    return set(tokenize(text))
 
 
 def _best_overlap(question: str, chunks: list[str]) -> float:
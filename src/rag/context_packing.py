@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+
+from src.rag.answer_generation import SourceContext, chat_messages, format_context
+from src.rag.retrieval import RetrievedChunk
+
+# OpenAI's rule of thumb for English text; no BPE vocabulary is shipped locally.
+CHARS_PER_TOKEN = 4
+# Shorter suffix/prefix matches are treated as coincidence rather than chunk overlap.
+_MIN_OVERLAP_CHARS = 16
+_SEGMENT_SEPARATOR = " ... "
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate prompt tokens of `text` (about four characters per token)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages: list[dict[str, str]]) -> int:
+    """Approximate tokens of chat `messages`, with the few tokens each message adds."""
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages)
+
+
+def _overlap(head: str, tail: str) -> int:
+    """Length of the longest suffix of `head` that is also a prefix of `tail`."""
+    for size in range(min(len(head), len(tail)) - 1, _MIN_OVERLAP_CHARS - 1, -1):
+        if head.endswith(tail[:size]):
+            return size
+    return 0
+
+
+def _merge_segment(segments: list[str], text: str) -> bool:
+    """Fold `text` into `segments` of the same document; False if it added nothing new."""
+    for idx, segment in enumerate(segments):
+        if text in segment:
+            return False
+        if segment in text:
+            segments[idx] = text
+            break
+        if overlap := _overlap(segment, text):
+            segments[idx] = segment + text[overlap:]
+            break
+        if overlap := _overlap(text, segment):
+            segments[idx] = text + segment[overlap:]
+            break
+    else:
+        segments.append(text)
+        return True
+    # A chunk can bridge two segments that were separate until now.
+    merged = segments.pop(idx)
+    for other_idx, other in enumerate(segments):
+        if overlap := _overlap(merged, other):
+            segments[other_idx] = merged + other[overlap:]
+            return True
+        if overlap := _overlap(other, merged):
+            segments[other_idx] = other + merged[overlap:]
+            return True
+    segments.insert(idx, merged)
+    return True
+
+
+@dataclass
+class _Passage:
+    lead: RetrievedChunk
+    segments: list[str] = field(default_factory=list)
+
+    def context(self) -> SourceContext:
+        return SourceContext(
+            chunk_id=self.lead.chunk_id,
+            source=self.lead.source,
+            ticker=self.lead.ticker,
+            published_at=self.lead.published_at,
+            excerpt=_SEGMENT_SEPARATOR.join(self.segments),
+        )
+
+
+@dataclass
+class PackedContexts:
+    """Evidence for one prompt and what packing did to the retrieved chunks.
+
+    `tokens` estimates the evidence lines as formatted for the prompt, or the whole chat
+    prompt when packed for a question. `merged_chunks` were folded into another chunk's
+    passage, `duplicate_chunks` added no new text and `dropped_chunks` did not fit the
+    budget.
+    """
+
+    contexts: list[SourceContext]
+    tokens: int
+    merged_chunks: int = 0
+    duplicate_chunks: int = 0
+    dropped_chunks: int = 0
+
+
+def _tokens(passages: list[_Passage], question: str | None) -> int:
+    if question is not None:
+        return estimate_prompt_tokens(
+            chat_messages(question, [passage.context() for passage in passages])
+        )
+    return sum(estimate_tokens(format_context(passage.context())) + 1 for passage in passages)
+
+
+def pack_contexts(
+    retrieved: list[RetrievedChunk], *, token_budget: int, question: str | None = None
+) -> PackedContexts:
+    """Pack retrieved chunks into at most `token_budget` tokens of prompt evidence.
+
+    With `question`, the budget covers the whole chat prompt (instructions and question
+    included) rather than the evidence alone.
+
+    Chunks are taken in score order. Each document becomes one passage, labelled with
+    its best chunk's id, whose overlapping neighbours are stitched together at the
+    shared text and whose other chunks follow as separate segments. Text already in the
+    prompt is skipped, and a chunk that would overflow the budget is dropped while
+    smaller ones may still fit. The best chunk is truncated rather than dropped, so
+    there is always some evidence.
+    """
+    passages: dict[int, _Passage] = {}
+    packed = PackedContexts(contexts=[], tokens=0)
+    for chunk in sorted(retrieved, key=lambda item: item.score, reverse=True):
+        text = chunk.content.strip()
+        if not text or any(text in segment for p in passages.values() for segment in p.segments):
+            packed.duplicate_chunks += 1
+            continue
+        current = passages.get(chunk.document_id)
+        candidate = (
+            _Passage(current.lead, list(current.segments)) if current else _Passage(chunk)
+        )
+        if not _merge_segment(candidate.segments, text):
+            packed.duplicate_chunks += 1
+            continue
+        trial = {**passages, chunk.document_id: candidate}
+        tokens = _tokens(list(trial.values()), question)
+        if tokens > token_budget:
+            if passages:
+                packed.dropped_chunks += 1
+                continue
+            overflow = (tokens - token_budget) * CHARS_PER_TOKEN
+            candidate.segments = [text[: max(0, len(text) - overflow)].rstrip()]
+            tokens = _tokens([candidate], question)
+        if current is not None:
+            packed.merged_chunks += 1
+        passages[chunk.document_id] = candidate
+        packed.tokens = tokens
+    packed.contexts = [passage.context() for passage in passages.values()]
+    return packed
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, cast
+
+from sqlalchemy import CursorResult, select, update
+from sqlalchemy.orm import Session
+
+from src.core.models import CorpusGeneration
+
+_GENERATION_ROW_ID = 1
+
+
+def get_corpus_generation(session: Session) -> int:
+    generation = session.scalar(
+        select(CorpusGeneration.generation).where(CorpusGeneration.id == _GENERATION_ROW_ID)
+    )
+    return int(generation or 0)
+
+
+def bump_corpus_generation(session: Session) -> None:
+    """Advance the shared generation so every worker drops corpus-derived caches.
+
+    Runs inside the caller's transaction, so the bump becomes visible together with
+    the rows that caused it.
+    """
+    # An UPDATE always returns a cursor result, which carries the matched row count.
+    result = cast(
+        CursorResult[Any],
+        session.execute(
+            update(CorpusGeneration)
+            .where(CorpusGeneration.id == _GENERATION_ROW_ID)
+            .values(generation=CorpusGeneration.generation + 1, updated_at=datetime.utcnow())
+        ),
+    )
+    if result.rowcount == 0:
+        session.add(CorpusGeneration(id=_GENERATION_ROW_ID, generation=1))
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.common.settings import get_settings
+from src.core.models import DocumentChunk
+from src.rag.embeddings import DenseEmbeddingProvider, get_embedding_provider
+from src.rag.filters import ChunkAttributes, RetrievalFilters
+from src.rag.sparse_matrix import top_k_indices
+from src.rag.vector_store import MemmapVectorStore, VectorStoreSnapshot
+
+
+def _grow_rows(buffer: np.ndarray, required: int) -> np.ndarray:
+    if required <= buffer.shape[0]:
+        return buffer
+    capacity = max(required, 2 * buffer.shape[0], 1024)
+    grown = np.empty((capacity, buffer.shape[1]), dtype=buffer.dtype)
+    grown[: buffer.shape[0]] = buffer
+    return grown
+
+
+class DenseVectorIndex:
+    """Chunk embeddings held in one contiguous float32 matrix.
+
+    Vectors are L2-normalized by the provider, so scoring every chunk against a batch
+    of queries is a single matrix product. Memory is `rows x dimension x 4` bytes plus
+    the filter attributes; capacity doubles as chunks are appended.
+
+    With a `base` snapshot from the vector store, its memory-mapped rows come first
+    and only chunks ingested after it are embedded into process memory.
+    """
+
+    def __init__(
+        self, provider: DenseEmbeddingProvider, base: VectorStoreSnapshot | None = None
+    ) -> None:
+        self.provider = provider
+        self.base = base
+        self.high_water_mark = base.high_water_mark if base else 0
+        self.chunk_ids: list[str] = list(base.chunk_ids) if base else []
+        self.attributes = base.attributes.copy() if base else ChunkAttributes()
+        self._base_rows = len(base) if base else 0
+        self._vectors = np.empty((0, provider.dimension), dtype=np.float32)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def base_version(self) -> str | None:
+        return self.base.version if self.base else None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """All rows; this copies when both a base snapshot and newer rows exist."""
+        return self.vectors_from(0)
+
+    def vectors_from(self, start: int) -> np.ndarray:
+        """Rows from `start` on, copying only if the range spans the base and newer rows."""
+        delta = self._vectors[: len(self.chunk_ids) - self._base_rows]
+        if self.base is None or start >= self._base_rows:
+            return delta[start - self._base_rows :]
+        base = self.base.vectors[start:]
+        return base if not delta.shape[0] else np.concatenate([base, delta])
+
+    def append(
+        self,
+        chunk_ids: list[str],
+        vectors: np.ndarray,
+        *,
+        tickers: list[str | None],
+        sources: list[str],
+        published_ats: list,
+    ) -> None:
+        with self._lock:
+            start = len(self.chunk_ids) - self._base_rows
+            self._vectors = _grow_rows(self._vectors, start + len(chunk_ids))
+            self._vectors[start : start + len(chunk_ids)] = vectors
+            self.chunk_ids.extend(chunk_ids)
+            self.attributes.append(tickers, sources, published_ats)
+
+    def refresh(self, session: Session, *, batch_size: int = 1000) -> int:
+        """Embed and append chunks stored after the high-water mark; returns rows added."""
+        added = 0
+        with self._lock:
+            while True:
+                rows = session.execute(
+                    select(
+                        DocumentChunk.id,
+                        DocumentChunk.chunk_id,
+                        DocumentChunk.content,
+                        DocumentChunk.ticker,
+                        DocumentChunk.source,
+                        DocumentChunk.published_at,
+                    )
+                    .where(DocumentChunk.id > self.high_water_mark)
+                    .order_by(DocumentChunk.id)
+                    .limit(batch_size)
+                ).all()
+                if rows:
+                    self.append(
+                        [row.chunk_id for row in rows],
+                        self.provider.embed_many([row.content for row in rows]),
+                        tickers=[row.ticker for row in rows],
+                        sources=[row.source for row in rows],
+                        published_ats=[row.published_at for row in rows],
+                    )
+                    self.high_water_mark = rows[-1].id
+                    added += len(rows)
+                if len(rows) < batch_size:
+                    return added
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        *,
+        top_ks: list[int],
+        filters: RetrievalFilters | None = None,
+    ) -> list[list[tuple[str, float]]]:
+        """Top chunks per query row of `queries`, skipping rows outside `filters`."""
+        queries = queries.astype(np.float32, copy=False)
+        with self._lock:
+            scores = queries @ self.vectors_from(self._base_rows).T
+            if self.base is not None:
+                scores = np.hstack([queries @ self.base.vectors.T, scores])
+            mask = self.attributes.mask(filters or RetrievalFilters())
+            chunk_ids = list(self.chunk_ids)
+        if mask is not None:
+            scores[:, ~mask] = 0.0
+        return [
+            [
+                (chunk_ids[row], float(query_scores[row]))
+                for row in top_k_indices(query_scores, k)
+                if query_scores[row] > 0
+            ]
+            for query_scores, k in zip(scores, top_ks, strict=True)
+        ]
+
+    def search(
+        self, query: np.ndarray, *, top_k: int = 5, filters: RetrievalFilters | None = None
+    ) -> list[tuple[str, float]]:
+        return self.search_many(query[np.newaxis, :], top_ks=[top_k], filters=filters)[0]
+
+
+_dense_index: DenseVectorIndex | None = None
+_dense_index_lock = threading.Lock()
+
+
+def get_dense_provider() -> DenseEmbeddingProvider:
+    settings = get_settings()
+    provider = get_embedding_provider(
+        settings.dense_embedding_provider, dimension=settings.dense_embedding_dim
+    )
+    if not isinstance(provider, DenseEmbeddingProvider):
+        raise ValueError(f"{settings.dense_embedding_provider!r} is not a dense embedding provider")
+    return provider
+
+
+def get_vector_store() -> MemmapVectorStore | None:
+    settings = get_settings()
+    return MemmapVectorStore(settings.vector_store_dir) if settings.vector_store_dir else None
+
+
+def get_dense_index(session: Session) -> DenseVectorIndex:
+    """Return the process-wide dense index, first embedding newly ingested chunks.
+
+    When the vector store has published a newer version than the one this process
+    maps, the index is swapped for one based on that version.
+    """
+    global _dense_index
+    provider = get_dense_provider()
+    store = get_vector_store()
+    version = store.current_version() if store else None
+    with _dense_index_lock:
+        index = _dense_index
+        if index is None or index.provider.model_name != provider.model_name:
+            index = DenseVectorIndex(provider, base=_open_snapshot(store, version, provider))
+        elif version is not None and version != index.base_version:
+            snapshot = _open_snapshot(store, version, provider)
+            if snapshot is not None:
+                index = DenseVectorIndex(provider, base=snapshot)
+        _dense_index = index
+    index.refresh(session)
+    return index
+
+
+def _open_snapshot(
+    store: MemmapVectorStore | None, version: str | None, provider: DenseEmbeddingProvider
+) -> VectorStoreSnapshot | None:
+    snapshot = store.open(version) if store and version else None
+    if snapshot is not None and snapshot.model_name != provider.model_name:
+        return None
+    return snapshot
+
+
+def publish_dense_index(session: Session, *, min_rows: int = 0) -> str | None:
+    """Write the dense vectors as a new vector-store version, if one is configured.
+
+    Nothing is written (and None returned) while fewer than `min_rows` chunks are newer
+    than the version this process maps, so ingestion publishes in batches rather than
+    rewriting the whole corpus on every call.
+    """
+    store = get_vector_store()
+    if store is None:
+        return None
+    index = get_dense_index(session)
+    with index._lock:
+        if len(index) - index._base_rows < min_rows:
+            return None
+        # Rows below the current size are never rewritten by later appends, so the
+        # views stay valid after the lock is released and queries are not held up
+        # while the new version is written.
+        blocks = [index.vectors_from(index._base_rows)]
+        if index.base is not None:
+            blocks.insert(0, index.base.vectors)
+        chunk_ids = list(index.chunk_ids)
+        attributes = index.attributes.copy()
+        high_water_mark = index.high_water_mark
+    return store.publish(
+        chunk_ids,
+        blocks,
+        attributes,
+        model_name=index.provider.model_name,
+        high_water_mark=high_water_mark,
+    )
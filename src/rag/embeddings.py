@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import hashlib
 import math
-import re
-from typing import Protocol
+from functools import lru_cache
+from typing import Protocol, runtime_checkable
+
+import numpy as np
+
+from src.rag.tokenizer import get_tokenizer, tokenize_many
 
 
 class EmbeddingProvider(Protocol):
@@ -10,24 +15,72 @@ class EmbeddingProvider(Protocol):
         ...
 
 
-def tokenize(text: str) -> list[str]:
-    return re.findall(r"[a-zA-Z0-9]{3,}", text.lower())
+@runtime_checkable
+class DenseEmbeddingProvider(Protocol):
+    dimension: int
+
+    @property
+    def model_name(self) -> str:
+        ...
+
+    def embed(self, text: str) -> np.ndarray:
+        ...
+
+    def embed_many(self, texts: list[str]) -> np.ndarray:
+        ...
 
 
 class SparseEmbeddingProvider:
     """Local deterministic sparse embedding using normalized term frequency."""
 
     def embed(self, text: str) -> dict[str, float]:
-        terms = tokenize(text)
-        if not terms:
-            return {}
-        counts: dict[str, int] = {}
-        for term in terms:
-            counts[term] = counts.get(term, 0) + 1
-        total = float(len(terms))
+        counts = get_tokenizer().term_counts(text)
+        total = float(sum(counts.values()))
         return {term: (count / total) for term, count in counts.items()}
 
 
+@lru_cache(maxsize=1 << 16)
+def _hashed_slot(term: str, dimension: int) -> tuple[int, float]:
+    # A stable digest (unlike hash()) keeps vectors identical across processes and runs.
+    digest = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "little")
+    return digest % dimension, (1.0 if digest >> 63 else -1.0)
+
+
+class HashedDenseEmbeddingProvider:
+    """Local dense embedding built with the feature-hashing trick.
+
+    Each term is hashed to one of `dimension` buckets with a hashed +/-1 sign, term
+    frequencies are accumulated, and rows are L2-normalized so that dot products are
+    cosine similarities.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    @property
+    def model_name(self) -> str:
+        return f"hashed-dense-v1-d{self.dimension}"
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: list[str]) -> np.ndarray:
+        rows: list[int] = []
+        cols: list[int] = []
+        signs: list[float] = []
+        for row, terms in enumerate(tokenize_many(texts)):
+            for term in terms:
+                col, sign = _hashed_slot(term, self.dimension)
+                rows.append(row)
+                cols.append(col)
+                signs.append(sign)
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(vectors, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
 def cosine_similarity_sparse(a: dict[str, float], b: dict[str, float]) -> float:
     if not a or not b:
         return 0.0
@@ -41,8 +94,19 @@ def cosine_similarity_sparse(a: dict[str, float], b: dict[str, float]) -> float:
     return dot / (norm_a * norm_b)
 
 
-def get_embedding_provider(provider_name: str) -> EmbeddingProvider:
+def get_embedding_provider(
+    provider_name: str, *, dimension: int = 256
+) -> EmbeddingProvider | DenseEmbeddingProvider:
     normalized = provider_name.strip().lower()
+    if normalized in {"hashed-dense", "dense-local", "dense"}:
+        return HashedDenseEmbeddingProvider(dimension=dimension)
     if normalized in {"sparse-local", "local-sparse", "sparse"}:
         return SparseEmbeddingProvider()
     return SparseEmbeddingProvider()
+
+
+def get_sparse_embedding_provider(provider_name: str) -> EmbeddingProvider:
+    provider = get_embedding_provider(provider_name)
+    if isinstance(provider, DenseEmbeddingProvider):
+        raise ValueError(f"{provider_name!r} is not a sparse embedding provider")
+    return provider
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+from time import perf_counter
 
+import numpy as np
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
-from src.rag.qa import answer_question
+from src.common.settings import get_settings
+from src.rag.qa import QaResult, answer_from_retrieved
+from src.rag.retrieval import retrieve_chunks
 
 
 @dataclass
@@ -27,6 +35,24 @@ class QaEvalCaseResult:
     citation_count: int
     passed: bool
     reasons: list[str]
+    retrieval_ms: float = 0.0
+    generation_ms: float = 0.0
+
+
+@dataclass
+class LatencyPercentiles:
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+
+    @classmethod
+    def of(cls, latencies_ms: list[float]) -> LatencyPercentiles:
+        if not latencies_ms:
+            return cls()
+        p50, p95, p99 = np.percentile(np.array(latencies_ms), [50, 95, 99])
+        return cls(
+            p50_ms=round(float(p50), 3), p95_ms=round(float(p95), 3), p99_ms=round(float(p99), 3)
+        )
 
 
 @dataclass
@@ -36,9 +62,77 @@ class QaEvalSummary:
     citation_coverage: float
     avg_confidence: float
     cases: list[QaEvalCaseResult]
+    retrieval_latency: LatencyPercentiles
+    generation_latency: LatencyPercentiles
+
+
+_CaseRun = tuple[QaResult, float, float]
+
+
+def _run_case(session: Session, case: QaEvalCase) -> _CaseRun:
+    """Answer one case as `/qa` would, timing retrieval and generation separately."""
+    started = perf_counter()
+    retrieved = retrieve_chunks(
+        session,
+        case.question,
+        top_k=case.top_k,
+        ticker=case.ticker,
+        source=case.source,
+        date_from=case.date_from,
+        date_to=case.date_to,
+    )
+    retrieved_at = perf_counter()
+    result = answer_from_retrieved(case.question, retrieved)
+    finished = perf_counter()
+    return result, (retrieved_at - started) * 1000.0, (finished - retrieved_at) * 1000.0
+
+
+def _run_worker(
+    engine: Engine,
+    pending: Iterator[tuple[int, QaEvalCase]],
+    lock: threading.Lock,
+) -> list[tuple[int, _CaseRun]]:
+    done: list[tuple[int, _CaseRun]] = []
+    with Session(bind=engine, autoflush=False) as session:
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None:
+                return done
+            idx, case = item
+            done.append((idx, _run_case(session, case)))
 
 
-def evaluate_qa_cases(session: Session, cases: list[QaEvalCase]) -> QaEvalSummary:
+def _run_cases(session: Session, cases: list[QaEvalCase], parallelism: int) -> list[_CaseRun]:
+    """Run `cases` on up to `parallelism` workers, each with its own session."""
+    bind = session.get_bind()
+    # Sessions of other threads could not see a Connection's open transaction, and the
+    # Connection itself cannot be shared, so such sessions run serially.
+    if parallelism <= 1 or len(cases) <= 1 or not isinstance(bind, Engine):
+        return [_run_case(session, case) for case in cases]
+    # Workers pull the next case as they free up, so slow cases do not hold up a shard.
+    pending = iter(enumerate(cases))
+    lock = threading.Lock()
+    engine = bind
+    workers = min(parallelism, len(cases))
+    runs: dict[int, _CaseRun] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qa-eval") as pool:
+        futures = [pool.submit(_run_worker, engine, pending, lock) for _ in range(workers)]
+        for future in futures:
+            runs.update(future.result())
+    return [runs[idx] for idx in range(len(cases))]
+
+
+def evaluate_qa_cases(
+    session: Session, cases: list[QaEvalCase], *, parallelism: int | None = None
+) -> QaEvalSummary:
+    """Score `cases` against their citation and confidence thresholds.
+
+    Cases run concurrently on `parallelism` workers (default `QA_EVAL_PARALLELISM`), each
+    with its own session on `session`'s engine; a session bound to a Connection runs
+    them serially instead, so they see its transaction. The summary adds p50/p95/p99
+    latency of retrieval and of answer generation.
+    """
     if not cases:
         return QaEvalSummary(
             total_cases=0,
@@ -46,6 +140,8 @@ def evaluate_qa_cases(session: Session, cases: list[QaEvalCase]) -> QaEvalSummar
             citation_coverage=0.0,
             avg_confidence=0.0,
             cases=[],
+            retrieval_latency=LatencyPercentiles(),
+            generation_latency=LatencyPercentiles(),
         )
 
     case_results: list[QaEvalCaseResult] = []
@@ -53,16 +149,8 @@ def evaluate_qa_cases(session: Session, cases: list[QaEvalCase]) -> QaEvalSummar
     with_citations = 0
     confidence_sum = 0.0
 
-    for case in cases:
-        qa = answer_question(
-            session,
-            case.question,
-            top_k=case.top_k,
-            ticker=case.ticker,
-            source=case.source,
-            date_from=case.date_from,
-            date_to=case.date_to,
-        )
+    runs = _run_cases(session, cases, parallelism or get_settings().qa_eval_parallelism)
+    for case, (qa, retrieval_ms, generation_ms) in zip(cases, runs, strict=True):
         citation_count = len(qa.citations)
         confidence = qa.confidence
         with_citations += int(citation_count > 0)
@@ -86,6 +174,8 @@ def evaluate_qa_cases(session: Session, cases: list[QaEvalCase]) -> QaEvalSummar
                 citation_count=citation_count,
                 passed=passed,
                 reasons=reasons,
+                retrieval_ms=round(retrieval_ms, 3),
+                generation_ms=round(generation_ms, 3),
             )
         )
 
@@ -96,4 +186,6 @@ def evaluate_qa_cases(session: Session, cases: list[QaEvalCase]) -> QaEvalSummar
         citation_coverage=round(with_citations / total, 3),
         avg_confidence=round(confidence_sum / total, 3),
         cases=case_results,
+        retrieval_latency=LatencyPercentiles.of([item.retrieval_ms for item in case_results]),
+        generation_latency=LatencyPercentiles.of([item.generation_ms for item in case_results]),
     )
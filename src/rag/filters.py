@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import overload
+
+import numpy as np
+from sqlalchemy import Select
+
+from src.core.models import DocumentChunk
+
+
+@overload
+def to_naive_utc(value: datetime) -> datetime: ...
+
+
+@overload
+def to_naive_utc(value: None) -> None: ...
+
+
+def to_naive_utc(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+def to_datetime64(value: datetime | None) -> np.datetime64:
+    naive = to_naive_utc(value)
+    return np.datetime64("NaT", "us") if naive is None else np.datetime64(naive, "us")
+
+
+@dataclass(frozen=True)
+class RetrievalFilters:
+    ticker: str | None = None
+    source: str | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+
+    def apply(self, stmt: Select) -> Select:
+        if self.ticker:
+            stmt = stmt.where(DocumentChunk.ticker == self.ticker)
+        if self.source:
+            stmt = stmt.where(DocumentChunk.source == self.source)
+        if self.date_from:
+            stmt = stmt.where(DocumentChunk.published_at >= self.date_from)
+        if self.date_to:
+            stmt = stmt.where(DocumentChunk.published_at <= self.date_to)
+        return stmt
+
+    def matches(self, ticker: str | None, source: str, published_at: datetime | None) -> bool:
+        if self.ticker and ticker != self.ticker:
+            return False
+        if self.source and source != self.source:
+            return False
+        if self.date_from or self.date_to:
+            if published_at is None:
+                return False
+            published = to_naive_utc(published_at)
+            date_from = to_naive_utc(self.date_from)
+            date_to = to_naive_utc(self.date_to)
+            if date_from and published < date_from:
+                return False
+            if date_to and published > date_to:
+                return False
+        return True
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.ticker or self.source or self.date_from or self.date_to)
+
+
+class ChunkAttributes:
+    """Per-row ticker, source and publication date for an in-memory index.
+
+    Tickers and sources are stored as integer codes so a filter mask over a large
+    index is a handful of vectorized comparisons.
+    """
+
+    def __init__(self) -> None:
+        self._codes: dict[str | None, int] = {}
+        self.tickers = np.empty(0, dtype=np.int32)
+        self.sources = np.empty(0, dtype=np.int32)
+        self.published = np.empty(0, dtype="datetime64[us]")
+
+    def __len__(self) -> int:
+        return int(self.tickers.shape[0])
+
+    @property
+    def values(self) -> list[str | None]:
+        """Distinct ticker/source values, indexed by their code."""
+        return list(self._codes)
+
+    @classmethod
+    def from_codes(
+        cls,
+        values: list[str | None],
+        tickers: np.ndarray,
+        sources: np.ndarray,
+        published: np.ndarray,
+    ) -> ChunkAttributes:
+        attributes = cls()
+        attributes._codes = {value: code for code, value in enumerate(values)}
+        attributes.tickers = np.asarray(tickers, dtype=np.int32)
+        attributes.sources = np.asarray(sources, dtype=np.int32)
+        attributes.published = np.asarray(published, dtype="datetime64[us]")
+        return attributes
+
+    def copy(self) -> ChunkAttributes:
+        return ChunkAttributes.from_codes(
+            self.values, self.tickers.copy(), self.sources.copy(), self.published.copy()
+        )
+
+    def take(self, rows: np.ndarray) -> ChunkAttributes:
+        return ChunkAttributes.from_codes(
+            self.values, self.tickers[rows], self.sources[rows], self.published[rows]
+        )
+
+    @classmethod
+    def concat(cls, parts: list[ChunkAttributes]) -> ChunkAttributes:
+        """Stack attribute tables, re-coding values into one shared code space."""
+        merged = cls()
+        tickers, sources, published = [merged.tickers], [merged.sources], [merged.published]
+        for part in parts:
+            remap = merged._encode(part.values)
+            tickers.append(remap[part.tickers])
+            sources.append(remap[part.sources])
+            published.append(part.published)
+        merged.tickers = np.concatenate(tickers)
+        merged.sources = np.concatenate(sources)
+        merged.published = np.concatenate(published)
+        return merged
+
+    def _encode(self, values: Sequence[str | None]) -> np.ndarray:
+        return np.array(
+            [self._codes.setdefault(value, len(self._codes)) for value in values], dtype=np.int32
+        )
+
+    def append(
+        self,
+        tickers: list[str | None],
+        sources: list[str],
+        published_ats: list[datetime | None],
+    ) -> None:
+        self.tickers = np.concatenate([self.tickers, self._encode(tickers)])
+        self.sources = np.concatenate([self.sources, self._encode(sources)])
+        self.published = np.concatenate(
+            [self.published, np.array([to_datetime64(value) for value in published_ats])]
+        )
+
+    def mask(self, filters: RetrievalFilters) -> np.ndarray | None:
+        """Boolean mask of rows matching `filters`, or None when nothing is filtered."""
+        if filters.is_empty:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for value, codes in ((filters.ticker, self.tickers), (filters.source, self.sources)):
+            if value:
+                code = self._codes.get(value)
+                if code is None:
+                    return np.zeros(len(self), dtype=bool)
+                mask &= codes == code
+        if filters.date_from:
+            mask &= self.published >= to_datetime64(filters.date_from)
+        if filters.date_to:
+            mask &= self.published <= to_datetime64(filters.date_to)
+        return mask
@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import accumulate, chain
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.models import DocumentChunk
+from src.rag.filters import ChunkAttributes, RetrievalFilters
+from src.rag.tokenizer import get_tokenizer, tokenize
+
+
+@dataclass
+class IndexedChunk:
+    chunk_id: str
+    ticker: str | None
+    source: str
+    published_at: datetime | None
+    length: int
+
+
+@dataclass
+class CorpusStats:
+    """BM25 collection statistics for a whole corpus.
+
+    An index holding one shard of the corpus scores with these instead of its own
+    counts, so scores from different shards are comparable and merge exactly.
+    """
+
+    documents: int = 0
+    total_length: int = 0
+    document_frequencies: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def avg_doc_len(self) -> float:
+        return self.total_length / self.documents if self.documents else 0.0
+
+    def idf(self, term: str) -> float:
+        df = self.document_frequencies.get(term, 0)
+        return math.log(1.0 + (self.documents - df + 0.5) / (df + 0.5))
+
+    def add_document(self, counts: dict[str, int]) -> None:
+        self.documents += 1
+        self.total_length += sum(counts.values())
+        frequencies = self.document_frequencies
+        for term in counts:
+            frequencies[term] = frequencies.get(term, 0) + 1
+
+    def merge(self, other: CorpusStats) -> None:
+        self.documents += other.documents
+        self.total_length += other.total_length
+        frequencies = self.document_frequencies
+        for term, df in other.document_frequencies.items():
+            frequencies[term] = frequencies.get(term, 0) + df
+
+    def restrict(self, terms: Iterable[str]) -> CorpusStats:
+        """Copy carrying only the document frequencies of `terms`."""
+        frequencies = self.document_frequencies
+        return CorpusStats(
+            documents=self.documents,
+            total_length=self.total_length,
+            document_frequencies={t: frequencies[t] for t in terms if t in frequencies},
+        )
+
+
+class InvertedIndex:
+    """Posting-list BM25 index answering top-k queries with MaxScore dynamic pruning.
+
+    Documents are numbered in insertion order, so every posting list is sorted by
+    document number and can be advanced with a binary search.
+    """
+
+    def __init__(self, *, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.high_water_mark = 0
+        self._docs: list[IndexedChunk] = []
+        self._doc_numbers: dict[str, int] = {}
+        self._postings: dict[str, tuple[list[int], list[int]]] = {}
+        self._max_tf: dict[str, int] = {}
+        self._min_len: dict[str, int] = {}
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def last_chunk_id(self) -> str | None:
+        return self._docs[-1].chunk_id if self._docs else None
+
+    @property
+    def avg_doc_len(self) -> float:
+        return self._total_len / len(self._docs) if self._docs else 0.0
+
+    def add(
+        self,
+        chunk_id: str,
+        text: str,
+        *,
+        ticker: str | None = None,
+        source: str = "",
+        published_at: datetime | None = None,
+    ) -> dict[str, int] | None:
+        """Index `text`; returns its term counts, or None if `chunk_id` is already indexed."""
+        counts = get_tokenizer().term_counts(text)
+        length = sum(counts.values())
+        with self._lock:
+            if chunk_id in self._doc_numbers:
+                return None
+            doc = len(self._docs)
+            self._docs.append(
+                IndexedChunk(
+                    chunk_id=chunk_id,
+                    ticker=ticker,
+                    source=source,
+                    published_at=published_at,
+                    length=length,
+                )
+            )
+            self._doc_numbers[chunk_id] = doc
+            self._total_len += length
+            for term, tf in counts.items():
+                docs, tfs = self._postings.setdefault(term, ([], []))
+                docs.append(doc)
+                tfs.append(tf)
+                self._max_tf[term] = max(self._max_tf.get(term, 0), tf)
+                self._min_len[term] = min(self._min_len.get(term, length), length)
+        return counts
+
+    def state(self) -> dict[str, np.ndarray]:
+        """Documents, corpus statistics and flattened posting lists as arrays."""
+        with self._lock:
+            attributes = ChunkAttributes()
+            attributes.append(
+                [doc.ticker for doc in self._docs],
+                [doc.source for doc in self._docs],
+                [doc.published_at for doc in self._docs],
+            )
+            terms = list(self._postings)
+            total = sum(len(self._postings[term][0]) for term in terms)
+            return {
+                "params": np.array([self.k1, self.b]),
+                "high_water_mark": np.array(self.high_water_mark),
+                "chunk_ids": np.array([doc.chunk_id for doc in self._docs], dtype=np.str_),
+                "lengths": np.array([doc.length for doc in self._docs], dtype=np.int32),
+                "values": np.array(
+                    ["" if value is None else value for value in attributes.values], dtype=np.str_
+                ),
+                "null_value": np.array(
+                    [value is None for value in attributes.values], dtype=bool
+                ),
+                "tickers": attributes.tickers,
+                "sources": attributes.sources,
+                "published": attributes.published,
+                "terms": np.array(terms, dtype=np.str_),
+                "posting_lengths": np.array(
+                    [len(self._postings[term][0]) for term in terms], dtype=np.int64
+                ),
+                "posting_docs": np.fromiter(
+                    chain.from_iterable(self._postings[t][0] for t in terms), np.int32, total
+                ),
+                "posting_tfs": np.fromiter(
+                    chain.from_iterable(self._postings[t][1] for t in terms), np.int32, total
+                ),
+            }
+
+    @classmethod
+    def from_state(cls, state: dict[str, np.ndarray]) -> InvertedIndex:
+        k1, b = state["params"].tolist()
+        index = cls(k1=k1, b=b)
+        index.high_water_mark = int(state["high_water_mark"])
+        values = [
+            None if null else value
+            for value, null in zip(state["values"].tolist(), state["null_value"], strict=True)
+        ]
+        lengths = state["lengths"]
+        published = state["published"].astype("datetime64[us]").tolist()
+        index._docs = [
+            IndexedChunk(
+                chunk_id=chunk_id,
+                ticker=values[ticker],
+                source=values[source],
+                published_at=published_at,
+                length=length,
+            )
+            for chunk_id, ticker, source, published_at, length in zip(
+                state["chunk_ids"].tolist(),
+                state["tickers"].tolist(),
+                state["sources"].tolist(),
+                published,
+                lengths.tolist(),
+                strict=True,
+            )
+        ]
+        index._doc_numbers = {doc.chunk_id: number for number, doc in enumerate(index._docs)}
+        index._total_len = int(lengths.sum())
+
+        offsets = np.concatenate([[0], np.cumsum(state["posting_lengths"])])
+        docs, tfs = state["posting_docs"], state["posting_tfs"]
+        starts = offsets[:-1]
+        nonempty = state["posting_lengths"] > 0
+        max_tf = np.zeros(len(starts), dtype=np.int64)
+        min_len = np.zeros(len(starts), dtype=np.int64)
+        if docs.size:
+            max_tf[nonempty] = np.maximum.reduceat(tfs, starts[nonempty])
+            min_len[nonempty] = np.minimum.reduceat(lengths[docs], starts[nonempty])
+        doc_lists, tf_lists = docs.tolist(), tfs.tolist()
+        for i, term in enumerate(state["terms"].tolist()):
+            lo, hi = int(offsets[i]), int(offsets[i + 1])
+            index._postings[term] = (doc_lists[lo:hi], tf_lists[lo:hi])
+            index._max_tf[term] = int(max_tf[i])
+            index._min_len[term] = int(min_len[i])
+        return index
+
+    def refresh(self, session: Session, *, batch_size: int = 1000) -> int:
+        """Index chunks stored after the current high-water mark; returns rows added."""
+        added = 0
+        with self._lock:
+            while True:
+                rows = session.execute(
+                    select(
+                        DocumentChunk.id,
+                        DocumentChunk.chunk_id,
+                        DocumentChunk.content,
+                        DocumentChunk.ticker,
+                        DocumentChunk.source,
+                        DocumentChunk.published_at,
+                    )
+                    .where(DocumentChunk.id > self.high_water_mark)
+                    .order_by(DocumentChunk.id)
+                    .limit(batch_size)
+                ).all()
+                for row in rows:
+                    self.add(
+                        row.chunk_id,
+                        row.content,
+                        ticker=row.ticker,
+                        source=row.source,
+                        published_at=row.published_at,
+                    )
+                if rows:
+                    self.high_water_mark = rows[-1].id
+                    added += len(rows)
+                if len(rows) < batch_size:
+                    return added
+
+    def _idf(self, term: str) -> float:
+        df = len(self._postings[term][0])
+        n = len(self._docs)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def _tf_weight(self, tf: int, length: int, avg_len: float) -> float:
+        norm = 1.0 - self.b + self.b * (length / avg_len if avg_len else 0.0)
+        return (tf * (self.k1 + 1.0)) / (tf + self.k1 * norm)
+
+    def _upper_bound(self, term: str, idf: float, avg_len: float) -> float:
+        # The BM25 term weight grows with tf and shrinks with length, so the largest tf
+        # paired with the shortest document bounds every posting of the term.
+        return idf * self._tf_weight(
+            self._max_tf[term], self._min_len[term], avg_len
+        )
+
+    def _matches(self, doc: int, filters: RetrievalFilters | None) -> bool:
+        if filters is None or filters.is_empty:
+            return True
+        entry = self._docs[doc]
+        return filters.matches(entry.ticker, entry.source, entry.published_at)
+
+    def search(
+        self,
+        query: str,
+        *,
+        top_k: int = 5,
+        filters: RetrievalFilters | None = None,
+        corpus: CorpusStats | None = None,
+    ) -> list[tuple[str, float]]:
+        """Top-k BM25 hits; `corpus` replaces this index's own collection statistics."""
+        with self._lock:
+            terms = [t for t in dict.fromkeys(tokenize(query)) if t in self._postings]
+            if not terms or top_k <= 0:
+                return []
+            avg_len = corpus.avg_doc_len if corpus is not None else self.avg_doc_len
+            idf: Callable[[str], float] = corpus.idf if corpus is not None else self._idf
+            bounds = {term: self._upper_bound(term, idf(term), avg_len) for term in terms}
+            terms.sort(key=bounds.__getitem__)
+            prefix_bounds = list(accumulate(bounds[term] for term in terms))
+            idfs = [idf(term) for term in terms]
+            postings = [self._postings[term] for term in terms]
+            cursors = [0] * len(terms)
+
+            heap: list[tuple[float, int]] = []
+            threshold = 0.0
+            # Lists before `first_essential` cannot lift a document above the current
+            # threshold on their own, so candidates are only drawn from the rest.
+            first_essential = 0
+            while first_essential < len(terms):
+                candidate = -1
+                for i in range(first_essential, len(terms)):
+                    docs = postings[i][0]
+                    if cursors[i] < len(docs) and (candidate < 0 or docs[cursors[i]] < candidate):
+                        candidate = docs[cursors[i]]
+                if candidate < 0:
+                    break
+
+                length = self._docs[candidate].length
+                matched = self._matches(candidate, filters)
+                score = 0.0
+                for i in range(first_essential, len(terms)):
+                    docs, tfs = postings[i]
+                    cursor = cursors[i]
+                    if cursor < len(docs) and docs[cursor] == candidate:
+                        if matched:
+                            score += idfs[i] * self._tf_weight(tfs[cursor], length, avg_len)
+                        cursors[i] = cursor + 1
+                if not matched:
+                    continue
+
+                for i in range(first_essential - 1, -1, -1):
+                    if score + prefix_bounds[i] <= threshold:
+                        break
+                    docs, tfs = postings[i]
+                    cursor = bisect_left(docs, candidate, cursors[i])
+                    cursors[i] = cursor
+                    if cursor < len(docs) and docs[cursor] == candidate:
+                        score += idfs[i] * self._tf_weight(tfs[cursor], length, avg_len)
+
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (score, -candidate))
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, (score, -candidate))
+                else:
+                    continue
+                if len(heap) == top_k:
+                    threshold = heap[0][0]
+                    while (
+                        first_essential < len(terms)
+                        and prefix_bounds[first_essential] <= threshold
+                    ):
+                        first_essential += 1
+
+            ranked = sorted(heap, key=lambda item: (-item[0], -item[1]))
+            return [(self._docs[-neg_doc].chunk_id, score) for score, neg_doc in ranked]
+
+    def search_exhaustive(
+        self,
+        query: str,
+        *,
+        top_k: int = 5,
+        filters: RetrievalFilters | None = None,
+        corpus: CorpusStats | None = None,
+    ) -> list[tuple[str, float]]:
+        """Score every posting without pruning; used to verify `search`."""
+        with self._lock:
+            terms = [t for t in dict.fromkeys(tokenize(query)) if t in self._postings]
+            avg_len = corpus.avg_doc_len if corpus is not None else self.avg_doc_len
+            scores: dict[int, float] = {}
+            for term in terms:
+                idf = corpus.idf(term) if corpus is not None else self._idf(term)
+                docs, tfs = self._postings[term]
+                for doc, tf in zip(docs, tfs, strict=True):
+                    if not self._matches(doc, filters):
+                        continue
+                    weight = idf * self._tf_weight(tf, self._docs[doc].length, avg_len)
+                    scores[doc] = scores.get(doc, 0.0) + weight
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+            return [(self._docs[doc].chunk_id, score) for doc, score in ranked]
+
+
+_index: InvertedIndex | None = None
+_index_lock = threading.Lock()
+
+
+def set_inverted_index(index: InvertedIndex | None) -> None:
+    """Install `index` (e.g. loaded from a snapshot) as the process-wide index."""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def get_inverted_index(session: Session) -> InvertedIndex:
+    """Return the process-wide index, first catching up with newly ingested chunks."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = InvertedIndex()
+        index = _index
+    index.refresh(session)
+    return index
@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from src.common.logging import get_logger
+from src.common.settings import get_settings
+from src.rag.dense_index import DenseVectorIndex, _grow_rows, get_dense_index
+from src.rag.filters import RetrievalFilters
+from src.rag.sparse_matrix import _grow, top_k_indices
+
+_ASSIGN_BLOCK_ROWS = 16_384
+
+logger = get_logger("ivf_index")
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_BLOCK_ROWS):
+        block = vectors[start : start + _ASSIGN_BLOCK_ROWS]
+        assignments[start : start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, n_clusters: int, *, iterations: int = 20, seed: int = 0
+) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, min(n_clusters, vectors.shape[0]))
+    centroids = vectors[rng.choice(vectors.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest_centroids(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        clusters, starts = np.unique(assignments[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[clusters] = np.add.reduceat(vectors[order], starts, axis=0)
+        empty = np.ones(n_clusters, dtype=bool)
+        empty[clusters] = False
+        if empty.any():
+            # Re-seed empty clusters from random points so every list stays useful.
+            sums[empty] = vectors[rng.choice(vectors.shape[0], int(empty.sum()))]
+        updated = _normalize_rows(sums)
+        if np.allclose(updated, centroids, atol=1e-6):
+            return updated
+        centroids = updated
+    return centroids
+
+
+def _write_arrays(path: Path, arrays: dict[str, Any]) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("wb") as handle:
+        np.savez(handle, **arrays)
+    os.replace(tmp_path, path)
+
+
+def default_list_count(rows: int) -> int:
+    return max(1, min(rows, int(4 * np.sqrt(rows))))
+
+
+class IvfIndex:
+    """Inverted-file approximate nearest-neighbour index over unit vectors.
+
+    Vectors are assigned to their most similar coarse centroid and stored per list
+    together with their external row numbers. A query scores the centroids, then
+    scans only the `nprobe` closest lists.
+    """
+
+    def __init__(self, centroids: np.ndarray, *, nprobe: int = 8) -> None:
+        self.centroids = centroids.astype(np.float32, copy=False)
+        self.nprobe = nprobe
+        dimension = self.centroids.shape[1]
+        self._vectors = [np.empty((0, dimension), dtype=np.float32) for _ in self.centroids]
+        self._rows = [np.empty(0, dtype=np.int64) for _ in self.centroids]
+        self._sizes = np.zeros(len(self.centroids), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self._sizes.sum())
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def list_sizes(self) -> np.ndarray:
+        return self._sizes.copy()
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        *,
+        n_lists: int | None = None,
+        nprobe: int = 8,
+        max_training_rows: int = 100_000,
+        seed: int = 0,
+    ) -> IvfIndex:
+        """Fit centroids on (a sample of) `vectors` without adding them."""
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if vectors.shape[0] > max_training_rows:
+            sample = vectors[rng.choice(vectors.shape[0], max_training_rows, replace=False)]
+        n_lists = n_lists or default_list_count(vectors.shape[0])
+        return cls(spherical_kmeans(sample, n_lists, seed=seed), nprobe=nprobe)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, **kwargs) -> IvfIndex:
+        index = cls.train(vectors, **kwargs)
+        index.add(vectors)
+        return index
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray | None = None) -> None:
+        """Add vectors under `rows` (default: consecutive numbers after the current size)."""
+        if rows is None:
+            rows = np.arange(len(self), len(self) + vectors.shape[0], dtype=np.int64)
+        assignments = _nearest_centroids(vectors, self.centroids)
+        order = np.argsort(assignments, kind="stable")
+        lists, starts = np.unique(assignments[order], return_index=True)
+        for list_id, members in zip(lists, np.split(order, starts[1:]), strict=True):
+            size = self._sizes[list_id]
+            end = size + members.shape[0]
+            self._vectors[list_id] = _grow_rows(self._vectors[list_id], end)
+            self._rows[list_id] = _grow(self._rows[list_id], end)
+            self._vectors[list_id][size:end] = vectors[members]
+            self._rows[list_id][size:end] = rows[members]
+            self._sizes[list_id] = end
+
+    def search(
+        self,
+        queries: np.ndarray,
+        *,
+        top_k: int = 10,
+        nprobe: int | None = None,
+        mask: np.ndarray | None = None,
+    ) -> list[list[tuple[int, float]]]:
+        """(row, score) pairs per query, best first; `mask` is indexed by row number.
+
+        With a mask, probing continues past `nprobe` lists (closest first) until
+        `top_k` rows pass it, so a selective filter widens towards exact search
+        instead of coming back short.
+        """
+        nprobe = nprobe or self.nprobe
+        results: list[list[tuple[int, float]]] = []
+        for query in np.atleast_2d(queries).astype(np.float32, copy=False):
+            row_parts: list[np.ndarray] = []
+            vector_parts: list[np.ndarray] = []
+            passing = 0
+            for probed, list_id in enumerate(np.argsort(-(self.centroids @ query))):
+                if probed >= nprobe and (mask is None or passing >= top_k):
+                    break
+                size = self._sizes[list_id]
+                rows, vectors = self._rows[list_id][:size], self._vectors[list_id][:size]
+                if mask is not None:
+                    keep = mask[rows]
+                    rows, vectors = rows[keep], vectors[keep]
+                row_parts.append(rows)
+                vector_parts.append(vectors)
+                passing += rows.shape[0]
+            if not passing:
+                results.append([])
+                continue
+            rows = np.concatenate(row_parts)
+            scores = np.concatenate(vector_parts) @ query
+            results.append(
+                [(int(rows[i]), float(scores[i])) for i in top_k_indices(scores, top_k)]
+            )
+        return results
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """The index as named arrays, in the layout `save` writes and `load` reads."""
+        sizes = self._sizes.copy()
+        return {
+            "centroids": self.centroids,
+            "nprobe": np.array(self.nprobe),
+            "sizes": sizes,
+            "vectors": np.concatenate([v[:s] for v, s in zip(self._vectors, sizes, strict=True)]),
+            "rows": np.concatenate([r[:s] for r, s in zip(self._rows, sizes, strict=True)]),
+        }
+
+    def save(self, path: Path | str, **extra: np.ndarray) -> None:
+        """Atomically write the index (plus any `extra` arrays) as one `.npz` file."""
+        _write_arrays(Path(path), {**self.arrays(), **extra})
+
+    @classmethod
+    def load(cls, path: Path | str) -> tuple[IvfIndex, dict[str, np.ndarray]]:
+        """Read a saved index; returns it with the `extra` arrays it was saved with."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        index = cls(arrays.pop("centroids"), nprobe=int(arrays.pop("nprobe")))
+        sizes = arrays.pop("sizes")
+        vectors, rows = arrays.pop("vectors"), arrays.pop("rows")
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        for list_id in range(index.n_lists):
+            index._vectors[list_id] = vectors[bounds[list_id] : bounds[list_id + 1]].copy()
+            index._rows[list_id] = rows[bounds[list_id] : bounds[list_id + 1]].copy()
+        index._sizes = sizes.astype(np.int64)
+        return index, arrays
+
+
+class DenseIvfIndex:
+    """IVF index kept in step with the process-wide dense index.
+
+    Rows are dense-index row numbers. Queries only assign newly ingested rows to
+    their closest list; fitting the centroids (on first use, and again once the
+    corpus has grown to `retrain_factor` times the rows they were fit on) and saving
+    to `path` happen in `maintain`, which a background thread runs. Until the first
+    fit is done, queries fall back to exact search over the dense index. A saved
+    index is reused on start-up when its chunk ids still match the dense index.
+    """
+
+    def __init__(
+        self,
+        *,
+        n_lists: int = 0,
+        nprobe: int = 8,
+        path: str = "",
+        retrain_factor: float = 4.0,
+        background: bool = True,
+    ) -> None:
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.path = Path(path) if path else None
+        self.retrain_factor = retrain_factor
+        self.index: IvfIndex | None = None
+        self.trained_rows = 0
+        self._dense: DenseVectorIndex | None = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._maintain_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        if background:
+            self._thread = threading.Thread(
+                target=self._run, name="ivf-maintenance", daemon=True
+            )
+            self._thread.start()
+
+    def _load(self, dense: DenseVectorIndex) -> IvfIndex | None:
+        if self.path is None or not self.path.exists():
+            return None
+        index, extra = IvfIndex.load(self.path)
+        saved_ids = extra["chunk_ids"].tolist()
+        if (
+            str(extra["model_name"]) != dense.provider.model_name
+            or saved_ids != dense.chunk_ids[: len(saved_ids)]
+        ):
+            return None
+        self.trained_rows = int(extra["trained_rows"])
+        return index
+
+    def _needs_training(self, rows: int) -> bool:
+        return rows > 0 and (self.index is None or rows > self.retrain_factor * self.trained_rows)
+
+    def sync(self, dense: DenseVectorIndex) -> IvfIndex | None:
+        """Assign rows added to `dense` since the last call; None until first trained."""
+        with self._lock:
+            if dense is not self._dense:
+                # A new dense index (e.g. a freshly published vector-store version) keeps
+                # the same row order, so the lists survive unless the prefix differs.
+                previous = self._dense
+                kept = len(self.index) if self.index is not None else 0
+                if (
+                    not kept
+                    or previous is None
+                    or previous.chunk_ids[:kept] != dense.chunk_ids[:kept]
+                ):
+                    self.index = self._load(dense)
+                self._dense = dense
+            rows = len(dense)
+            if self.index is not None and len(self.index) < rows:
+                self.index.add(dense.vectors_from(len(self.index)))
+                self._dirty = True
+            if self._dirty or self._needs_training(rows):
+                self._wake.set()
+            return self.index
+
+    def maintain(self) -> None:
+        """Fit the centroids if due, then save the index if it changed since the last save."""
+        with self._maintain_lock:
+            with self._lock:
+                dense = self._dense
+                due = dense is not None and self._needs_training(len(dense))
+            if due and dense is not None:
+                vectors = dense.vectors
+                trained = vectors.shape[0]
+                trained_ids = dense.chunk_ids[:trained]
+                index = IvfIndex.build(vectors, n_lists=self.n_lists or None, nprobe=self.nprobe)
+                with self._lock:
+                    current = self._dense
+                    # Rows ingested while training are assigned now; a dense index
+                    # that reordered its rows in the meantime gets a fresh fit later.
+                    if current is not None and current.chunk_ids[:trained] == trained_ids:
+                        if len(current) > trained:
+                            index.add(current.vectors_from(trained))
+                        self.index, self.trained_rows, self._dirty = index, trained, True
+            with self._lock:
+                dense = self._dense
+                if not self._dirty or self.path is None or self.index is None or dense is None:
+                    return
+                rows = len(self.index)
+                arrays = {
+                    **self.index.arrays(),
+                    "chunk_ids": np.array(dense.chunk_ids[:rows], dtype=np.str_),
+                    "model_name": np.array(dense.provider.model_name),
+                    "trained_rows": np.array(self.trained_rows),
+                }
+                self._dirty = False
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            _write_arrays(self.path, arrays)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=5.0)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception("ivf_maintenance_failed")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+
+    def search_many(
+        self,
+        dense: DenseVectorIndex,
+        queries: np.ndarray,
+        *,
+        top_ks: list[int],
+        filters: RetrievalFilters,
+    ) -> list[list[tuple[str, float]]]:
+        index = self.sync(dense)
+        if index is None:
+            return dense.search_many(queries, top_ks=top_ks, filters=filters)
+        hits = index.search(
+            queries,
+            top_k=max(top_ks, default=0),
+            nprobe=self.nprobe,
+            mask=dense.attributes.mask(filters),
+        )
+        return [
+            [(dense.chunk_ids[row], score) for row, score in query_hits[:k] if score > 0]
+            for query_hits, k in zip(hits, top_ks, strict=True)
+        ]
+
+
+_ivf: DenseIvfIndex | None = None
+_ivf_lock = threading.Lock()
+
+
+def get_ivf_index(session: Session) -> tuple[DenseIvfIndex, DenseVectorIndex]:
+    """Return the process-wide IVF index and the dense index its rows point into."""
+    global _ivf
+    settings = get_settings()
+    with _ivf_lock:
+        if _ivf is None:
+            _ivf = DenseIvfIndex(
+                n_lists=settings.ivf_n_lists,
+                nprobe=settings.ivf_nprobe,
+                path=settings.ivf_index_path,
+            )
+        ivf = _ivf
+    ivf.nprobe = settings.ivf_nprobe
+    dense = get_dense_index(session)
+    return ivf, dense
+
+
+def close_ivf_index() -> None:
+    """Stop the IVF maintenance thread; the next `get_ivf_index` starts a new index."""
+    global _ivf
+    with _ivf_lock:
+        if _ivf is not None:
+            _ivf.close()
+        _ivf = None
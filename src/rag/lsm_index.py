@@ -0,0 +1,488 @@
+from __future__ import annotations
+
+import fcntl
+import heapq
+import json
+import math
+import os
+import shutil
+import threading
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.common.logging import get_logger
+from src.common.settings import get_settings
+from src.core.models import DocumentChunk
+from src.rag.dense_index import _grow_rows, get_dense_provider
+from src.rag.embeddings import DenseEmbeddingProvider
+from src.rag.filters import ChunkAttributes, RetrievalFilters
+from src.rag.sparse_matrix import top_k_indices
+
+MANIFEST = "MANIFEST.json"
+# Held for its lifetime by the one index allowed to write a directory.
+WRITER_LOCK = "WRITER.lock"
+# Held exclusively while the manifest is replaced or merged segments are removed, and
+# shared while a manifest and its segments are loaded.
+MANIFEST_LOCK = "MANIFEST.lock"
+
+logger = get_logger("lsm_index")
+
+
+@contextmanager
+def _flocked(path: Path, operation: int) -> Iterator[None]:
+    with open(path, "ab") as handle:
+        fcntl.flock(handle, operation)
+        yield
+
+
+def _try_writer_lock(path: Path) -> BinaryIO | None:
+    handle = open(path, "ab")  # held open, and the lock with it, until the index closes
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    return handle
+
+
+@dataclass(frozen=True)
+class LsmSegment:
+    """Immutable run of chunk vectors."""
+
+    segment_id: int
+    chunk_ids: list[str]
+    vectors: np.ndarray
+    attributes: ChunkAttributes
+    high_water_mark: int
+    path: Path | None = None
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def write(self, directory: Path) -> LsmSegment:
+        """Persist to `directory` and return the memory-mapped copy."""
+        staging = directory.with_name(f".{directory.name}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        np.save(staging / "vectors.npy", np.ascontiguousarray(self.vectors, dtype=np.float32))
+        np.save(staging / "chunk_ids.npy", np.array(self.chunk_ids, dtype=np.str_))
+        np.savez(
+            staging / "attributes.npz",
+            tickers=self.attributes.tickers,
+            sources=self.attributes.sources,
+            published=self.attributes.published,
+        )
+        (staging / "values.json").write_text(json.dumps(self.attributes.values), encoding="utf-8")
+        if directory.exists():
+            # Left behind by a write that crashed before the manifest recorded it.
+            shutil.rmtree(directory)
+        os.replace(staging, directory)
+        return LsmSegment.read(directory, self.segment_id, self.high_water_mark)
+
+    @classmethod
+    def read(cls, directory: Path, segment_id: int, high_water_mark: int) -> LsmSegment:
+        values = json.loads((directory / "values.json").read_text(encoding="utf-8"))
+        with np.load(directory / "attributes.npz") as arrays:
+            attributes = ChunkAttributes.from_codes(
+                values, arrays["tickers"], arrays["sources"], arrays["published"]
+            )
+        return cls(
+            segment_id=segment_id,
+            chunk_ids=np.load(directory / "chunk_ids.npy").tolist(),
+            vectors=np.load(directory / "vectors.npy", mmap_mode="r"),
+            attributes=attributes,
+            high_water_mark=high_water_mark,
+            path=directory,
+        )
+
+
+class _MemTable:
+    def __init__(self, dimension: int) -> None:
+        self.chunk_ids: list[str] = []
+        self.attributes = ChunkAttributes()
+        self.high_water_mark = 0
+        self._vectors = np.empty((0, dimension), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: len(self.chunk_ids)]
+
+    def append(self, chunk_ids, vectors, tickers, sources, published_ats) -> None:
+        start = len(self.chunk_ids)
+        self._vectors = _grow_rows(self._vectors, start + len(chunk_ids))
+        self._vectors[start : start + len(chunk_ids)] = vectors
+        self.chunk_ids.extend(chunk_ids)
+        self.attributes.append(tickers, sources, published_ats)
+
+    def seal(self, segment_id: int) -> LsmSegment:
+        return LsmSegment(
+            segment_id=segment_id,
+            chunk_ids=self.chunk_ids,
+            vectors=self.vectors.copy(),
+            attributes=self.attributes,
+            high_water_mark=self.high_water_mark,
+        )
+
+
+class LsmVectorIndex:
+    """Log-structured dense index: a mutable memtable plus immutable segments.
+
+    New chunks go to the memtable and are searchable at once. A full memtable is
+    sealed into a segment, which a background thread writes to `directory` and swaps
+    for a memory-mapped copy. The same thread merges segments once `merge_factor` of
+    them share a size tier, so the number of segments a query scans grows only
+    logarithmically with the corpus. Chunks are immutable and their ids unique, so
+    rows are only ever appended: `delete` and re-appending an indexed chunk raise.
+
+    The manifest (segments and high-water mark) is rewritten atomically after every
+    flush and merge; memtable rows are replayed from the database on restart. Segment
+    directories carry a per-index suffix, so ids reused after a crash never collide.
+
+    Only one index writes a directory at a time; it holds `WRITER_LOCK` until `close`.
+    Other processes sharing the directory (API workers) load its segments under
+    `MANIFEST_LOCK`, so they never see a half-merged set, and then keep newer chunks
+    in memory only (`read_only`).
+    """
+
+    def __init__(
+        self,
+        provider: DenseEmbeddingProvider,
+        *,
+        directory: str = "",
+        memtable_rows: int = 2000,
+        merge_factor: int = 4,
+        background: bool = True,
+    ) -> None:
+        self.provider = provider
+        self.directory = Path(directory) if directory else None
+        self.memtable_rows = memtable_rows
+        self.merge_factor = merge_factor
+        self.segments: list[LsmSegment] = []
+        self._memtable = _MemTable(provider.dimension)
+        self._writer = uuid.uuid4().hex[:8]
+        self._next_segment_id = 1
+        self._durable_high_water_mark = 0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._indexed: set[str] = set()
+        self._writer_lock: BinaryIO | None = None
+        self.read_only = False
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._writer_lock = _try_writer_lock(self.directory / WRITER_LOCK)
+            shared = self._writer_lock is None
+            with _flocked(
+                self.directory / MANIFEST_LOCK, fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            ):
+                self._load()
+            if shared:
+                logger.info("lsm_directory_read_only", directory=str(self.directory))
+                self.read_only = True
+                self.directory = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="lsm-compaction", daemon=True)
+            self._thread.start()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(segment) for segment in self.segments) + len(self._memtable)
+
+    @property
+    def high_water_mark(self) -> int:
+        return self._memtable.high_water_mark
+
+    @property
+    def memtable_size(self) -> int:
+        return len(self._memtable)
+
+    # -- writes ---------------------------------------------------------------
+
+    def append(
+        self,
+        chunk_ids: list[str],
+        vectors: np.ndarray,
+        *,
+        tickers: list[str | None],
+        sources: list[str],
+        published_ats: list,
+        high_water_mark: int | None = None,
+    ) -> None:
+        """Add chunks to the memtable, sealing it once it is full.
+
+        Raises ValueError for chunks already indexed: replacing a chunk is not supported.
+        """
+        with self._lock:
+            replaced = self._indexed.intersection(chunk_ids)
+            if replaced:
+                raise ValueError(f"chunks are append-only; already indexed: {sorted(replaced)}")
+            self._indexed.update(chunk_ids)
+            self._memtable.append(chunk_ids, vectors, tickers, sources, published_ats)
+            if high_water_mark is not None:
+                self._memtable.high_water_mark = high_water_mark
+            if len(self._memtable) >= self.memtable_rows:
+                self._seal()
+
+    def delete(self, chunk_ids: list[str]) -> None:
+        """Not supported: chunks are never deleted, so the index keeps no tombstones."""
+        raise NotImplementedError("LsmVectorIndex is append-only; chunks cannot be deleted")
+
+    def _seal(self) -> None:
+        segment = self._memtable.seal(self._next_segment_id)
+        self._next_segment_id += 1
+        self.segments.append(segment)
+        hwm = self._memtable.high_water_mark
+        self._memtable = _MemTable(self.provider.dimension)
+        self._memtable.high_water_mark = hwm
+        self._wake.set()
+        if self._thread is None:
+            self.maintain()
+
+    def refresh(self, session: Session, *, batch_size: int = 1000) -> int:
+        """Append chunks stored after the high-water mark; returns rows added."""
+        added = 0
+        with self._refresh_lock:
+            while True:
+                rows = session.execute(
+                    select(
+                        DocumentChunk.id,
+                        DocumentChunk.chunk_id,
+                        DocumentChunk.content,
+                        DocumentChunk.ticker,
+                        DocumentChunk.source,
+                        DocumentChunk.published_at,
+                    )
+                    .where(DocumentChunk.id > self.high_water_mark)
+                    .order_by(DocumentChunk.id)
+                    .limit(batch_size)
+                ).all()
+                if rows:
+                    self.append(
+                        [row.chunk_id for row in rows],
+                        self.provider.embed_many([row.content for row in rows]),
+                        tickers=[row.ticker for row in rows],
+                        sources=[row.source for row in rows],
+                        published_ats=[row.published_at for row in rows],
+                        high_water_mark=rows[-1].id,
+                    )
+                    added += len(rows)
+                if len(rows) < batch_size:
+                    return added
+
+    # -- reads ----------------------------------------------------------------
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        *,
+        top_ks: list[int],
+        filters: RetrievalFilters | None = None,
+    ) -> list[list[tuple[str, float]]]:
+        filters = filters or RetrievalFilters()
+        queries = queries.astype(np.float32, copy=False)
+        with self._lock:
+            memtable = self._memtable
+            runs = [
+                (segment.chunk_ids, segment.vectors, segment.attributes)
+                for segment in self.segments
+            ]
+            runs.append(
+                (list(memtable.chunk_ids), memtable.vectors, memtable.attributes.copy())
+            )
+        limit = max(top_ks, default=0)
+        candidates: list[list[tuple[float, str]]] = [[] for _ in top_ks]
+        for chunk_ids, vectors, attributes in runs:
+            if not chunk_ids:
+                continue
+            mask = attributes.mask(filters)
+            if mask is not None and not mask.any():
+                continue
+            scores = queries @ vectors.T
+            if mask is not None:
+                scores[:, ~mask] = 0.0
+            for qi, query_scores in enumerate(scores):
+                candidates[qi].extend(
+                    (float(query_scores[row]), chunk_ids[row])
+                    for row in top_k_indices(query_scores, limit)
+                    if query_scores[row] > 0
+                )
+        return [
+            [(chunk_id, score) for score, chunk_id in heapq.nlargest(k, hits)]
+            for hits, k in zip(candidates, top_ks, strict=True)
+        ]
+
+    # -- maintenance ----------------------------------------------------------
+
+    def _tier(self, segment: LsmSegment) -> int:
+        rows = max(len(segment), 1)
+        return int(math.log(max(rows / self.memtable_rows, 1.0), self.merge_factor))
+
+    def _pick_merge(self) -> list[LsmSegment]:
+        tiers: dict[int, list[LsmSegment]] = {}
+        # With a directory, only flushed segments merge, so unflushed ones stay in seal order.
+        for segment in self.segments:
+            if self.directory is not None and segment.path is None:
+                continue
+            tiers.setdefault(self._tier(segment), []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][: self.merge_factor]
+        return []
+
+    def _flush_one(self) -> bool:
+        with self._lock:
+            pending = next((s for s in self.segments if s.path is None), None)
+        if pending is None or self.directory is None:
+            return False
+        written = pending.write(self._segment_dir(pending.segment_id))
+        with self._lock:
+            for idx, segment in enumerate(self.segments):
+                if segment.segment_id == pending.segment_id:
+                    self.segments[idx] = written
+            self._durable_high_water_mark = pending.high_water_mark
+            self._write_manifest()
+        return True
+
+    def _merge_once(self) -> bool:
+        with self._lock:
+            sources = self._pick_merge()
+            if not sources:
+                return False
+            segment_id = self._next_segment_id
+            self._next_segment_id += 1
+
+        merged = LsmSegment(
+            segment_id=segment_id,
+            chunk_ids=[chunk_id for s in sources for chunk_id in s.chunk_ids],
+            vectors=np.concatenate([np.asarray(s.vectors) for s in sources]),
+            attributes=ChunkAttributes.concat([s.attributes for s in sources]),
+            high_water_mark=max(s.high_water_mark for s in sources),
+        )
+        if self.directory is not None:
+            merged = merged.write(self._segment_dir(segment_id))
+
+        with self._lock:
+            merged_ids = {s.segment_id for s in sources}
+            first = min(i for i, s in enumerate(self.segments) if s.segment_id in merged_ids)
+            remaining = [s for s in self.segments if s.segment_id not in merged_ids]
+            remaining.insert(first, merged)
+            self.segments = remaining
+            self._write_manifest()
+        # Segments a read-only index loaded belong to the directory's writer.
+        if self.directory is not None:
+            with _flocked(self.directory / MANIFEST_LOCK, fcntl.LOCK_EX):
+                for source in sources:
+                    if source.path is not None:
+                        shutil.rmtree(source.path, ignore_errors=True)
+        return True
+
+    def maintain(self) -> None:
+        """Flush sealed segments and merge until nothing is left to do."""
+        while self._flush_one() or self._merge_once():
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=5.0)
+            self._wake.clear()
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception("lsm_maintenance_failed")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
+
+    # -- persistence ----------------------------------------------------------
+
+    def _segment_dir(self, segment_id: int) -> Path:
+        assert self.directory is not None
+        return self.directory / f"seg-{segment_id:08d}-{self._writer}"
+
+    def _write_manifest(self) -> None:
+        if self.directory is None:
+            return
+        # Segments flush in seal order, so every row up to the last flushed seal's
+        # high-water mark is on disk; later rows are replayed from the database.
+        manifest = {
+            "model_name": self.provider.model_name,
+            "high_water_mark": self._durable_high_water_mark,
+            "next_segment_id": self._next_segment_id,
+            "segments": [
+                {
+                    "segment_id": s.segment_id,
+                    "name": s.path.name,
+                    "high_water_mark": s.high_water_mark,
+                }
+                for s in self.segments
+                if s.path is not None
+            ],
+        }
+        tmp = self.directory / f".{MANIFEST}.{self._writer}.tmp"
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        with _flocked(self.directory / MANIFEST_LOCK, fcntl.LOCK_EX):
+            os.replace(tmp, self.directory / MANIFEST)
+
+    def _load(self) -> None:
+        assert self.directory is not None
+        path = self.directory / MANIFEST
+        if not path.exists():
+            return
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        self._next_segment_id = int(manifest["next_segment_id"])
+        if manifest["model_name"] != self.provider.model_name:
+            return
+        for entry in manifest["segments"]:
+            # Manifests written before segment names carried a writer suffix lack "name".
+            name = entry.get("name") or f"seg-{entry['segment_id']:08d}"
+            segment = LsmSegment.read(
+                self.directory / name, entry["segment_id"], entry["high_water_mark"]
+            )
+            self.segments.append(segment)
+            self._indexed.update(segment.chunk_ids)
+        self._durable_high_water_mark = int(manifest["high_water_mark"])
+        self._memtable.high_water_mark = self._durable_high_water_mark
+
+
+_lsm_index: LsmVectorIndex | None = None
+_lsm_index_lock = threading.Lock()
+
+
+def get_lsm_index(session: Session | None = None) -> LsmVectorIndex:
+    """Return the process-wide LSM index, upserting chunks ingested since the last call."""
+    global _lsm_index
+    settings = get_settings()
+    provider = get_dense_provider()
+    with _lsm_index_lock:
+        if _lsm_index is None or _lsm_index.provider.model_name != provider.model_name:
+            if _lsm_index is not None:
+                _lsm_index.close()
+            _lsm_index = LsmVectorIndex(
+                provider,
+                directory=settings.lsm_dir,
+                memtable_rows=settings.lsm_memtable_rows,
+                merge_factor=settings.lsm_merge_factor,
+            )
+        index = _lsm_index
+    if session is not None:
+        index.refresh(session)
+    return index
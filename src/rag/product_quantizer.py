@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.common.settings import get_settings
+from src.core.models import DocumentChunk
+from src.rag.dense_index import get_dense_provider
+from src.rag.embeddings import DenseEmbeddingProvider
+from src.rag.filters import ChunkAttributes, RetrievalFilters
+from src.rag.sparse_matrix import top_k_indices
+
+_ENCODE_BLOCK_ROWS = 65_536
+
+
+def _kmeans(vectors: np.ndarray, n_clusters: int, *, iterations: int, seed: int) -> np.ndarray:
+    """Plain (Euclidean) k-means; returns float32 centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(vectors.shape[0], n_clusters, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        # argmin |x - c|^2 == argmax (x.c - |c|^2 / 2)
+        assignments = np.argmax(vectors @ centroids.T - 0.5 * (centroids**2).sum(axis=1), axis=1)
+        order = np.argsort(assignments, kind="stable")
+        clusters, starts = np.unique(assignments[order], return_index=True)
+        counts = np.diff(np.append(starts, order.shape[0]))
+        updated = centroids.copy()
+        updated[clusters] = np.add.reduceat(vectors[order], starts, axis=0) / counts[:, None]
+        if np.allclose(updated, centroids, atol=1e-6):
+            break
+        centroids = updated
+    return centroids
+
+
+class ProductQuantizer:
+    """Compresses vectors to `m` one-byte codes, one per equal-width subspace.
+
+    Inner products against a query are approximated with asymmetric distance
+    computation: per query, a (m x ksub) table of sub-vector products is built once,
+    and each encoded vector's score is the sum of `m` table lookups.
+    """
+
+    def __init__(self, codebooks: np.ndarray) -> None:
+        self.codebooks = codebooks.astype(np.float32, copy=False)
+
+    @property
+    def m(self) -> int:
+        return int(self.codebooks.shape[0])
+
+    @property
+    def ksub(self) -> int:
+        return int(self.codebooks.shape[1])
+
+    @property
+    def dimension(self) -> int:
+        return self.m * int(self.codebooks.shape[2])
+
+    @property
+    def compression_ratio(self) -> float:
+        """float32 bytes per vector divided by code bytes per vector."""
+        return 4.0 * self.dimension / self.m
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        *,
+        m: int = 64,
+        ksub: int = 256,
+        iterations: int = 15,
+        max_training_rows: int = 50_000,
+        seed: int = 0,
+    ) -> ProductQuantizer:
+        dimension = vectors.shape[1]
+        if m <= 0 or dimension % m:
+            raise ValueError(f"dimension {dimension} is not divisible into {m} subvectors")
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors, dtype=np.float32)
+        if sample.shape[0] > max_training_rows:
+            sample = sample[np.sort(rng.choice(sample.shape[0], max_training_rows, replace=False))]
+        ksub = max(1, min(ksub, 256, sample.shape[0]))
+        subvectors = sample.reshape(sample.shape[0], m, dimension // m)
+        codebooks = np.stack(
+            [
+                _kmeans(subvectors[:, j], ksub, iterations=iterations, seed=seed + j)
+                for j in range(m)
+            ]
+        )
+        return cls(codebooks)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subvectors = np.asarray(vectors, dtype=np.float32).reshape(vectors.shape[0], self.m, -1)
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        half_norms = 0.5 * (self.codebooks**2).sum(axis=2)
+        for j in range(self.m):
+            codes[:, j] = np.argmax(subvectors[:, j] @ self.codebooks[j].T - half_norms[j], axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.codebooks[np.arange(self.m), codes].reshape(codes.shape[0], -1)
+
+    def lookup_table(self, query: np.ndarray) -> np.ndarray:
+        """Sub-vector inner products of `query` with every centroid, shaped (m, ksub)."""
+        return np.einsum(
+            "jd,jkd->jk", query.astype(np.float32).reshape(self.m, -1), self.codebooks
+        )
+
+    def adc_scores(self, table: np.ndarray, code_columns: np.ndarray) -> np.ndarray:
+        """Approximate inner products of the query behind `table` with encoded rows.
+
+        `code_columns` is the transposed (m x rows) code matrix: each subspace's codes
+        are contiguous, which makes the per-subspace gathers several times faster.
+        """
+        scores = np.zeros(code_columns.shape[1], dtype=np.float32)
+        for j in range(self.m):
+            scores += np.take(table[j], code_columns[j])
+        return scores
+
+
+class QuantizedVectorIndex:
+    """Dense chunk index holding only PQ codes in memory.
+
+    Full-precision vectors are appended to an unlinked scratch file in `scratch_dir`
+    and memory-mapped, so the ADC shortlist of `rerank` candidates per query can be
+    rescored exactly without keeping float32 rows resident. Codebooks are trained on
+    the first refresh and retrained (re-encoding from disk) each time the corpus has
+    grown `retrain_factor` times.
+    """
+
+    def __init__(
+        self,
+        provider: DenseEmbeddingProvider,
+        *,
+        m: int = 64,
+        rerank: int = 100,
+        scratch_dir: str = "data/processed",
+        retrain_factor: float = 4.0,
+    ) -> None:
+        self.provider = provider
+        self.m = m
+        self.rerank = rerank
+        self.retrain_factor = retrain_factor
+        self.high_water_mark = 0
+        self.chunk_ids: list[str] = []
+        self.attributes = ChunkAttributes()
+        self.quantizer: ProductQuantizer | None = None
+        self.trained_rows = 0
+        self._code_columns = np.empty((m, 0), dtype=np.uint8)
+        Path(scratch_dir).mkdir(parents=True, exist_ok=True)
+        self._scratch = tempfile.TemporaryFile(dir=scratch_dir, prefix="pq-vectors-")
+        self._full: np.ndarray | None = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def code_columns(self) -> np.ndarray:
+        return self._code_columns[:, : len(self.chunk_ids)]
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes of resident codes (full-precision vectors stay on disk)."""
+        return int(self.code_columns.nbytes)
+
+    def _reserve(self, rows: int) -> None:
+        if rows > self._code_columns.shape[1]:
+            capacity = max(rows, 2 * self._code_columns.shape[1], 1024)
+            grown = np.empty((self.m, capacity), dtype=np.uint8)
+            grown[:, : self._code_columns.shape[1]] = self._code_columns
+            self._code_columns = grown
+
+    @property
+    def full_vectors(self) -> np.ndarray:
+        """Read-only memory map of the full-precision vectors."""
+        rows = len(self.chunk_ids)
+        if not rows:
+            return np.empty((0, self.provider.dimension), dtype=np.float32)
+        if self._full is None or self._full.shape[0] != rows:
+            self._scratch.flush()
+            self._full = np.memmap(
+                self._scratch, dtype=np.float32, mode="r", shape=(rows, self.provider.dimension)
+            )
+        return self._full
+
+    def append(
+        self,
+        chunk_ids: list[str],
+        vectors: np.ndarray,
+        *,
+        tickers: list[str | None],
+        sources: list[str],
+        published_ats: list,
+    ) -> None:
+        with self._lock:
+            self._scratch.seek(0, 2)
+            self._scratch.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            start = len(self.chunk_ids)
+            self.chunk_ids.extend(chunk_ids)
+            self.attributes.append(tickers, sources, published_ats)
+            if self.quantizer is None or len(self) > self.retrain_factor * self.trained_rows:
+                self._retrain()
+                return
+            self._reserve(len(self))
+            self._code_columns[:, start : len(self)] = self.quantizer.encode(vectors).T
+
+    def _retrain(self) -> None:
+        full = self.full_vectors
+        self.quantizer = ProductQuantizer.train(full, m=self.m)
+        self.trained_rows = full.shape[0]
+        self._reserve(full.shape[0])
+        for start in range(0, full.shape[0], _ENCODE_BLOCK_ROWS):
+            block = np.asarray(full[start : start + _ENCODE_BLOCK_ROWS])
+            self._code_columns[:, start : start + block.shape[0]] = self.quantizer.encode(block).T
+
+    def refresh(self, session: Session, *, batch_size: int = 1000) -> int:
+        added = 0
+        with self._lock:
+            while True:
+                rows = session.execute(
+                    select(
+                        DocumentChunk.id,
+                        DocumentChunk.chunk_id,
+                        DocumentChunk.content,
+                        DocumentChunk.ticker,
+                        DocumentChunk.source,
+                        DocumentChunk.published_at,
+                    )
+                    .where(DocumentChunk.id > self.high_water_mark)
+                    .order_by(DocumentChunk.id)
+                    .limit(batch_size)
+                ).all()
+                if rows:
+                    self.append(
+                        [row.chunk_id for row in rows],
+                        self.provider.embed_many([row.content for row in rows]),
+                        tickers=[row.ticker for row in rows],
+                        sources=[row.source for row in rows],
+                        published_ats=[row.published_at for row in rows],
+                    )
+                    self.high_water_mark = rows[-1].id
+                    added += len(rows)
+                if len(rows) < batch_size:
+                    return added
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        *,
+        top_ks: list[int],
+        filters: RetrievalFilters | None = None,
+        rerank: int | None = None,
+    ) -> list[list[tuple[str, float]]]:
+        """ADC shortlist per query, rescored against full-precision vectors on disk."""
+        rerank = self.rerank if rerank is None else rerank
+        with self._lock:
+            if self.quantizer is None or not self.chunk_ids:
+                return [[] for _ in top_ks]
+            code_columns = self.code_columns
+            full = self.full_vectors
+            mask = self.attributes.mask(filters or RetrievalFilters())
+            chunk_ids = list(self.chunk_ids)
+            results: list[list[tuple[str, float]]] = []
+            for query, k in zip(queries, top_ks, strict=True):
+                approx = self.quantizer.adc_scores(
+                    self.quantizer.lookup_table(query), code_columns
+                )
+                if mask is not None:
+                    approx[~mask] = -np.inf
+                shortlist = top_k_indices(approx, max(k, rerank))
+                shortlist = shortlist[np.isfinite(approx[shortlist])]
+                if rerank > 0 and shortlist.size:
+                    # Sorted row order turns the memmap gather into forward reads.
+                    shortlist = np.sort(shortlist)
+                    exact = np.asarray(full[shortlist]) @ query.astype(np.float32)
+                    best = top_k_indices(exact, k)
+                    hits = [(shortlist[i], float(exact[i])) for i in best]
+                else:
+                    hits = [(row, float(approx[row])) for row in shortlist[:k]]
+                results.append([(chunk_ids[row], score) for row, score in hits if score > 0])
+            return results
+
+
+_pq_index: QuantizedVectorIndex | None = None
+_pq_index_lock = threading.Lock()
+
+
+def get_quantized_index(session: Session) -> QuantizedVectorIndex:
+    """Return the process-wide PQ index, first embedding newly ingested chunks."""
+    global _pq_index
+    settings = get_settings()
+    provider = get_dense_provider()
+    with _pq_index_lock:
+        if (
+            _pq_index is None
+            or _pq_index.provider.model_name != provider.model_name
+            or _pq_index.m != settings.pq_subvectors
+        ):
+            _pq_index = QuantizedVectorIndex(
+                provider,
+                m=settings.pq_subvectors,
+                rerank=settings.pq_rerank_candidates,
+                scratch_dir=settings.pq_scratch_dir,
+            )
+        index = _pq_index
+    index.rerank = settings.pq_rerank_candidates
+    index.refresh(session)
+    return index
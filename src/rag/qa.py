@@ -1,17 +1,43 @@
 from __future__ import annotations
 
+import contextvars
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Any
 
+import numpy as np
 from sqlalchemy.orm import Session
 
+from src.common.logging import get_logger
+from src.common.observability import time_stage
 from src.common.settings import get_settings
+from src.rag.answer_cache import (
+    AnswerCache,
+    CachedAnswer,
+    get_answer_cache,
+    normalize_question,
+)
 from src.rag.answer_generation import (
+    AnswerGenerator,
     DeterministicAnswerGenerator,
     SourceContext,
+    chat_messages,
     get_answer_generator,
 )
-from src.rag.retrieval import retrieve_chunks
+from src.rag.context_packing import estimate_prompt_tokens, pack_contexts
+from src.rag.dense_index import get_dense_provider
+from src.rag.filters import RetrievalFilters
+from src.rag.retrieval import (
+    RetrievalStats,
+    RetrievedChunk,
+    retrieve_chunks,
+    retrieve_chunks_batch,
+)
+
+logger = get_logger("qa")
 
 
 @dataclass
@@ -31,6 +57,27 @@ class QaResult:
     confidence: float
     answer_provider: str
     citations: list[Citation]
+    scanned_rows: int | None = None
+    cached: bool = False
+    latency_ms: float | None = None
+    prompt_tokens: int | None = None
+
+
+@dataclass
+class QaQuery:
+    question: str
+    top_k: int = 5
+    ticker: str | None = None
+    source: str | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+    exhaustive: bool | None = None
+
+    @property
+    def filters(self) -> RetrievalFilters:
+        return RetrievalFilters(
+            ticker=self.ticker, source=self.source, date_from=self.date_from, date_to=self.date_to
+        )
 
 
 def answer_question(
@@ -42,41 +89,113 @@ def answer_question(
     source: str | None = None,
     date_from: datetime | None = None,
     date_to: datetime | None = None,
+    exhaustive: bool | None = None,
 ) -> QaResult:
-    settings = get_settings()
-    retrieved = retrieve_chunks(
-        session,
-        question,
-        top_k=top_k,
-        ticker=ticker,
-        source=source,
-        date_from=date_from,
-        date_to=date_to,
-    )
-
-    if not retrieved:
-        return QaResult(
-            answer="No supporting documents matched the request filters and query terms.",
-            confidence=0.05,
-            answer_provider="none",
-            citations=[],
+    stats = RetrievalStats()
+    with time_stage("qa.retrieve"):
+        retrieved = retrieve_chunks(
+            session,
+            question,
+            top_k=top_k,
+            ticker=ticker,
+            source=source,
+            date_from=date_from,
+            date_to=date_to,
+            exhaustive=exhaustive,
+            stats=stats,
         )
+    result = answer_from_retrieved(question, retrieved)
+    result.scanned_rows = stats.scanned_rows
+    return result
+
+
+def answer_questions(
+    session: Session, queries: list[QaQuery], *, parallelism: int | None = None
+) -> list[QaResult]:
+    """Answer many questions: one batched retrieval, then concurrent generation.
 
-    citations: list[Citation] = []
-    for item in retrieved:
-        citations.append(
-            Citation(
-                chunk_id=item.chunk_id,
-                document_id=item.document_id,
-                source=item.source,
-                ticker=item.ticker,
-                published_at=item.published_at,
-                excerpt=item.content[:220],
-                score=round(item.score, 3),
+    Up to `parallelism` (default `QA_BATCH_PARALLELISM`) answers are generated at once, so
+    a batch takes about as long as its slowest answer. Results keep the input order and
+    carry each answer's own latency.
+    """
+    stats = [RetrievalStats() for _ in queries]
+    retrieved: list[list[RetrievedChunk]] = [[] for _ in queries]
+    by_exhaustive: dict[bool | None, list[int]] = {}
+    for idx, query in enumerate(queries):
+        by_exhaustive.setdefault(query.exhaustive, []).append(idx)
+    with time_stage("qa.retrieve"):
+        # One batched retrieval per scan mode, since `exhaustive` applies to a whole batch.
+        for exhaustive, indices in by_exhaustive.items():
+            found = retrieve_chunks_batch(
+                session,
+                [queries[idx].question for idx in indices],
+                [queries[idx].filters for idx in indices],
+                top_k=[queries[idx].top_k for idx in indices],
+                exhaustive=exhaustive,
+                stats=[stats[idx] for idx in indices],
             )
+            for idx, chunks in zip(indices, found, strict=True):
+                retrieved[idx] = chunks
+    parallelism = parallelism or get_settings().qa_batch_parallelism
+    pairs = list(zip(queries, retrieved, strict=True))
+    if parallelism <= 1 or len(pairs) <= 1:
+        results = [_timed_answer(query.question, chunks) for query, chunks in pairs]
+    else:
+        workers = min(parallelism, len(pairs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qa-batch") as pool:
+            # Each task runs in a copy of this context so stage timings reach the caller.
+            futures = [
+                pool.submit(contextvars.copy_context().run, _timed_answer, query.question, chunks)
+                for query, chunks in pairs
+            ]
+            results = [future.result() for future in futures]
+    for result, query_stats in zip(results, stats, strict=True):
+        result.scanned_rows = query_stats.scanned_rows
+    return results
+
+
+def _timed_answer(question: str, retrieved: list[RetrievedChunk]) -> QaResult:
+    started = time.perf_counter()
+    result = answer_from_retrieved(question, retrieved)
+    result.latency_ms = round((time.perf_counter() - started) * 1000.0, 3)
+    return result
+
+
+_NO_MATCH_ANSWER = "No supporting documents matched the request filters and query terms."
+_NO_EVIDENCE_ANSWER = "No grounded evidence was available to answer this question."
+
+
+@dataclass
+class QaStreamEvent:
+    """One server-sent event of a streamed answer.
+
+    `citations` comes first, then `token` pieces of the answer. A `fallback` event means
+    the provider failed and the tokens sent so far should be discarded; the
+    deterministic answer's tokens follow. `done` carries the final answer, provider and
+    confidence.
+    """
+
+    event: str
+    data: Any
+
+
+def _citations(retrieved: list[RetrievedChunk]) -> list[Citation]:
+    return [
+        Citation(
+            chunk_id=item.chunk_id,
+            document_id=item.document_id,
+            source=item.source,
+            ticker=item.ticker,
+            published_at=item.published_at,
+            excerpt=item.content[:220],
+            score=round(item.score, 3),
         )
+        for item in retrieved
+    ]
+
 
-    contexts = [
+def _contexts(citations: list[Citation]) -> list[SourceContext]:
+    return [
         SourceContext(
             chunk_id=c.chunk_id,
             source=c.source,
@@ -86,6 +205,33 @@ def answer_question(
         )
         for c in citations
     ]
+
+
+def _prompt_contexts(
+    question: str, retrieved: list[RetrievedChunk], generator: AnswerGenerator
+) -> tuple[list[Citation], list[SourceContext], int | None]:
+    """Citations, evidence for the generator and the estimated prompt size sent to a model.
+
+    With `QA_CONTEXT_TOKEN_BUDGET` set, retrieved chunks are packed so the whole prompt
+    fits that budget and only the passages that made it in are cited; otherwise every
+    retrieved chunk is cited and its citation excerpt passed as is.
+    """
+    budget = get_settings().qa_context_token_budget
+    if budget > 0:
+        with time_stage("qa.pack"):
+            contexts = pack_contexts(retrieved, token_budget=budget, question=question).contexts
+        packed = {context.chunk_id for context in contexts}
+        citations = _citations([chunk for chunk in retrieved if chunk.chunk_id in packed])
+    else:
+        citations = _citations(retrieved)
+        contexts = _contexts(citations)
+    if isinstance(generator, DeterministicAnswerGenerator):
+        return citations, contexts, None
+    return citations, contexts, estimate_prompt_tokens(chat_messages(question, contexts))
+
+
+def _configured_generator() -> tuple[str, AnswerGenerator]:
+    settings = get_settings()
     configured_provider = settings.qa_answer_provider.strip().lower()
     generator = get_answer_generator(
         configured_provider,
@@ -94,20 +240,154 @@ def answer_question(
         openai_base_url=settings.qa_openai_base_url,
         openai_timeout_seconds=settings.qa_openai_timeout_seconds,
     )
-    answer = generator.generate(question, contexts)
-    answer_provider = configured_provider
-    if not answer:
-        fallback = DeterministicAnswerGenerator()
-        answer = fallback.generate(question, contexts) or (
-            "No grounded evidence was available to answer this question."
+    return configured_provider, generator
+
+
+@dataclass
+class _CacheProbe:
+    cache: AnswerCache
+    model: str
+    vector: np.ndarray
+    hit: CachedAnswer | None
+
+    def store(self, question: str, retrieved: list[RetrievedChunk], answer: str, provider: str):
+        self.cache.store(
+            self.model, question, self.vector, retrieved, CachedAnswer(answer, provider)
         )
-        answer_provider = "deterministic-fallback"
 
+
+def _probe_answer_cache(
+    question: str, retrieved: list[RetrievedChunk], provider: str, generator: AnswerGenerator
+) -> _CacheProbe | None:
+    cache = get_answer_cache()
+    # Deterministic answers cost less than embedding the question, so they skip the cache.
+    if not cache.enabled or isinstance(generator, DeterministicAnswerGenerator):
+        return None
+    settings = get_settings()
+    dense = get_dense_provider()
+    answer_model = f"openai:{settings.qa_openai_model}" if provider == "openai" else provider
+    model = f"{answer_model}|{dense.model_name}"
+    with time_stage("qa.answer_cache"):
+        vector = dense.embed(normalize_question(question))
+        hit = cache.lookup(model, question, vector, retrieved)
+    return _CacheProbe(cache, model, vector, hit)
+
+
+def _confidence(citations: list[Citation]) -> float:
     best_score = max(c.score for c in citations)
-    confidence = min(0.95, round(0.35 + (0.1 * len(citations)) + (0.35 * best_score), 3))
+    return min(0.95, round(0.35 + (0.1 * len(citations)) + (0.35 * best_score), 3))
+
+
+def answer_from_retrieved(question: str, retrieved: list[RetrievedChunk]) -> QaResult:
+    if not retrieved:
+        return QaResult(
+            answer=_NO_MATCH_ANSWER,
+            confidence=0.05,
+            answer_provider="none",
+            citations=[],
+        )
+
+    configured_provider, generator = _configured_generator()
+    citations, contexts, prompt_tokens = _prompt_contexts(question, retrieved, generator)
+    probe = _probe_answer_cache(question, retrieved, configured_provider, generator)
+    if probe is not None and probe.hit is not None:
+        return QaResult(
+            answer=probe.hit.answer,
+            confidence=_confidence(citations),
+            answer_provider=probe.hit.answer_provider,
+            citations=citations,
+            cached=True,
+        )
+
+    with time_stage("qa.generate"):
+        answer = generator.generate(question, contexts)
+        answer_provider = configured_provider
+        if not answer:
+            fallback = DeterministicAnswerGenerator()
+            answer = fallback.generate(question, contexts) or _NO_EVIDENCE_ANSWER
+            answer_provider = "deterministic-fallback"
+    # Fallback answers are not cached, so the provider is retried next time.
+    if probe is not None and answer_provider == configured_provider:
+        probe.store(question, retrieved, answer, answer_provider)
+
     return QaResult(
         answer=answer,
-        confidence=confidence,
+        confidence=_confidence(citations),
         answer_provider=answer_provider,
         citations=citations,
+        prompt_tokens=prompt_tokens,
+    )
+
+
+def stream_from_retrieved(
+    question: str, retrieved: list[RetrievedChunk]
+) -> Iterator[QaStreamEvent]:
+    """Stream `answer_from_retrieved` as events, citations before any answer text."""
+    if not retrieved:
+        yield QaStreamEvent("citations", [])
+        yield QaStreamEvent("token", _NO_MATCH_ANSWER)
+        yield QaStreamEvent(
+            "done",
+            {
+                "answer": _NO_MATCH_ANSWER,
+                "answer_provider": "none",
+                "confidence": 0.05,
+                "cached": False,
+                "prompt_tokens": None,
+            },
+        )
+        return
+
+    configured_provider, generator = _configured_generator()
+    answer_provider = configured_provider
+    citations, contexts, prompt_tokens = _prompt_contexts(question, retrieved, generator)
+    yield QaStreamEvent("citations", citations)
+    probe = _probe_answer_cache(question, retrieved, configured_provider, generator)
+    if probe is not None and probe.hit is not None:
+        yield QaStreamEvent("token", probe.hit.answer)
+        yield QaStreamEvent(
+            "done",
+            {
+                "answer": probe.hit.answer,
+                "answer_provider": probe.hit.answer_provider,
+                "confidence": _confidence(citations),
+                "cached": True,
+                "prompt_tokens": None,
+            },
+        )
+        return
+
+    pieces: list[str] = []
+    with time_stage("qa.generate"):
+        try:
+            for piece in generator.stream(question, contexts):
+                pieces.append(piece)
+                yield QaStreamEvent("token", piece)
+        except Exception as exc:
+            logger.warning("qa_stream_failed", provider=answer_provider, error=str(exc))
+            yield QaStreamEvent("fallback", {"reason": "provider_error", "discarded": len(pieces)})
+            pieces = []
+        else:
+            if not "".join(pieces).strip():
+                if pieces:
+                    yield QaStreamEvent("fallback", {"reason": "empty", "discarded": len(pieces)})
+                pieces = []
+        if not pieces:
+            answer_provider = "deterministic-fallback"
+            for piece in DeterministicAnswerGenerator().stream(question, contexts):
+                pieces.append(piece)
+                yield QaStreamEvent("token", piece)
+
+    answer = "".join(pieces).strip() or _NO_EVIDENCE_ANSWER
+    if probe is not None and answer_provider == configured_provider:
+        probe.store(question, retrieved, answer, answer_provider)
+    yield QaStreamEvent(
+        "done",
+        {
+            "answer": answer,
+            "answer_provider": answer_provider,
+            "confidence": _confidence(citations),
+            "cached": False,
+            "prompt_tokens": prompt_tokens,
+        },
     )
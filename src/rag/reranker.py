@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import math
+import re
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+from src.rag.filters import to_naive_utc
+from src.rag.tokenizer import tokenize
+
+if TYPE_CHECKING:
+    from src.rag.retrieval import RetrievedChunk
+
+_SYMBOL = re.compile(r"[a-z0-9.]+")
+
+
+@dataclass(frozen=True)
+class RerankWeights:
+    first_stage: float = 1.0
+    proximity: float = 0.3
+    phrase: float = 0.3
+    recency: float = 0.15
+    ticker: float = 0.2
+
+
+@dataclass
+class RerankOutcome:
+    chunks: list[RetrievedChunk]
+    reranked: int
+    candidates: int
+
+    @property
+    def budget_exhausted(self) -> bool:
+        return self.reranked < self.candidates
+
+
+def proximity_score(query_terms: list[str], doc_terms: list[str]) -> float:
+    """Query-term coverage of the shortest window holding every matched term, in [0, 1].
+
+    1.0 means all query terms appear next to each other; spread-out matches decay
+    towards zero and missing terms reduce the score proportionally.
+    """
+    wanted = set(query_terms)
+    if not wanted or not doc_terms:
+        return 0.0
+    matched = wanted.intersection(doc_terms)
+    if not matched:
+        return 0.0
+    counts: dict[str, int] = {}
+    covered = 0
+    best = len(doc_terms)
+    left = 0
+    for right, term in enumerate(doc_terms):
+        if term not in matched:
+            continue
+        counts[term] = counts.get(term, 0) + 1
+        if counts[term] == 1:
+            covered += 1
+        while covered == len(matched):
+            if doc_terms[left] in matched:
+                best = min(best, right - left + 1)
+                counts[doc_terms[left]] -= 1
+                if counts[doc_terms[left]] == 0:
+                    covered -= 1
+            left += 1
+    return (len(matched) / len(wanted)) * (len(matched) / best)
+
+
+def phrase_score(query_terms: list[str], doc_terms: list[str]) -> float:
+    """Fraction of adjacent query-term pairs that also appear adjacent in the document."""
+    pairs = set(zip(query_terms, query_terms[1:], strict=False))
+    if not pairs:
+        return 0.0
+    doc_pairs = set(zip(doc_terms, doc_terms[1:], strict=False))
+    return len(pairs & doc_pairs) / len(pairs)
+
+
+def recency_score(published_at: datetime | None, now: datetime, half_life_days: float) -> float:
+    if published_at is None or half_life_days <= 0:
+        return 0.0
+    age_days = max((now - to_naive_utc(published_at)).total_seconds() / 86400.0, 0.0)
+    return math.pow(0.5, age_days / half_life_days)
+
+
+class Reranker:
+    """Second-stage scorer for first-stage candidates under a wall-clock budget.
+
+    Candidates are rescored best-first, so when the budget runs out the ones already
+    rescored are the strongest first-stage hits; the remainder keep their first-stage
+    order behind them.
+    """
+
+    def __init__(
+        self,
+        *,
+        weights: RerankWeights | None = None,
+        recency_half_life_days: float = 30.0,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.weights = weights or RerankWeights()
+        self.recency_half_life_days = recency_half_life_days
+        self.clock = clock
+
+    def score(
+        self,
+        query_terms: list[str],
+        query_symbols: set[str],
+        chunk: RetrievedChunk,
+        *,
+        max_first_stage: float,
+        now: datetime,
+    ) -> float:
+        w = self.weights
+        doc_terms = tokenize(chunk.content)
+        ticker = chunk.ticker.lower() if chunk.ticker else None
+        total = w.first_stage + w.proximity + w.phrase + w.recency + w.ticker
+        # Normalized to [0, 1] so reranked scores stay comparable with first-stage ones.
+        return (
+            w.first_stage * (chunk.score / max_first_stage if max_first_stage > 0 else 0.0)
+            + w.proximity * proximity_score(query_terms, doc_terms)
+            + w.phrase * phrase_score(query_terms, doc_terms)
+            + w.recency * recency_score(chunk.published_at, now, self.recency_half_life_days)
+            + w.ticker * (1.0 if ticker is not None and ticker in query_symbols else 0.0)
+        ) / (total or 1.0)
+
+    def rerank(
+        self,
+        query: str,
+        candidates: list[RetrievedChunk],
+        *,
+        top_k: int,
+        deadline: float | None = None,
+        now: datetime | None = None,
+    ) -> RerankOutcome:
+        """Rescore `candidates` until `deadline` (a `clock()` value) and keep `top_k`."""
+        ordered = sorted(candidates, key=lambda chunk: -chunk.score)
+        now = now or datetime.now(UTC).replace(tzinfo=None)
+        query_terms = tokenize(query)
+        query_symbols = set(_SYMBOL.findall(query.lower()))
+        max_first_stage = ordered[0].score if ordered else 0.0
+
+        rescored: list[RetrievedChunk] = []
+        for chunk in ordered:
+            if deadline is not None and rescored and self.clock() >= deadline:
+                break
+            score = self.score(
+                query_terms, query_symbols, chunk, max_first_stage=max_first_stage, now=now
+            )
+            rescored.append(replace(chunk, score=score))
+        rescored.sort(key=lambda chunk: -chunk.score)
+        leftover = ordered[len(rescored) :]
+        return RerankOutcome(
+            chunks=(rescored + leftover)[:top_k],
+            reranked=len(rescored),
+            candidates=len(ordered),
+        )
@@ -1,15 +1,36 @@
 from __future__ import annotations
 
-import re
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Any
 
+import numpy as np
 from sqlalchemy import Select, select
 from sqlalchemy.orm import Session
 
-from src.common.settings import get_settings
-from src.core.models import DocumentChunk, EmbeddingMetadata
-from src.rag.embeddings import cosine_similarity_sparse, get_embedding_provider
+from src.common.observability import RERANK_COUNTER, RETRIEVAL_CACHE_COUNTER, time_stage
+from src.common.settings import Settings, get_settings
+from src.core.models import DocumentChunk
+from src.rag.corpus import get_corpus_generation
+from src.rag.dense_index import DenseVectorIndex, get_dense_index
+from src.rag.embeddings import DenseEmbeddingProvider, get_sparse_embedding_provider
+from src.rag.filters import RetrievalFilters
+from src.rag.inverted_index import get_inverted_index
+from src.rag.ivf_index import get_ivf_index
+from src.rag.lsm_index import LsmVectorIndex, get_lsm_index
+from src.rag.product_quantizer import QuantizedVectorIndex, get_quantized_index
+from src.rag.reranker import Reranker
+from src.rag.segments import get_segmented_index
+from src.rag.sharded_index import get_sharded_index
+from src.rag.sparse_codec import PackedSparseVector
+from src.rag.sparse_matrix import SparseScoringMatrix, get_scoring_matrix, top_k_indices
+from src.rag.tokenizer import get_tokenizer, tokenize
+from src.rag.vocabulary import get_vocabulary
 
 
 @dataclass
@@ -23,35 +44,141 @@ class RetrievedChunk:
     score: float
 
 
-def _tokenize(text: str) -> set[str]:
-    return {term for term in re.findall(r"[a-zA-Z0-9]{3,}", text.lower())}
+@dataclass
+class RetrievalStats:
+    """Per-query accounting filled in when `stats` is passed to retrieval.
+
+    `scanned_rows` counts chunk rows read from the database and scored; it stays None
+    when an in-memory index answered and is 0 for a cached result.
+    """
+
+    scanned_rows: int | None = None
+
+
+class RetrievalCache:
+    """Bounded LRU cache with per-entry TTL and corpus-generation invalidation."""
+
+    def __init__(self, name: str, *, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def configure(self, *, max_entries: int, ttl_seconds: float) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl_seconds = ttl_seconds
+            while len(self._entries) > max(max_entries, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _sync_generation(self, generation: int) -> None:
+        if generation != self.generation:
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, key: Hashable, *, generation: int = 0) -> Any | None:
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        RETRIEVAL_CACHE_COUNTER.labels(self.name, "hit" if entry else "miss").inc()
+        return entry[1] if entry else None
+
+    def put(self, key: Hashable, value: Any, *, generation: int = 0) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._sync_generation(generation)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_result_cache = RetrievalCache("results")
+_embedding_cache = RetrievalCache("query_embeddings")
+
 
+def clear_retrieval_caches() -> None:
+    _result_cache.clear()
+    _embedding_cache.clear()
 
-def _score(query_terms: set[str], chunk_text: str) -> float:
-    if not query_terms:
-        return 0.0
-    chunk_terms = _tokenize(chunk_text)
-    overlap = len(query_terms & chunk_terms)
-    return overlap / len(query_terms)
 
+def _normalize_query(query: str) -> tuple[str, ...]:
+    # Every scorer treats the query as a bag of terms, so order and casing are irrelevant.
+    return tuple(sorted(tokenize(query)))
 
-def _load_embedding_lookup(session: Session, chunk_ids: list[str]) -> dict[str, dict[str, float]]:
+
+def _embed_query(provider_name: str, query: str) -> dict[str, float]:
+    key = (provider_name, _normalize_query(query))
+    embedding = _embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_sparse_embedding_provider(provider_name).embed(query)
+        _embedding_cache.put(key, embedding)
+    return embedding
+
+
+def _embed_dense_queries(provider: DenseEmbeddingProvider, queries: list[str]) -> np.ndarray:
+    keys = [(provider.model_name, _normalize_query(query)) for query in queries]
+    cached = [_embedding_cache.get(key) for key in keys]
+    missing = [idx for idx, vector in enumerate(cached) if vector is None]
+    if missing:
+        fresh = provider.embed_many([queries[idx] for idx in missing])
+        for idx, vector in zip(missing, fresh, strict=True):
+            cached[idx] = vector
+            _embedding_cache.put(keys[idx], vector)
+    vectors = [vector for vector in cached if vector is not None]
+    return np.vstack(vectors) if vectors else np.empty((0, provider.dimension), dtype=np.float32)
+
+
+def _to_retrieved(chunk: DocumentChunk, score: float) -> RetrievedChunk:
+    return RetrievedChunk(
+        chunk_id=chunk.chunk_id,
+        document_id=chunk.document_id,
+        content=chunk.content,
+        source=chunk.source,
+        ticker=chunk.ticker,
+        published_at=chunk.published_at,
+        score=score,
+    )
+
+
+def _hydrate(
+    session: Session, scored_lists: list[list[tuple[str, float]]]
+) -> list[list[RetrievedChunk]]:
+    chunk_ids = {chunk_id for scored in scored_lists for chunk_id, _ in scored}
     if not chunk_ids:
-        return {}
-    meta_rows = session.scalars(
-        select(EmbeddingMetadata).where(EmbeddingMetadata.chunk_id.in_(chunk_ids))
-    ).all()
-    lookup: dict[str, dict[str, float]] = {}
-    for row in meta_rows:
-        payload = row.payload or {}
-        embedding = payload.get("embedding")
-        if isinstance(embedding, dict):
-            lookup[row.chunk_id] = {
-                str(term): float(value)
-                for term, value in embedding.items()
-                if isinstance(term, str) and isinstance(value, int | float)
-            }
-    return lookup
+        return [[] for _ in scored_lists]
+    with time_stage("retrieval.hydrate"):
+        rows = session.scalars(
+            select(DocumentChunk).where(DocumentChunk.chunk_id.in_(chunk_ids))
+        ).all()
+    by_id = {row.chunk_id: row for row in rows}
+    return [
+        [
+            _to_retrieved(by_id[chunk_id], score)
+            for chunk_id, score in scored
+            if chunk_id in by_id and score > 0
+        ]
+        for scored in scored_lists
+    ]
 
 
 def retrieve_chunks(
@@ -63,64 +190,344 @@ def retrieve_chunks(
     source: str | None = None,
     date_from: datetime | None = None,
     date_to: datetime | None = None,
+    rerank_budget_ms: float | None = None,
+    exhaustive: bool | None = None,
+    stats: RetrievalStats | None = None,
 ) -> list[RetrievedChunk]:
+    filters = RetrievalFilters(
+        ticker=ticker, source=source, date_from=date_from, date_to=date_to
+    )
+    return retrieve_chunks_batch(
+        session,
+        [query],
+        [filters],
+        top_k=top_k,
+        rerank_budget_ms=rerank_budget_ms,
+        exhaustive=exhaustive,
+        stats=None if stats is None else [stats],
+    )[0]
+
+
+def retrieve_chunks_batch(
+    session: Session,
+    queries: list[str],
+    filters: list[RetrievalFilters] | RetrievalFilters | None = None,
+    *,
+    top_k: list[int] | int = 5,
+    rerank_budget_ms: float | None = None,
+    exhaustive: bool | None = None,
+    stats: list[RetrievalStats] | None = None,
+) -> list[list[RetrievedChunk]]:
+    """Retrieve for many queries, sharing candidate loads across identical filters.
+
+    `filters` and `top_k` are either one value for every query or one per query.
+    Results come back in the order of `queries`. With `RERANK_CANDIDATES` set, each
+    query's first stage returns that many candidates and the reranker picks the final
+    `top_k` within `rerank_budget_ms` (default `RERANK_BUDGET_MS`) per query.
+
+    The database scan used by the sparse and lexical providers reads at most 300 rows
+    unless `exhaustive` (default `RETRIEVAL_EXHAUSTIVE`) is set, in which case every
+    matching row is streamed and scored. `stats`, one per query, receive row counts.
+    """
     settings = get_settings()
-    stmt: Select = select(DocumentChunk)
-    if ticker:
-        stmt = stmt.where(DocumentChunk.ticker == ticker)
-    if source:
-        stmt = stmt.where(DocumentChunk.source == source)
-    if date_from:
-        stmt = stmt.where(DocumentChunk.published_at >= date_from)
-    if date_to:
-        stmt = stmt.where(DocumentChunk.published_at <= date_to)
+    if filters is None or isinstance(filters, RetrievalFilters):
+        filters = [filters or RetrievalFilters()] * len(queries)
+    top_ks = [top_k] * len(queries) if isinstance(top_k, int) else list(top_k)
+    if not (len(filters) == len(top_ks) == len(queries)):
+        raise ValueError("filters and top_k must match the number of queries")
+    if stats is not None and len(stats) != len(queries):
+        raise ValueError("stats must match the number of queries")
+    if exhaustive is None:
+        exhaustive = settings.retrieval_exhaustive
+    budget_ms = settings.rerank_budget_ms if rerank_budget_ms is None else rerank_budget_ms
 
-    # Candidate cap keeps lexical ranking predictable and fast for local development.
-    rows = list(session.scalars(stmt.limit(300)))
-    query_terms = _tokenize(query)
-    lexical_scores = {chunk.chunk_id: _score(query_terms, chunk.content) for chunk in rows}
-
-    ranked: list[tuple[DocumentChunk, float]]
-    if settings.retrieval_provider in {"sparse-local", "local-sparse", "sparse"}:
-        provider = get_embedding_provider(settings.embedding_provider)
-        query_embedding = provider.embed(query)
-        embedding_lookup = _load_embedding_lookup(session, [row.chunk_id for row in rows])
-        ranked = sorted(
-            [
-                (
-                    chunk,
-                    max(
-                        cosine_similarity_sparse(
-                            query_embedding, embedding_lookup.get(chunk.chunk_id, {})
-                        ),
-                        lexical_scores.get(chunk.chunk_id, 0.0),
-                    ),
-                )
-                for chunk in rows
-            ],
-            key=lambda item: item[1],
-            reverse=True,
+    for cache in (_result_cache, _embedding_cache):
+        cache.configure(
+            max_entries=settings.retrieval_cache_max_entries,
+            ttl_seconds=settings.retrieval_cache_ttl_seconds,
         )
-    else:
-        ranked = sorted(
-            [(chunk, lexical_scores.get(chunk.chunk_id, 0.0)) for chunk in rows],
-            key=lambda item: item[1],
-            reverse=True,
+    with time_stage("retrieval.cache"):
+        generation = get_corpus_generation(session) if _result_cache.enabled else 0
+        results, keys, groups = _lookup_cached(
+            settings, queries, filters, top_ks, exhaustive, budget_ms, generation, stats
         )
 
-    results: list[RetrievedChunk] = []
-    for chunk, score in ranked[:top_k]:
-        if score <= 0:
-            continue
-        results.append(
-            RetrievedChunk(
-                chunk_id=chunk.chunk_id,
-                document_id=chunk.document_id,
-                content=chunk.content,
-                source=chunk.source,
-                ticker=chunk.ticker,
-                published_at=chunk.published_at,
-                score=score,
+    candidates = settings.rerank_candidates
+    fetched: dict[int, list[RetrievedChunk]] = {}
+    for group_filters, indices in groups.items():
+        group_results, scanned = _retrieve_group(
+            session,
+            [queries[idx] for idx in indices],
+            top_ks=[max(top_ks[idx], candidates) for idx in indices],
+            filters=group_filters,
+            exhaustive=exhaustive,
+        )
+        fetched.update(zip(indices, group_results, strict=True))
+        if stats is not None:
+            for idx in indices:
+                stats[idx].scanned_rows = scanned
+
+    reranker = Reranker(recency_half_life_days=settings.rerank_recency_half_life_days)
+    for idx, retrieved in sorted(fetched.items()):
+        complete = True
+        if candidates > 0:
+            with time_stage("retrieval.rerank"):
+                # Each query gets the whole budget, so late queries in a batch are not
+                # left with whatever the earlier ones did not use.
+                deadline = reranker.clock() + budget_ms / 1000.0
+                outcome = reranker.rerank(
+                    queries[idx], retrieved, top_k=top_ks[idx], deadline=deadline
+                )
+            retrieved = outcome.chunks
+            complete = not outcome.budget_exhausted
+            RERANK_COUNTER.labels("complete" if complete else "budget_exhausted").inc()
+        results[idx] = retrieved
+        # Budget-truncated rankings depend on load, so only complete ones are cached.
+        if complete:
+            _result_cache.put(keys[idx], tuple(retrieved), generation=generation)
+    return [retrieved or [] for retrieved in results]
+
+
+def _lookup_cached(
+    settings: Settings,
+    queries: list[str],
+    filters: list[RetrievalFilters],
+    top_ks: list[int],
+    exhaustive: bool,
+    rerank_budget_ms: float,
+    generation: int,
+    stats: list[RetrievalStats] | None,
+) -> tuple[list[list[RetrievedChunk] | None], list[Hashable], dict[RetrievalFilters, list[int]]]:
+    """Cached results and cache keys per query, plus uncached queries grouped by filters."""
+    results: list[list[RetrievedChunk] | None] = [None] * len(queries)
+    keys: list[Hashable] = []
+    groups: dict[RetrievalFilters, list[int]] = {}
+    for idx, (query, query_filters, k) in enumerate(zip(queries, filters, top_ks, strict=True)):
+        key = (
+            settings.retrieval_provider,
+            settings.embedding_provider,
+            settings.dense_embedding_provider,
+            settings.dense_embedding_dim,
+            settings.ivf_nprobe,
+            settings.pq_subvectors,
+            settings.pq_rerank_candidates,
+            settings.rerank_candidates,
+            # The reranked order depends on the budget and on how recency is scored.
+            rerank_budget_ms if settings.rerank_candidates > 0 else None,
+            settings.rerank_recency_half_life_days if settings.rerank_candidates > 0 else None,
+            exhaustive,
+            _normalize_query(query),
+            query_filters,
+            k,
+        )
+        keys.append(key)
+        cached = _result_cache.get(key, generation=generation) if _result_cache.enabled else None
+        if cached is not None:
+            results[idx] = list(cached)
+            if stats is not None:
+                stats[idx].scanned_rows = 0
+        else:
+            groups.setdefault(query_filters, []).append(idx)
+    return results, keys, groups
+
+
+def _retrieve_group(
+    session: Session,
+    queries: list[str],
+    *,
+    top_ks: list[int],
+    filters: RetrievalFilters,
+    exhaustive: bool = False,
+) -> tuple[list[list[RetrievedChunk]], int | None]:
+    """Results per query plus the number of database rows scored (None for indexes).
+
+    Each step runs under a `time_stage`: `retrieval.index` (catching the index up with
+    new chunks), `retrieval.embed`, `retrieval.candidates`, `retrieval.score` (index
+    searches include their own top-k selection), `retrieval.sort` and, via `_hydrate`,
+    `retrieval.hydrate`.
+    """
+    settings = get_settings()
+    provider = settings.retrieval_provider
+    if provider in {"bm25", "inverted-index"}:
+        with time_stage("retrieval.index"):
+            index = get_inverted_index(session)
+        with time_stage("retrieval.score"):
+            scored = [
+                index.search(query, top_k=k, filters=filters)
+                for query, k in zip(queries, top_ks, strict=True)
+            ]
+        return _hydrate(session, scored), None
+
+    if provider in {"sharded", "sharded-bm25"}:
+        with time_stage("retrieval.index"):
+            sharded = get_sharded_index(session)
+        with time_stage("retrieval.score"):
+            scored = sharded.search_many(
+                queries, top_ks=top_ks, filters=filters, session=session
             )
+        return _hydrate(session, scored), None
+
+    if provider in {"dense", "hashed-dense", "lsm", "lsm-dense", "pq", "dense-pq"}:
+        with time_stage("retrieval.index"):
+            vector_index: DenseVectorIndex | LsmVectorIndex | QuantizedVectorIndex
+            if provider in {"dense", "hashed-dense"}:
+                vector_index = get_dense_index(session)
+            elif provider in {"lsm", "lsm-dense"}:
+                vector_index = get_lsm_index(session)
+            else:
+                vector_index = get_quantized_index(session)
+        with time_stage("retrieval.embed"):
+            vectors = _embed_dense_queries(vector_index.provider, queries)
+        with time_stage("retrieval.score"):
+            scored = vector_index.search_many(vectors, top_ks=top_ks, filters=filters)
+        return _hydrate(session, scored), None
+
+    if provider in {"ivf", "ivf-dense"}:
+        with time_stage("retrieval.index"):
+            ivf, dense = get_ivf_index(session)
+        with time_stage("retrieval.embed"):
+            vectors = _embed_dense_queries(dense.provider, queries)
+        with time_stage("retrieval.score"):
+            scored = ivf.search_many(dense, vectors, top_ks=top_ks, filters=filters)
+        return _hydrate(session, scored), None
+
+    if provider in {"segmented", "segmented-sparse"}:
+        with time_stage("retrieval.index"):
+            segments, matrix = get_segmented_index(session)
+        with time_stage("retrieval.candidates"):
+            segment_rows, _ = segments.candidate_rows(filters)
+        with time_stage("retrieval.embed"):
+            query_vectors = get_vocabulary().encode_many(
+                session, [_embed_query(settings.embedding_provider, query) for query in queries]
+            )
+        with time_stage("retrieval.score"):
+            scores = matrix.score_many(query_vectors, segment_rows)
+        with time_stage("retrieval.sort"):
+            scored = [
+                [
+                    (matrix.chunk_ids[segment_rows[idx]], float(query_scores[idx]))
+                    for idx in top_k_indices(query_scores, k)
+                ]
+                for query_scores, k in zip(scores, top_ks, strict=True)
+            ]
+        return _hydrate(session, scored), None
+
+    stmt: Select = filters.apply(select(DocumentChunk))
+    sparse = None
+    if provider in {"sparse-local", "local-sparse", "sparse"}:
+        with time_stage("retrieval.embed"):
+            query_vectors = get_vocabulary().encode_many(
+                session, [_embed_query(settings.embedding_provider, query) for query in queries]
+            )
+        with time_stage("retrieval.index"):
+            sparse = (query_vectors, get_scoring_matrix(session))
+    if exhaustive:
+        return _scan_all(
+            session,
+            stmt,
+            queries,
+            top_ks=top_ks,
+            sparse=sparse,
+            batch_size=settings.retrieval_scan_batch_size,
         )
-    return results
+
+    # Candidate cap keeps lexical ranking predictable and fast for local development.
+    with time_stage("retrieval.candidates"):
+        rows = list(session.scalars(stmt.limit(300)))
+    with time_stage("retrieval.score"):
+        scores = _score_rows(queries, rows, sparse)
+    with time_stage("retrieval.sort"):
+        results = [
+            [
+                _to_retrieved(rows[idx], float(query_scores[idx]))
+                for idx in top_k_indices(query_scores, k)
+                if query_scores[idx] > 0
+            ]
+            for query_scores, k in zip(scores, top_ks, strict=True)
+        ]
+    return results, len(rows)
+
+
+def _scan_all(
+    session: Session,
+    stmt: Select,
+    queries: list[str],
+    *,
+    top_ks: list[int],
+    sparse: tuple[list[PackedSparseVector], SparseScoringMatrix] | None,
+    batch_size: int,
+) -> tuple[list[list[RetrievedChunk]], int]:
+    """Score every row matched by `stmt`, paging through it by chunk id.
+
+    Each query keeps a min-heap of its best `k` rows, so memory is bounded by the page
+    size and `top_k` rather than by how many rows match. Ties go to the older row.
+    """
+    heaps: list[list[tuple[float, int, RetrievedChunk]]] = [[] for _ in queries]
+    stmt = stmt.order_by(DocumentChunk.id).limit(max(batch_size, 1))
+    scanned = 0
+    last_id = 0
+    while True:
+        with time_stage("retrieval.candidates"):
+            rows = list(session.scalars(stmt.where(DocumentChunk.id > last_id)))
+        if not rows:
+            break
+        with time_stage("retrieval.score"):
+            scores = _score_rows(queries, rows, sparse)
+        with time_stage("retrieval.sort"):
+            for heap, query_scores, k in zip(heaps, scores, top_ks, strict=True):
+                # A stable sort, unlike argpartition, breaks ties the same way on every page.
+                for idx in np.argsort(-query_scores, kind="stable")[:k]:
+                    score = float(query_scores[idx])
+                    if score <= 0:
+                        break
+                    key = (score, -rows[idx].id)
+                    if len(heap) == k and key <= heap[0][:2]:
+                        break
+                    entry = (*key, _to_retrieved(rows[idx], score))
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    else:
+                        heapq.heapreplace(heap, entry)
+        scanned += len(rows)
+        last_id = rows[-1].id
+    with time_stage("retrieval.sort"):
+        results = [
+            [chunk for *_, chunk in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+            for heap in heaps
+        ]
+    return results, scanned
+
+
+def _score_rows(
+    queries: list[str],
+    rows: list[DocumentChunk],
+    sparse: tuple[list[PackedSparseVector], SparseScoringMatrix] | None,
+) -> np.ndarray:
+    scores = _lexical_scores(queries, rows)
+    if sparse is not None:
+        query_vectors, matrix = sparse
+        cosine = matrix.score_many(query_vectors, matrix.rows_for([row.chunk_id for row in rows]))
+        scores = np.maximum(cosine, scores)
+    return scores
+
+
+def _lexical_scores(queries: list[str], rows: list[DocumentChunk]) -> np.ndarray:
+    """Fraction of each query's terms present in each row, shaped (queries, rows)."""
+    # One call, so query and row ids come from the same intern table.
+    term_ids = get_tokenizer().term_ids_many(queries + [row.content for row in rows])
+    query_ids = [np.unique(ids) for ids in term_ids[: len(queries)]]
+    # Only query terms get a column; row ids are matched against them by binary search.
+    columns = np.unique(np.concatenate([np.empty(0, dtype=np.int64), *query_ids]))
+    query_block = np.zeros((len(queries), columns.size), dtype=np.float64)
+    for qi, ids in enumerate(query_ids):
+        if ids.size:
+            query_block[qi, np.searchsorted(columns, ids)] = 1.0 / ids.size
+    row_block = np.zeros((len(rows), columns.size), dtype=np.float64)
+    if columns.size:
+        row_ids = term_ids[len(queries) :]
+        flat = np.concatenate([np.empty(0, dtype=np.int64), *row_ids])
+        positions = np.minimum(np.searchsorted(columns, flat), columns.size - 1)
+        matched = columns[positions] == flat
+        row_of = np.repeat(np.arange(len(rows)), [ids.size for ids in row_ids])
+        row_block[row_of[matched], positions[matched]] = 1.0
+    return query_block @ row_block.T
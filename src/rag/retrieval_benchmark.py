@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import resource
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import numpy as np
+
+from src.common.settings import get_settings
+from src.data_ingestion.schemas import IngestDocumentInput
+from src.rag.filters import RetrievalFilters
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+TICKERS = [
+    "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "BRK.B", "AVGO", "JPM",
+    "LLY", "V", "UNH", "XOM", "MA", "JNJ", "PG", "HD", "COST", "ORCL",
+    "MRK", "ABBV", "CVX", "CRM", "BAC", "KO", "NFLX", "PEP", "AMD", "ADBE",
+    "WMT", "TMO", "LIN", "MCD", "CSCO", "ACN", "ABT", "WFC", "DHR", "INTC",
+    "DIS", "INTU", "TXN", "QCOM", "VZ", "AMGN", "CAT", "IBM", "PFE", "GE",
+    "NOW", "UNP", "SPGI", "AMAT", "ISRG", "GS", "LOW", "HON", "BKNG", "RTX",
+    "T", "NEE", "PLD", "BLK", "SYK", "ELV", "MS", "MDT", "DE", "LMT",
+    "SBUX", "TJX", "ADP", "GILD", "MMC", "C", "ADI", "REGN", "VRTX", "CB",
+    "SCHW", "MU", "LRCX", "ZTS", "BMY", "CI", "MO", "SO", "PANW", "FI",
+    "BSX", "ETN", "SNPS", "KLAC", "EQIX", "DUK", "CDNS", "ICE", "SHW", "UPS",
+]
+SOURCES = ["news", "filings", "transcripts", "research"]
+_SOURCE_WEIGHTS = [0.55, 0.15, 0.15, 0.15]
+_METRICS = [
+    "revenue", "gross margin", "operating margin", "free cash flow", "earnings per share",
+    "guidance", "capex", "buybacks", "dividend", "inventory", "backlog", "subscribers",
+    "pricing", "operating expenses", "net interest income", "data center sales",
+]
+_DRIVERS = [
+    "cloud demand", "AI accelerators", "consumer spending", "supply constraints",
+    "foreign exchange", "higher rates", "cost cuts", "new product launches",
+    "enterprise adoption", "channel inventory", "regulatory pressure", "share gains",
+]
+_MOVES = ["rose", "fell", "expanded", "contracted", "beat estimates", "missed estimates",
+          "accelerated", "slowed", "held steady", "surprised to the upside"]
+_START = datetime(2023, 1, 1)
+_DAYS = 3 * 365
+
+
+def _sentence(rng: np.random.Generator, ticker: str) -> str:
+    metric = _METRICS[rng.integers(len(_METRICS))]
+    move = _MOVES[rng.integers(len(_MOVES))]
+    driver = _DRIVERS[rng.integers(len(_DRIVERS))]
+    return (
+        f"{ticker} {metric} {move} {rng.integers(1, 40)}% in Q{rng.integers(1, 5)} "
+        f"on {driver}, versus {rng.integers(1, 40)}% a year earlier."
+    )
+
+
+def synthetic_documents(seed: int) -> Iterator[IngestDocumentInput]:
+    """Endless seeded stream of finance-like documents.
+
+    Tickers follow a Zipf-like popularity curve, most documents are one-chunk news items
+    and filings, transcripts and research notes run to several chunks; publish dates
+    span three years.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, len(TICKERS) + 1) ** 0.8
+    popularity /= popularity.sum()
+    while True:
+        ticker = TICKERS[rng.choice(len(TICKERS), p=popularity)]
+        source = SOURCES[rng.choice(len(SOURCES), p=_SOURCE_WEIGHTS)]
+        sentences = rng.integers(3, 7) if source == "news" else rng.integers(12, 30)
+        yield IngestDocumentInput(
+            source=source,
+            ticker=ticker,
+            title=f"{ticker} {source} update",
+            content=" ".join(_sentence(rng, ticker) for _ in range(sentences)),
+            published_at=_START + timedelta(days=int(rng.integers(_DAYS))),
+        )
+
+
+def synthetic_queries(count: int, seed: int) -> list[tuple[str, RetrievalFilters]]:
+    """Seeded questions with the mix of filters `/qa` sees: ticker, date window, source."""
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for _ in range(count):
+        ticker = TICKERS[rng.integers(len(TICKERS))]
+        metric = _METRICS[rng.integers(len(_METRICS))]
+        driver = _DRIVERS[rng.integers(len(_DRIVERS))]
+        kind = rng.random()
+        if kind < 0.4:
+            filters = RetrievalFilters(ticker=ticker)
+        elif kind < 0.6:
+            start = _START + timedelta(days=int(rng.integers(_DAYS - 90)))
+            filters = RetrievalFilters(date_from=start, date_to=start + timedelta(days=90))
+        elif kind < 0.7:
+            filters = RetrievalFilters(source=SOURCES[rng.integers(len(SOURCES))])
+        else:
+            filters = RetrievalFilters()
+        queries.append((f"How did {ticker} {metric} change with {driver}?", filters))
+    return queries
+
+
+@dataclass
+class CorpusLoad:
+    documents: int
+    chunks: int
+    seconds: float
+
+
+def load_synthetic_corpus(
+    session, chunks: int, *, seed: int, batch_size: int = 500
+) -> CorpusLoad:
+    """Ingest synthetic documents through `ingest_documents` until `chunks` are stored."""
+    from src.data_ingestion.pipelines.document_ingestion import ingest_documents
+
+    documents = synthetic_documents(seed)
+    loaded = CorpusLoad(documents=0, chunks=0, seconds=0.0)
+    started = perf_counter()
+    while loaded.chunks < chunks:
+        # News items are one chunk, so smaller batches near the end limit overshoot.
+        size = max(1, min(batch_size, chunks - loaded.chunks))
+        batch = [next(documents) for _ in range(size)]
+        summary = ingest_documents(session, batch)
+        loaded.documents += summary.documents_ingested
+        loaded.chunks += summary.chunks_ingested
+    loaded.seconds = round(perf_counter() - started, 3)
+    return loaded
+
+
+# Each provider is scored against the exact ranking of its own scoring function: the
+# sparse scan takes the better of cosine and term overlap, segments rank by cosine alone.
+_SPARSE = {"sparse-local", "local-sparse", "sparse"}
+_COSINE = {"segmented", "segmented-sparse"}
+_BM25 = {"bm25", "inverted-index", "sharded", "sharded-bm25"}
+_DENSE = {"dense", "hashed-dense", "lsm", "lsm-dense", "pq", "dense-pq", "ivf", "ivf-dense"}
+# Exact rankings are read this many times deeper than top-k to find rows tied at the cutoff.
+_TIE_DEPTH = 10
+
+
+def baseline_family(provider: str) -> str:
+    for family, providers in (
+        ("sparse", _SPARSE), ("cosine", _COSINE), ("bm25", _BM25), ("dense", _DENSE)
+    ):
+        if provider in providers:
+            return family
+    raise ValueError(f"unknown retrieval provider: {provider}")
+
+
+@dataclass
+class RetrievalBenchmarkPoint:
+    provider: str
+    embedding_provider: str
+    queries: int
+    warmup_ms: float
+    qps: float
+    p50_ms: float
+    p99_ms: float
+    recall_at_k: float
+    peak_rss_mb: float
+    peak_child_rss_mb: float
+
+
+def _configure(**overrides: str) -> None:
+    for key, value in overrides.items():
+        os.environ[key] = value
+    get_settings.cache_clear()
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in KiB on Linux.
+    return round(resource.getrusage(who).ru_maxrss / 1024.0, 1)
+
+
+def _with_ties(scored: list[tuple[str, float]], top_k: int) -> list[str]:
+    """Ids of the exact top-k plus every row tied with the k-th score.
+
+    Templated corpora produce many equal scores, and which of them lands in the top-k is
+    arbitrary, so any of the tied rows counts as a hit.
+    """
+    if len(scored) <= top_k:
+        return [chunk_id for chunk_id, _ in scored]
+    cutoff = scored[top_k - 1][1] - 1e-9
+    return [chunk_id for chunk_id, score in scored if score >= cutoff]
+
+
+def _exact_cosine(
+    session: Session, queries: list[tuple[str, RetrievalFilters]], depth: int
+) -> Iterator[list[tuple[str, float]]]:
+    from sqlalchemy import select
+
+    from src.core.models import DocumentChunk
+    from src.rag.embeddings import get_sparse_embedding_provider
+    from src.rag.sparse_matrix import get_scoring_matrix, top_k_indices
+    from src.rag.vocabulary import get_vocabulary
+
+    provider = get_sparse_embedding_provider(get_settings().embedding_provider)
+    matrix = get_scoring_matrix(session)
+    vectors = get_vocabulary().encode_many(session, [provider.embed(q) for q, _ in queries])
+    for vector, (_, filters) in zip(vectors, queries, strict=True):
+        chunk_ids = session.scalars(filters.apply(select(DocumentChunk.chunk_id))).all()
+        rows = matrix.rows_for(list(chunk_ids))
+        rows = rows[rows >= 0]
+        scores = matrix.score_many([vector], rows)[0]
+        yield [
+            (matrix.chunk_ids[rows[idx]], float(scores[idx]))
+            for idx in top_k_indices(scores, depth)
+            if scores[idx] > 0
+        ]
+
+
+def exact_rankings(
+    family: str, embedding_provider: str, queries: list[tuple[str, RetrievalFilters]], top_k: int
+) -> list[list[str]]:
+    """Tie-extended exhaustive top-k (see `_with_ties`) of every query under one family."""
+    from src.common.db import SessionLocal
+    from src.rag.inverted_index import get_inverted_index
+    from src.rag.retrieval import retrieve_chunks_batch
+
+    depth = top_k * _TIE_DEPTH
+    texts = [query for query, _ in queries]
+    filters = [query_filters for _, query_filters in queries]
+    with SessionLocal() as session:
+        if family == "bm25":
+            index = get_inverted_index(session)
+            scored = [index.search_exhaustive(q, top_k=depth, filters=f) for q, f in queries]
+        elif family == "cosine":
+            scored = list(_exact_cosine(session, queries, depth))
+        else:
+            if family == "sparse":
+                _configure(RETRIEVAL_PROVIDER="sparse-local")
+            else:
+                # Brute-force cosine over every stored vector.
+                _configure(RETRIEVAL_PROVIDER="dense", DENSE_EMBEDDING_PROVIDER=embedding_provider)
+            results = retrieve_chunks_batch(
+                session, texts, filters, top_k=depth, exhaustive=family == "sparse"
+            )
+            scored = [[(chunk.chunk_id, chunk.score) for chunk in found] for found in results]
+    return [_with_ties(ranking, top_k) for ranking in scored]
+
+
+def measure_provider(
+    provider: str,
+    embedding_provider: str,
+    queries: list[tuple[str, RetrievalFilters]],
+    top_k: int,
+    truth: list[list[str]],
+) -> RetrievalBenchmarkPoint:
+    """Time retrieval one query at a time, as `/qa` calls it, with the result cache off."""
+    from src.common.db import SessionLocal
+    from src.rag.ivf_index import close_ivf_index, get_ivf_index
+    from src.rag.retrieval import retrieve_chunks_batch
+    from src.rag.sharded_index import close_sharded_index
+
+    _configure(
+        RETRIEVAL_PROVIDER=provider,
+        DENSE_EMBEDDING_PROVIDER=embedding_provider,
+        RETRIEVAL_CACHE_MAX_ENTRIES="0",
+    )
+    latencies_ms: list[float] = []
+    recalls: list[float] = []
+    try:
+        with SessionLocal() as session:
+            # The first call builds or loads the provider's index.
+            started = perf_counter()
+            retrieve_chunks_batch(session, [queries[0][0]], queries[0][1], top_k=top_k)
+            if provider in {"ivf", "ivf-dense"}:
+                # IVF fits its centroids off the query path; wait for that here.
+                get_ivf_index(session)[0].maintain()
+            warmup_ms = (perf_counter() - started) * 1000.0
+            run_started = perf_counter()
+            for (query, filters), expected in zip(queries, truth, strict=True):
+                started = perf_counter()
+                [retrieved] = retrieve_chunks_batch(session, [query], filters, top_k=top_k)
+                latencies_ms.append((perf_counter() - started) * 1000.0)
+                if expected:
+                    needed = min(top_k, len(expected))
+                    hits = len({chunk.chunk_id for chunk in retrieved}.intersection(expected))
+                    recalls.append(min(hits, needed) / needed)
+            elapsed = perf_counter() - run_started
+    finally:
+        # Shard workers would otherwise keep this process from exiting; closing them
+        # first also counts their peak memory under RUSAGE_CHILDREN.
+        close_sharded_index()
+        close_ivf_index()
+    latencies = np.array(latencies_ms)
+    settings = get_settings()
+    return RetrievalBenchmarkPoint(
+        provider=provider,
+        embedding_provider=(
+            embedding_provider if baseline_family(provider) == "dense"
+            else settings.embedding_provider
+        ),
+        queries=len(queries),
+        warmup_ms=round(warmup_ms, 3),
+        qps=round(len(queries) / elapsed, 1),
+        p50_ms=round(float(np.percentile(latencies, 50)), 3),
+        p99_ms=round(float(np.percentile(latencies, 99)), 3),
+        recall_at_k=round(float(np.mean(recalls)), 4) if recalls else 1.0,
+        peak_rss_mb=_peak_rss_mb(resource.RUSAGE_SELF),
+        peak_child_rss_mb=_peak_rss_mb(resource.RUSAGE_CHILDREN),
+    )
+
+
+def _isolated(fn: Callable[..., T], *args: Any) -> T:
+    """Run `fn(*args)` in a fresh spawned process, so its indexes and peak RSS are its own."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def benchmark_providers(
+    providers: list[str],
+    embedding_providers: list[str],
+    queries: list[tuple[str, RetrievalFilters]],
+    *,
+    top_k: int = 10,
+) -> list[RetrievalBenchmarkPoint | dict]:
+    """Measure each retrieval provider (dense ones per embedding provider) in isolation.
+
+    A provider that fails is reported as `{"provider", "embedding_provider", "error"}`
+    so one broken configuration does not lose the rest of a long run.
+    """
+    truths: dict[tuple[str, str], list[list[str]]] = {}
+    points: list[RetrievalBenchmarkPoint | dict] = []
+    for provider in providers:
+        family = baseline_family(provider)
+        for embedding in embedding_providers if family == "dense" else embedding_providers[:1]:
+            key = (family, embedding if family == "dense" else "")
+            try:
+                if key not in truths:
+                    truths[key] = _isolated(exact_rankings, family, embedding, queries, top_k)
+                points.append(
+                    _isolated(measure_provider, provider, embedding, queries, top_k, truths[key])
+                )
+            except Exception as exc:
+                points.append(
+                    {"provider": provider, "embedding_provider": embedding, "error": repr(exc)}
+                )
+    return points
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.common.observability import RETRIEVAL_SEGMENT_COUNTER
+from src.core.models import DocumentChunk
+from src.rag.filters import RetrievalFilters, to_datetime64, to_naive_utc
+from src.rag.sparse_matrix import SparseScoringMatrix, get_scoring_matrix
+
+UNDATED_SEGMENT = "undated"
+
+
+def _month_key(published_at: datetime | None) -> str:
+    if published_at is None:
+        return UNDATED_SEGMENT
+    return f"{published_at.year:04d}-{published_at.month:02d}"
+
+
+@dataclass(frozen=True)
+class TimeSegment:
+    """Immutable slice of the corpus covering one calendar month.
+
+    `rows` are scoring-matrix row numbers. Each ticker and source present in the
+    segment has a bitmap over those rows, so a filtered query can skip the segment
+    entirely or select its rows without touching the database.
+    """
+
+    key: str
+    rows: np.ndarray
+    published: np.ndarray
+    tickers: np.ndarray
+    sources: np.ndarray
+    ticker_bitmaps: dict[str | None, np.ndarray]
+    source_bitmaps: dict[str, np.ndarray]
+    min_published_at: datetime | None
+    max_published_at: datetime | None
+
+    def __len__(self) -> int:
+        return int(self.rows.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        key: str,
+        rows: np.ndarray,
+        published: np.ndarray,
+        tickers: np.ndarray,
+        sources: np.ndarray,
+    ) -> TimeSegment:
+        dated = published[~np.isnat(published)]
+        return cls(
+            key=key,
+            rows=rows,
+            published=published,
+            tickers=tickers,
+            sources=sources,
+            ticker_bitmaps={t: tickers == t for t in dict.fromkeys(tickers.tolist())},
+            source_bitmaps={s: sources == s for s in dict.fromkeys(sources.tolist())},
+            min_published_at=dated.min().astype(datetime) if dated.size else None,
+            max_published_at=dated.max().astype(datetime) if dated.size else None,
+        )
+
+    def merge(self, other: TimeSegment) -> TimeSegment:
+        return TimeSegment.build(
+            self.key,
+            np.concatenate([self.rows, other.rows]),
+            np.concatenate([self.published, other.published]),
+            np.concatenate([self.tickers, other.tickers]),
+            np.concatenate([self.sources, other.sources]),
+        )
+
+    def may_match(self, filters: RetrievalFilters) -> bool:
+        if filters.ticker and filters.ticker not in self.ticker_bitmaps:
+            return False
+        if filters.source and filters.source not in self.source_bitmaps:
+            return False
+        if filters.date_from or filters.date_to:
+            if self.min_published_at is None or self.max_published_at is None:
+                return False
+            date_from = to_naive_utc(filters.date_from)
+            date_to = to_naive_utc(filters.date_to)
+            if date_from and self.max_published_at < date_from:
+                return False
+            if date_to and self.min_published_at > date_to:
+                return False
+        return True
+
+    def select(self, filters: RetrievalFilters) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        if filters.ticker:
+            mask &= self.ticker_bitmaps[filters.ticker]
+        if filters.source:
+            mask &= self.source_bitmaps[filters.source]
+        if filters.date_from:
+            mask &= self.published >= to_datetime64(filters.date_from)
+        if filters.date_to:
+            mask &= self.published <= to_datetime64(filters.date_to)
+        return self.rows[mask]
+
+
+@dataclass
+class SegmentPruneStats:
+    segments_total: int = 0
+    segments_opened: int = 0
+    rows_selected: int = 0
+
+    @property
+    def segments_pruned(self) -> int:
+        return self.segments_total - self.segments_opened
+
+
+@dataclass
+class SegmentedIndex:
+    """Monthly segments over the sparse scoring matrix for date-filtered retrieval.
+
+    New chunks are grouped by publication month. A month's newest segment is replaced
+    by a merged copy until it reaches `segment_rows`; after that a new segment starts.
+    """
+
+    segment_rows: int = 50_000
+    high_water_mark: int = 0
+    segments: list[TimeSegment] = field(default_factory=list)
+    _lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+
+    def refresh(
+        self, session: Session, matrix: SparseScoringMatrix, *, batch_size: int = 5000
+    ) -> int:
+        added = 0
+        with self._lock:
+            while True:
+                rows = session.execute(
+                    select(
+                        DocumentChunk.id,
+                        DocumentChunk.chunk_id,
+                        DocumentChunk.ticker,
+                        DocumentChunk.source,
+                        DocumentChunk.published_at,
+                    )
+                    .where(DocumentChunk.id > self.high_water_mark)
+                    .order_by(DocumentChunk.id)
+                    .limit(batch_size)
+                ).all()
+                if rows:
+                    self._add_rows(rows, matrix)
+                    self.high_water_mark = rows[-1].id
+                    added += len(rows)
+                if len(rows) < batch_size:
+                    return added
+
+    def _add_rows(self, rows: Sequence, matrix: SparseScoringMatrix) -> None:
+        by_month: dict[str, list] = {}
+        for row in rows:
+            by_month.setdefault(_month_key(row.published_at), []).append(row)
+        for key, month_rows in by_month.items():
+            matrix_rows = matrix.rows_for([row.chunk_id for row in month_rows])
+            kept = [row for row, mrow in zip(month_rows, matrix_rows, strict=True) if mrow >= 0]
+            if not kept:
+                continue
+            segment = TimeSegment.build(
+                key,
+                matrix_rows[matrix_rows >= 0],
+                np.array([to_datetime64(row.published_at) for row in kept]),
+                np.array([row.ticker for row in kept], dtype=object),
+                np.array([row.source for row in kept], dtype=object),
+            )
+            last = next(
+                (i for i in range(len(self.segments) - 1, -1, -1) if self.segments[i].key == key),
+                None,
+            )
+            if last is not None and len(self.segments[last]) + len(segment) <= self.segment_rows:
+                self.segments[last] = self.segments[last].merge(segment)
+            else:
+                self.segments.append(segment)
+
+    def candidate_rows(self, filters: RetrievalFilters) -> tuple[np.ndarray, SegmentPruneStats]:
+        with self._lock:
+            segments = list(self.segments)
+        stats = SegmentPruneStats(segments_total=len(segments))
+        selected: list[np.ndarray] = []
+        for segment in segments:
+            if not segment.may_match(filters):
+                continue
+            stats.segments_opened += 1
+            selected.append(segment.select(filters))
+        rows = np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+        stats.rows_selected = int(rows.shape[0])
+        RETRIEVAL_SEGMENT_COUNTER.labels("opened").inc(stats.segments_opened)
+        RETRIEVAL_SEGMENT_COUNTER.labels("pruned").inc(stats.segments_pruned)
+        return rows, stats
+
+
+_segments: SegmentedIndex | None = None
+_segments_lock = threading.Lock()
+
+
+def get_segmented_index(session: Session) -> tuple[SegmentedIndex, SparseScoringMatrix]:
+    """Return the process-wide segments and the matrix their rows point into."""
+    global _segments
+    with _segments_lock:
+        if _segments is None:
+            _segments = SegmentedIndex()
+        segments = _segments
+    matrix = get_scoring_matrix(session)
+    segments.refresh(session, matrix)
+    return segments, matrix
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import heapq
+import multiprocessing
+import threading
+import zlib
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from itertools import chain
+from typing import Any, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.common.settings import get_settings
+from src.core.models import DocumentChunk
+from src.rag.filters import RetrievalFilters
+from src.rag.inverted_index import CorpusStats, InvertedIndex
+from src.rag.tokenizer import tokenize
+
+ShardRow = tuple[str, str, str | None, str, datetime | None]
+T = TypeVar("T")
+
+# The shard held by a worker process; each worker pool has exactly one process.
+_shard: InvertedIndex | None = None
+
+
+def _init_shard(k1: float, b: float) -> None:
+    global _shard
+    _shard = InvertedIndex(k1=k1, b=b)
+
+
+def _worker_shard() -> InvertedIndex:
+    if _shard is None:
+        raise RuntimeError("shard worker was not initialised")
+    return _shard
+
+
+def _add_to_shard(rows: list[ShardRow]) -> CorpusStats:
+    shard = _worker_shard()
+    added = CorpusStats()
+    for chunk_id, content, ticker, source, published_at in rows:
+        counts = shard.add(
+            chunk_id, content, ticker=ticker, source=source, published_at=published_at
+        )
+        if counts is not None:
+            added.add_document(counts)
+    return added
+
+
+def _search_shard(
+    queries: list[str],
+    top_ks: list[int],
+    filters: RetrievalFilters | None,
+    corpus: CorpusStats,
+) -> list[list[tuple[str, float]]]:
+    shard = _worker_shard()
+    return [
+        shard.search(query, top_k=k, filters=filters, corpus=corpus)
+        for query, k in zip(queries, top_ks, strict=True)
+    ]
+
+
+def _chunk_rows(
+    session: Session, *, after: int, batch_size: int, upto: int | None = None
+) -> Sequence[Any]:
+    query = select(
+        DocumentChunk.id,
+        DocumentChunk.chunk_id,
+        DocumentChunk.content,
+        DocumentChunk.ticker,
+        DocumentChunk.source,
+        DocumentChunk.published_at,
+    ).where(DocumentChunk.id > after)
+    if upto is not None:
+        query = query.where(DocumentChunk.id <= upto)
+    return session.execute(query.order_by(DocumentChunk.id).limit(batch_size)).all()
+
+
+def _shard_row(row: Any) -> ShardRow:
+    return (row.chunk_id, row.content, row.ticker, row.source, row.published_at)
+
+
+def shard_for_ticker(ticker: str | None, shards: int) -> int:
+    """Stable shard number of `ticker` (crc32, so it agrees across processes and runs)."""
+    return zlib.crc32((ticker or "").encode("utf-8")) % shards
+
+
+class ShardedIndex:
+    """BM25 index partitioned by ticker across worker processes (scatter-gather).
+
+    Each shard is an `InvertedIndex` living in its own single-process pool, so shards
+    score in parallel without the GIL. This process keeps corpus-wide document
+    frequencies and ships them with every query, which makes shard scores identical to
+    an unsharded index; the per-shard top-k lists are merged here. Ticker-filtered
+    queries only visit the ticker's shard.
+
+    A shard whose process dies is restarted empty and marked stale; `refresh` (and
+    `search_many` when given a session) re-adds its chunks from the database.
+    """
+
+    def __init__(self, shards: int, *, k1: float = 1.2, b: float = 0.75) -> None:
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.shards = shards
+        self.high_water_mark = 0
+        self.corpus = CorpusStats()
+        self._k1 = k1
+        self._b = b
+        # Spawned rather than forked: the API process runs threads (LSM compaction,
+        # executors) whose locks a forked child could inherit mid-acquire.
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [self._start_worker() for _ in range(shards)]
+        self._stale: set[int] = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self.corpus.documents
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.shutdown(wait=True, cancel_futures=True)
+
+    def _start_worker(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self._context,
+            initializer=_init_shard,
+            initargs=(self._k1, self._b),
+        )
+
+    def _restart(self, shard: int) -> None:
+        with self._lock:
+            self._workers[shard].shutdown(wait=False, cancel_futures=True)
+            self._workers[shard] = self._start_worker()
+            self._stale.add(shard)
+
+    def _map(
+        self, fn: Callable[..., T], args: dict[int, tuple[Any, ...]]
+    ) -> tuple[dict[int, T], list[int]]:
+        """Run `fn` on each shard; returns the results and the shards whose process died.
+
+        Dead shards are restarted empty and marked stale before this returns.
+        """
+        futures: dict[int, Future[T]] = {}
+        broken: list[int] = []
+        for shard, shard_args in args.items():
+            try:
+                futures[shard] = self._workers[shard].submit(fn, *shard_args)
+            except BrokenProcessPool:
+                broken.append(shard)
+        results: dict[int, T] = {}
+        for shard, future in futures.items():
+            try:
+                results[shard] = future.result()
+            except BrokenProcessPool:
+                broken.append(shard)
+        for shard in broken:
+            self._restart(shard)
+        return results, broken
+
+    def shards_for(self, filters: RetrievalFilters | None) -> list[int]:
+        if filters is not None and filters.ticker:
+            return [shard_for_ticker(filters.ticker, self.shards)]
+        return list(range(self.shards))
+
+    def add_rows(self, rows: list[ShardRow]) -> int:
+        """Route `(chunk_id, content, ticker, source, published_at)` rows to their shards."""
+        parts: list[list[ShardRow]] = [[] for _ in range(self.shards)]
+        for row in rows:
+            parts[shard_for_ticker(row[2], self.shards)].append(row)
+        added, broken = self._map(
+            _add_to_shard, {shard: (part,) for shard, part in enumerate(parts) if part}
+        )
+        # Surviving shards keep their rows, so a retry of the batch only counts the rest.
+        with self._lock:
+            for stats in added.values():
+                self.corpus.merge(stats)
+        if broken:
+            raise BrokenProcessPool(f"shard processes {broken} died and were restarted")
+        return sum(stats.documents for stats in added.values())
+
+    def reload_stale(self, session: Session, *, batch_size: int = 1000) -> None:
+        """Re-add indexed chunks to restarted shards; their documents are already counted."""
+        with self._lock:
+            stale = set(self._stale)
+            if not stale:
+                return
+            after = 0
+            while True:
+                rows = _chunk_rows(
+                    session, after=after, batch_size=batch_size, upto=self.high_water_mark
+                )
+                parts: dict[int, list[ShardRow]] = {shard: [] for shard in stale}
+                for row in rows:
+                    part = parts.get(shard_for_ticker(row.ticker, self.shards))
+                    if part is not None:
+                        part.append(_shard_row(row))
+                _, broken = self._map(
+                    _add_to_shard, {shard: (part,) for shard, part in parts.items() if part}
+                )
+                if broken:
+                    raise BrokenProcessPool(f"shard processes {broken} died while reloading")
+                if len(rows) < batch_size:
+                    break
+                after = rows[-1].id
+            self._stale -= stale
+
+    def refresh(self, session: Session, *, batch_size: int = 1000) -> int:
+        """Index chunks stored after the current high-water mark; returns rows added."""
+        added = 0
+        with self._lock:
+            self.reload_stale(session, batch_size=batch_size)
+            while True:
+                rows = _chunk_rows(session, after=self.high_water_mark, batch_size=batch_size)
+                if rows:
+                    added += self.add_rows([_shard_row(row) for row in rows])
+                    self.high_water_mark = rows[-1].id
+                if len(rows) < batch_size:
+                    return added
+
+    def search_many(
+        self,
+        queries: list[str],
+        *,
+        top_ks: list[int],
+        filters: RetrievalFilters | None = None,
+        session: Session | None = None,
+    ) -> list[list[tuple[str, float]]]:
+        """Fan `queries` out to the shards `filters` can match and merge their top-k.
+
+        With a `session`, shards whose process died are reloaded and asked once more.
+        """
+        if not queries:
+            return []
+        terms = {term for query in queries for term in tokenize(query)}
+        with self._lock:
+            corpus = self.corpus.restrict(terms)
+        args = (queries, top_ks, filters, corpus)
+        results, broken = self._map(_search_shard, dict.fromkeys(self.shards_for(filters), args))
+        if broken and session is not None:
+            self.reload_stale(session)
+            retried, broken = self._map(_search_shard, dict.fromkeys(broken, args))
+            results.update(retried)
+        if broken:
+            raise BrokenProcessPool(f"shard processes {broken} died and were restarted")
+        per_shard = list(results.values())
+        return [
+            heapq.nlargest(
+                k, chain.from_iterable(hits[idx] for hits in per_shard), key=lambda hit: hit[1]
+            )
+            for idx, k in enumerate(top_ks)
+        ]
+
+
+_sharded_index: ShardedIndex | None = None
+_sharded_index_lock = threading.Lock()
+
+
+def get_sharded_index(session: Session | None = None) -> ShardedIndex:
+    """Return the process-wide sharded index, first catching up with new chunks."""
+    global _sharded_index
+    shards = get_settings().retrieval_shards
+    with _sharded_index_lock:
+        if _sharded_index is None or _sharded_index.shards != shards:
+            if _sharded_index is not None:
+                _sharded_index.close()
+            _sharded_index = ShardedIndex(shards)
+        index = _sharded_index
+    if session is not None:
+        index.refresh(session)
+    return index
+
+
+def close_sharded_index() -> None:
+    """Shut down the shard worker processes; the next `get_sharded_index` starts new ones."""
+    global _sharded_index
+    with _sharded_index_lock:
+        if _sharded_index is not None:
+            _sharded_index.close()
+        _sharded_index = None
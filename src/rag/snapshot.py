@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import struct
+import uuid
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.models import DocumentChunk, EmbeddingMetadata
+from src.rag.inverted_index import InvertedIndex, get_inverted_index, set_inverted_index
+from src.rag.sparse_matrix import SparseScoringMatrix, get_scoring_matrix, set_scoring_matrix
+from src.rag.vocabulary import get_vocabulary
+
+SNAPSHOT_MAGIC = b"FLMIDX01"
+SNAPSHOT_VERSION = 2
+# magic, format version, payload length, sha256 of the payload
+_HEADER = struct.Struct("<8sIQ32s")
+
+
+class SnapshotError(ValueError):
+    """The snapshot file is missing, truncated, corrupt or from another format."""
+
+
+@dataclass
+class IndexSnapshot:
+    created_at: str
+    matrix: SparseScoringMatrix
+    inverted_index: InvertedIndex
+    vocabulary: dict[str, np.ndarray]
+
+
+def _prefixed(prefix: str, state: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    return {f"{prefix}.{name}": value for name, value in state.items()}
+
+
+def _unprefixed(prefix: str, arrays: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    start = len(prefix) + 1
+    return {name[start:]: value for name, value in arrays.items() if name.startswith(f"{prefix}.")}
+
+
+def write_snapshot(
+    path: Path | str,
+    matrix: SparseScoringMatrix,
+    inverted_index: InvertedIndex,
+) -> int:
+    """Serialize both lexical indexes and the vocabulary cache; returns bytes written.
+
+    The file is a fixed header (magic, format version, payload length and SHA-256)
+    followed by an uncompressed `.npz` payload. It is written to a temporary file and
+    swapped in with `os.replace`, so a crash never leaves a half-written snapshot.
+    """
+    meta = {"version": SNAPSHOT_VERSION, "created_at": datetime.now(UTC).isoformat()}
+    arrays = {
+        "meta": np.array(json.dumps(meta)),
+        **_prefixed("matrix", matrix.state()),
+        **_prefixed("bm25", inverted_index.state()),
+        **_prefixed("vocab", get_vocabulary().state()),
+    }
+    buffer = io.BytesIO()
+    np.savez(buffer, allow_pickle=False, **arrays)
+    payload = buffer.getvalue()
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(payload), hashlib.sha256(payload).digest()
+    )
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+    try:
+        with tmp.open("wb") as handle:
+            handle.write(header)
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return len(header) + len(payload)
+
+
+def read_snapshot(path: Path | str) -> IndexSnapshot:
+    try:
+        raw = Path(path).read_bytes()
+    except FileNotFoundError as exc:
+        raise SnapshotError(f"no snapshot at {path}") from exc
+    if len(raw) < _HEADER.size:
+        raise SnapshotError("snapshot header is truncated")
+    magic, version, length, digest = _HEADER.unpack_from(raw)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"unsupported snapshot format {magic!r} v{version}")
+    payload = memoryview(raw)[_HEADER.size :]
+    if len(payload) != length:
+        raise SnapshotError(f"snapshot payload is {len(payload)} bytes, expected {length}")
+    if hashlib.sha256(payload).digest() != digest:
+        raise SnapshotError("snapshot checksum mismatch")
+
+    with np.load(io.BytesIO(payload), allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    meta = json.loads(str(arrays["meta"]))
+    return IndexSnapshot(
+        created_at=meta["created_at"],
+        matrix=SparseScoringMatrix.from_state(_unprefixed("matrix", arrays)),
+        inverted_index=InvertedIndex.from_state(_unprefixed("bm25", arrays)),
+        vocabulary=_unprefixed("vocab", arrays),
+    )
+
+
+def _row_chunk_id(session: Session, model, row_id: int) -> str | None:
+    return session.execute(select(model.chunk_id).where(model.id == row_id)).scalar_one_or_none()
+
+
+def snapshot_matches_database(snapshot: IndexSnapshot, session: Session) -> bool:
+    """Check that the rows at both high-water marks still hold the same chunks.
+
+    A snapshot taken against another (or a since-reset) database would otherwise
+    silently skip every row below its high-water marks. Rows added after the snapshot
+    do not fail the check; loading replays them.
+    """
+    bm25 = snapshot.inverted_index
+    if bm25.high_water_mark and _row_chunk_id(
+        session, DocumentChunk, bm25.high_water_mark
+    ) != bm25.last_chunk_id:
+        return False
+    matrix = snapshot.matrix
+    return not matrix.high_water_mark or (
+        _row_chunk_id(session, EmbeddingMetadata, matrix.high_water_mark) == matrix.last_chunk_id
+    )
+
+
+def save_index_snapshot(session: Session, path: Path | str) -> int:
+    """Bring both process-wide indexes up to date and snapshot them."""
+    return write_snapshot(path, get_scoring_matrix(session), get_inverted_index(session))
+
+
+def load_index_snapshot(session: Session, path: Path | str) -> dict[str, int]:
+    """Install the snapshot at `path`, then replay rows ingested after it was taken.
+
+    Returns the rows loaded from the snapshot and the rows replayed from the database.
+    Raises `SnapshotError` when the file is unusable or does not match the database;
+    the process-wide indexes are left untouched in that case.
+    """
+    snapshot = read_snapshot(path)
+    if not snapshot_matches_database(snapshot, session):
+        raise SnapshotError("snapshot does not match the database")
+    loaded = {"matrix_rows": len(snapshot.matrix), "bm25_docs": len(snapshot.inverted_index)}
+    get_vocabulary().prime(snapshot.vocabulary)
+    replayed = {
+        "matrix_replayed": snapshot.matrix.refresh(session),
+        "bm25_replayed": snapshot.inverted_index.refresh(session),
+    }
+    set_scoring_matrix(snapshot.matrix)
+    set_inverted_index(snapshot.inverted_index)
+    return loaded | replayed
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Blob layout: n little-endian int32 term ids (ascending) followed by n float32 weights.
+TERM_ID_DTYPE = np.dtype("<i4")
+WEIGHT_DTYPE = np.dtype("<f4")
+
+
+@dataclass(frozen=True)
+class PackedSparseVector:
+    term_ids: np.ndarray
+    weights: np.ndarray
+    norm: float = field(default=-1.0)
+
+    def __post_init__(self) -> None:
+        if self.norm < 0:
+            weights = self.weights.astype(np.float64)
+            object.__setattr__(self, "norm", float(np.sqrt(weights @ weights)))
+
+    def __len__(self) -> int:
+        return int(self.term_ids.shape[0])
+
+    @classmethod
+    def from_pairs(
+        cls, term_ids: list[int] | np.ndarray, weights: list[float] | np.ndarray
+    ) -> PackedSparseVector:
+        ids = np.asarray(term_ids, dtype=TERM_ID_DTYPE)
+        values = np.asarray(weights, dtype=WEIGHT_DTYPE)
+        order = np.argsort(ids, kind="stable")
+        return cls(term_ids=ids[order], weights=values[order])
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> PackedSparseVector:
+        size = len(blob) // (TERM_ID_DTYPE.itemsize + WEIGHT_DTYPE.itemsize)
+        ids = np.frombuffer(blob, dtype=TERM_ID_DTYPE, count=size)
+        weights = np.frombuffer(
+            blob, dtype=WEIGHT_DTYPE, count=size, offset=size * TERM_ID_DTYPE.itemsize
+        )
+        return cls(term_ids=ids, weights=weights)
+
+    def to_bytes(self) -> bytes:
+        return (
+            self.term_ids.astype(TERM_ID_DTYPE, copy=False).tobytes()
+            + self.weights.astype(WEIGHT_DTYPE, copy=False).tobytes()
+        )
+
+
+def cosine_similarity_packed(a: PackedSparseVector, b: PackedSparseVector | None) -> float:
+    if b is None or not len(a) or not len(b) or a.norm == 0.0 or b.norm == 0.0:
+        return 0.0
+    _, a_idx, b_idx = np.intersect1d(
+        a.term_ids, b.term_ids, assume_unique=True, return_indices=True
+    )
+    if not a_idx.size:
+        return 0.0
+    dot = float(a.weights[a_idx].astype(np.float64) @ b.weights[b_idx].astype(np.float64))
+    return dot / (a.norm * b.norm)
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.models import EmbeddingMetadata
+from src.rag.sparse_codec import PackedSparseVector
+
+_SCORE_BLOCK_CELLS = 1 << 24
+
+
+def _grow(buffer: np.ndarray, required: int) -> np.ndarray:
+    if required <= buffer.shape[0]:
+        return buffer
+    grown = np.empty(max(required, 2 * buffer.shape[0], 1024), dtype=buffer.dtype)
+    grown[: buffer.shape[0]] = buffer
+    return grown
+
+
+def _segment_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Sum consecutive runs of `values` whose sizes are given by `lengths`."""
+    sums = np.zeros(lengths.shape[0], dtype=np.float64)
+    nonempty = lengths > 0
+    if values.size and nonempty.any():
+        starts = np.cumsum(lengths) - lengths
+        sums[nonempty] = np.add.reduceat(values, starts[nonempty], dtype=np.float64)
+    return sums
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the `top_k` largest scores, best first."""
+    if top_k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k < scores.size:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class SparseScoringMatrix:
+    """Chunk embeddings held as a CSR matrix with L2-normalized rows.
+
+    Cosine similarity against every row (or a subset of rows) is a single sparse
+    matrix-vector product. Rows are appended as new embeddings are ingested.
+    """
+
+    def __init__(self) -> None:
+        self.high_water_mark = 0
+        # Chunk of the embedding row at the high-water mark, to recognise the database.
+        self.last_chunk_id: str | None = None
+        self.chunk_ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.empty(0, dtype=np.int32)
+        self._data = np.empty(0, dtype=np.float32)
+        self._nnz = 0
+        self._dim = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def nnz(self) -> int:
+        return self._nnz
+
+    def append(self, chunk_ids: list[str], vectors: list[PackedSparseVector]) -> None:
+        with self._lock:
+            fresh = [
+                (chunk_id, vector)
+                for chunk_id, vector in zip(chunk_ids, vectors, strict=True)
+                if chunk_id not in self._rows
+            ]
+            if not fresh:
+                return
+            row_start = len(self.chunk_ids)
+            lengths = np.array([len(vector) for _, vector in fresh], dtype=np.int64)
+            added = int(lengths.sum())
+            end = self._nnz + added
+            self._indices = _grow(self._indices, end)
+            self._data = _grow(self._data, end)
+            cursor = self._nnz
+            for offset, (chunk_id, vector) in enumerate(fresh):
+                size = len(vector)
+                self._indices[cursor : cursor + size] = vector.term_ids
+                norm = vector.norm or 1.0
+                self._data[cursor : cursor + size] = vector.weights / norm
+                cursor += size
+                self._rows[chunk_id] = row_start + offset
+                self.chunk_ids.append(chunk_id)
+                if size:
+                    self._dim = max(self._dim, int(vector.term_ids[-1]) + 1)
+            self._indptr = np.concatenate([self._indptr, self._nnz + np.cumsum(lengths)])
+            self._nnz = end
+
+    def refresh(self, session: Session, *, batch_size: int = 2000) -> int:
+        """Append embeddings stored after the current high-water mark; returns rows added."""
+        added = 0
+        with self._lock:
+            while True:
+                rows = session.execute(
+                    select(
+                        EmbeddingMetadata.id,
+                        EmbeddingMetadata.chunk_id,
+                        EmbeddingMetadata.vector_blob,
+                    )
+                    .where(EmbeddingMetadata.id > self.high_water_mark)
+                    .order_by(EmbeddingMetadata.id)
+                    .limit(batch_size)
+                ).all()
+                packed = [row for row in rows if row.vector_blob is not None]
+                self.append(
+                    [row.chunk_id for row in packed],
+                    [PackedSparseVector.from_bytes(row.vector_blob) for row in packed],
+                )
+                if rows:
+                    self.high_water_mark = rows[-1].id
+                    self.last_chunk_id = rows[-1].chunk_id
+                    added += len(packed)
+                if len(rows) < batch_size:
+                    return added
+
+    def state(self) -> dict[str, np.ndarray]:
+        with self._lock:
+            return {
+                "indptr": self._indptr.copy(),
+                "indices": self._indices[: self._nnz].copy(),
+                "data": self._data[: self._nnz].copy(),
+                "chunk_ids": np.array(self.chunk_ids, dtype=np.str_),
+                "high_water_mark": np.array(self.high_water_mark),
+                "last_chunk_id": np.array(self.last_chunk_id or "", dtype=np.str_),
+            }
+
+    @classmethod
+    def from_state(cls, state: dict[str, np.ndarray]) -> SparseScoringMatrix:
+        matrix = cls()
+        matrix.chunk_ids = state["chunk_ids"].tolist()
+        matrix._rows = {chunk_id: row for row, chunk_id in enumerate(matrix.chunk_ids)}
+        matrix._indptr = state["indptr"].astype(np.int64)
+        matrix._indices = state["indices"].astype(np.int32)
+        matrix._data = state["data"].astype(np.float32)
+        matrix._nnz = int(matrix._indices.shape[0])
+        matrix._dim = int(matrix._indices.max()) + 1 if matrix._nnz else 0
+        matrix.high_water_mark = int(state["high_water_mark"])
+        matrix.last_chunk_id = str(state["last_chunk_id"]) or None
+        return matrix
+
+    def rows_for(self, chunk_ids: list[str]) -> np.ndarray:
+        """Row numbers for `chunk_ids`, with -1 for chunks that have no embedding."""
+        with self._lock:
+            return np.array([self._rows.get(cid, -1) for cid in chunk_ids], dtype=np.int64)
+
+    def _dense_query(self, query: PackedSparseVector) -> np.ndarray:
+        dense = np.zeros(self._dim, dtype=np.float32)
+        if not len(query) or query.norm == 0.0:
+            return dense
+        known = query.term_ids < self._dim
+        dense[query.term_ids[known]] = query.weights[known] / query.norm
+        return dense
+
+    def score(self, query: PackedSparseVector, rows: np.ndarray | None = None) -> np.ndarray:
+        """Cosine scores for all rows, or for `rows` in the given order (-1 scores 0)."""
+        with self._lock:
+            dense = self._dense_query(query)
+            if rows is None:
+                products = self._data[: self._nnz] * dense[self._indices[: self._nnz]]
+                return _segment_sums(products, np.diff(self._indptr))
+
+            _, positions, lengths = self._gather(rows)
+            if not positions.size:
+                return np.zeros(lengths.shape[0], dtype=np.float64)
+            products = self._data[positions] * dense[self._indices[positions]]
+            return _segment_sums(products, lengths)
+
+    def score_many(self, queries: list[PackedSparseVector], rows: np.ndarray) -> np.ndarray:
+        """Cosine scores of every query against `rows`, shaped (len(queries), len(rows)).
+
+        Only the columns used by at least one query are materialized, so the work is a
+        single dense (queries x terms) by (terms x rows) product.
+        """
+        with self._lock:
+            scores = np.zeros((len(queries), len(rows)), dtype=np.float64)
+            term_ids = [q.term_ids[q.term_ids < self._dim] for q in queries if len(q)]
+            if not term_ids or not len(rows):
+                return scores
+            columns = np.unique(np.concatenate(term_ids))
+            if not columns.size:
+                return scores
+            column_of = np.full(self._dim, -1, dtype=np.int64)
+            column_of[columns] = np.arange(columns.size)
+
+            query_block = np.zeros((len(queries), columns.size), dtype=np.float32)
+            for qi, query in enumerate(queries):
+                if not len(query) or query.norm == 0.0:
+                    continue
+                known = query.term_ids < self._dim
+                query_block[qi, column_of[query.term_ids[known]]] = (
+                    query.weights[known] / query.norm
+                )
+
+            # Bound the dense row block to roughly 64MB however many rows are scored.
+            block_rows = max(1, _SCORE_BLOCK_CELLS // columns.size)
+            for start in range(0, len(rows), block_rows):
+                block = rows[start : start + block_rows]
+                owners, positions, _ = self._gather(block)
+                cols = column_of[self._indices[positions]]
+                used = cols >= 0
+                row_block = np.zeros((len(block), columns.size), dtype=np.float32)
+                row_block[owners[used], cols[used]] = self._data[positions[used]]
+                scores[:, start : start + len(block)] = query_block @ row_block.T
+            return scores
+
+    def _gather(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Owner row, nonzero position and per-row length for the nonzeros of `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        present = rows >= 0
+        safe = np.where(present, rows, 0)
+        starts = np.where(present, self._indptr[safe], 0)
+        lengths = np.where(present, self._indptr[safe + 1], 0) - starts
+        total = int(lengths.sum())
+        owners = np.repeat(np.arange(rows.shape[0]), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return owners, starts[owners] + offsets, lengths
+
+    def search(
+        self, query: PackedSparseVector, *, top_k: int = 5, mask: np.ndarray | None = None
+    ) -> list[tuple[str, float]]:
+        scores = self.score(query)
+        if mask is not None:
+            scores = np.where(mask, scores, 0.0)
+        return [
+            (self.chunk_ids[row], float(scores[row]))
+            for row in top_k_indices(scores, top_k)
+            if scores[row] > 0
+        ]
+
+
+_matrix: SparseScoringMatrix | None = None
+_matrix_lock = threading.Lock()
+
+
+def set_scoring_matrix(matrix: SparseScoringMatrix | None) -> None:
+    """Install `matrix` (e.g. loaded from a snapshot) as the process-wide matrix."""
+    global _matrix
+    with _matrix_lock:
+        _matrix = matrix
+
+
+def get_scoring_matrix(session: Session) -> SparseScoringMatrix:
+    """Return the process-wide matrix, first appending newly ingested embeddings."""
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None:
+            _matrix = SparseScoringMatrix()
+        matrix = _matrix
+    matrix.refresh(session)
+    return matrix
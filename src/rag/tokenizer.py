@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import string
+import threading
+from collections import Counter
+from collections.abc import Iterable
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+
+
+class Tokenizer:
+    """Lower-cased runs of `alphabet` characters at least `min_length` long.
+
+    Text is lower-cased, encoded to ASCII (other characters become separators) and
+    mapped through a 256-byte translation table, so splitting happens in C instead of
+    the regex engine. Strings up to `cache_max_chars` (queries, titles) are memoized in
+    an LRU cache.
+
+    Terms can be interned to dense process-local integer ids. The intern table holds at
+    most `max_terms` terms: a batch that would overflow it starts a fresh table, so ids
+    are only comparable within one `intern`/`term_ids_many` call.
+    """
+
+    def __init__(
+        self,
+        *,
+        alphabet: str = string.ascii_lowercase + string.digits,
+        min_length: int = 3,
+        cache_size: int = 8192,
+        cache_max_chars: int = 256,
+        max_terms: int = 1 << 18,
+    ) -> None:
+        allowed = {ord(char) for char in alphabet}
+        self._table = bytes(code if code in allowed else 32 for code in range(256))
+        self.min_length = min_length
+        self.cache_max_chars = cache_max_chars
+        self._cached = lru_cache(maxsize=cache_size)(self._split_tuple)
+        self.max_terms = max_terms
+        self.resets = 0
+        self._ids: dict[str, int] = {}
+        self._terms: list[str] = []
+        self._lock = threading.Lock()
+
+    def _split(self, text: str) -> list[str]:
+        ascii_text = text.lower().encode("ascii", "replace").translate(self._table).decode("ascii")
+        min_length = self.min_length
+        return [term for term in ascii_text.split() if len(term) >= min_length]
+
+    def _split_tuple(self, text: str) -> tuple[str, ...]:
+        return tuple(self._split(text))
+
+    def tokenize(self, text: str) -> list[str]:
+        if len(text) <= self.cache_max_chars:
+            return list(self._cached(text))
+        return self._split(text)
+
+    def tokenize_many(self, texts: list[str]) -> list[list[str]]:
+        return [self.tokenize(text) for text in texts]
+
+    def term_counts(self, text: str) -> dict[str, int]:
+        return Counter(self.tokenize(text))
+
+    def term_counts_many(self, texts: list[str]) -> list[dict[str, int]]:
+        return [Counter(terms) for terms in self.tokenize_many(texts)]
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._terms)
+
+    def _table_for(self, terms: Iterable[str]) -> dict[str, int]:
+        """An intern table holding every term in `terms`."""
+        unique = list(dict.fromkeys(terms))
+        table = self._ids
+        if all(term in table for term in unique):
+            return table
+        with self._lock:
+            table, names = self._ids, self._terms
+            missing = [term for term in unique if term not in table]
+            if len(table) + len(missing) > self.max_terms:
+                # Replaced rather than cleared, so callers mapping against the old table
+                # keep a consistent view.
+                table, names, missing = {}, [], unique
+                self.resets += 1
+            for term in missing:
+                table[term] = len(names)
+                names.append(term)
+            self._ids, self._terms = table, names
+        return table
+
+    def intern(self, terms: list[str]) -> np.ndarray:
+        """Ids of `terms`, assigning the next free id to unseen ones."""
+        [ids] = self._ids_of([terms])
+        return ids
+
+    def term(self, term_id: int) -> str:
+        return self._terms[term_id]
+
+    def term_ids_many(self, texts: list[str]) -> list[np.ndarray]:
+        """Term ids of each text, all from the same intern table."""
+        return self._ids_of(self.tokenize_many(texts))
+
+    def _ids_of(self, token_lists: list[list[str]]) -> list[np.ndarray]:
+        table = self._ids
+        try:
+            # Known terms need no lock and no pass to collect them first.
+            return [_lookup(table, terms) for terms in token_lists]
+        except KeyError:
+            table = self._table_for(chain.from_iterable(token_lists))
+            return [_lookup(table, terms) for terms in token_lists]
+
+
+def _lookup(table: dict[str, int], terms: list[str]) -> np.ndarray:
+    return np.fromiter(map(table.__getitem__, terms), dtype=np.int64, count=len(terms))
+
+
+_tokenizers = {
+    "alnum": Tokenizer(),
+    "alpha": Tokenizer(alphabet=string.ascii_lowercase),
+}
+
+
+def get_tokenizer(kind: str = "alnum") -> Tokenizer:
+    """`alnum` (letters and digits) for retrieval; `alpha` (letters only) for lexicons."""
+    return _tokenizers[kind]
+
+
+def tokenize(text: str) -> list[str]:
+    return _tokenizers["alnum"].tokenize(text)
+
+
+def tokenize_many(texts: list[str]) -> list[list[str]]:
+    return _tokenizers["alnum"].tokenize_many(texts)
+
+
+def term_counts_many(texts: list[str]) -> list[dict[str, int]]:
+    return _tokenizers["alnum"].term_counts_many(texts)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+
+from src.rag.filters import ChunkAttributes
+
+CURRENT_POINTER = "CURRENT"
+_OPEN_ATTEMPTS = 3
+
+
+@dataclass
+class VectorStoreSnapshot:
+    """One published version: a read-only memory map plus its row metadata."""
+
+    version: str
+    model_name: str
+    high_water_mark: int
+    vectors: np.ndarray
+    chunk_ids: list[str]
+    attributes: ChunkAttributes
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class MemmapVectorStore:
+    """Versioned on-disk chunk vectors shared by every worker through the page cache.
+
+    Each version is a directory holding `vectors.npy` (opened with `mmap_mode="r"`),
+    the row metadata, and `meta.json`. Publishing writes a complete new directory and
+    then swaps the `CURRENT` pointer with `os.replace`, so readers see either the old
+    or the new version, never a partial one. Old versions are pruned after the swap;
+    processes that still map them keep reading the unlinked files safely.
+    """
+
+    def __init__(self, root: Path | str, *, keep_versions: int = 2) -> None:
+        self.root = Path(root)
+        self.keep_versions = keep_versions
+
+    @property
+    def pointer(self) -> Path:
+        return self.root / CURRENT_POINTER
+
+    def current_version(self) -> str | None:
+        try:
+            return self.pointer.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(
+        self,
+        chunk_ids: list[str],
+        vectors: np.ndarray | Sequence[np.ndarray],
+        attributes: ChunkAttributes,
+        *,
+        model_name: str,
+        high_water_mark: int,
+    ) -> str:
+        """Write a new version and make it current; returns the version name.
+
+        `vectors` may be a sequence of row blocks (e.g. a mapped base version plus
+        newer rows), which are copied into the new file one after another.
+        """
+        blocks = [vectors] if isinstance(vectors, np.ndarray) else list(vectors)
+        rows = sum(block.shape[0] for block in blocks)
+        if len(chunk_ids) != rows or len(attributes) != rows:
+            raise ValueError("chunk_ids, vectors and attributes must have the same rows")
+        shape = (rows, blocks[-1].shape[1])
+        version = f"v{datetime.now(UTC):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        staging = self.root / f".{version}.tmp"
+        staging.mkdir(parents=True)
+
+        out = np.lib.format.open_memmap(
+            staging / "vectors.npy", mode="w+", dtype=np.float32, shape=shape
+        )
+        offset = 0
+        for block in blocks:
+            out[offset : offset + block.shape[0]] = block
+            offset += block.shape[0]
+        out.flush()
+        del out
+        np.save(staging / "chunk_ids.npy", np.array(chunk_ids, dtype=np.str_))
+        np.savez(
+            staging / "attributes.npz",
+            tickers=attributes.tickers,
+            sources=attributes.sources,
+            published=attributes.published,
+        )
+        meta = {
+            "version": version,
+            "model_name": model_name,
+            "high_water_mark": high_water_mark,
+            "rows": rows,
+            "dimension": int(shape[1]),
+            "attribute_values": attributes.values,
+        }
+        (staging / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        for name in ("vectors.npy", "chunk_ids.npy", "attributes.npz", "meta.json"):
+            with (staging / name).open("rb") as handle:
+                os.fsync(handle.fileno())
+        os.replace(staging, self.root / version)
+
+        pointer_tmp = self.root / f".{CURRENT_POINTER}.{uuid.uuid4().hex}"
+        pointer_tmp.write_text(version, encoding="utf-8")
+        os.replace(pointer_tmp, self.pointer)
+        _fsync_dir(self.root)
+        self.prune()
+        return version
+
+    def open(self, version: str | None = None) -> VectorStoreSnapshot | None:
+        """Map `version` (default: the current one); None when nothing is published.
+
+        A version another writer prunes before it is mapped is replaced by whichever
+        version is current by then.
+        """
+        for _ in range(_OPEN_ATTEMPTS):
+            version = version or self.current_version()
+            if version is None:
+                return None
+            try:
+                return self._open(version)
+            except FileNotFoundError:
+                version = None
+        return None
+
+    def _open(self, version: str) -> VectorStoreSnapshot:
+        directory = self.root / version
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        with np.load(directory / "attributes.npz") as arrays:
+            attributes = ChunkAttributes.from_codes(
+                meta["attribute_values"],
+                arrays["tickers"],
+                arrays["sources"],
+                arrays["published"],
+            )
+        return VectorStoreSnapshot(
+            version=version,
+            model_name=meta["model_name"],
+            high_water_mark=int(meta["high_water_mark"]),
+            vectors=np.load(directory / "vectors.npy", mmap_mode="r"),
+            chunk_ids=np.load(directory / "chunk_ids.npy").tolist(),
+            attributes=attributes,
+        )
+
+    def versions(self) -> list[str]:
+        if not self.root.exists():
+            return []
+        return sorted(
+            path.name for path in self.root.iterdir() if path.is_dir() and path.name[0] == "v"
+        )
+
+    def prune(self) -> list[str]:
+        """Delete all but the newest `keep_versions` versions (never the current one)."""
+        current = self.current_version()
+        stale = [v for v in self.versions()[: -self.keep_versions or None] if v != current]
+        for version in stale:
+            shutil.rmtree(self.root / version, ignore_errors=True)
+        return stale
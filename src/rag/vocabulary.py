@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections.abc import Iterable
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.core.models import EmbeddingVocabulary
+from src.rag.sparse_codec import PackedSparseVector
+
+_LOOKUP_BATCH = 500
+# Length of `embedding_vocabulary.term`; the tokenizer does not bound token length.
+MAX_TERM_LENGTH = 128
+# Concurrent writers can only hide a term from one round of inserts, so a few rounds
+# resolve every term unless the table itself rejects it.
+_CREATE_ATTEMPTS = 3
+
+
+def stored_term(term: str) -> str:
+    """The `embedding_vocabulary.term` value for `term`.
+
+    Terms too long for the column keep a prefix and a digest of the whole term, so
+    distinct long terms stay distinct.
+    """
+    if len(term) <= MAX_TERM_LENGTH:
+        return term
+    digest = hashlib.sha256(term.encode("utf-8")).hexdigest()[:16]
+    return f"{term[: MAX_TERM_LENGTH - len(digest) - 1]}#{digest}"
+
+
+class Vocabulary:
+    """Term to integer id mapping backed by the `embedding_vocabulary` table.
+
+    Ids never change once committed, so resolved terms are cached for the life of the
+    process. `get_or_create` never caches, because the ids it assigns are only final
+    once the ingestion transaction commits; `lookup` runs on the read path.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _select(self, session: Session, terms: list[str]) -> dict[str, int]:
+        keys = {stored_term(term): term for term in terms}
+        stored = list(keys)
+        found: dict[str, int] = {}
+        for start in range(0, len(stored), _LOOKUP_BATCH):
+            batch = stored[start : start + _LOOKUP_BATCH]
+            rows = session.execute(
+                select(EmbeddingVocabulary.term, EmbeddingVocabulary.id).where(
+                    EmbeddingVocabulary.term.in_(batch)
+                )
+            ).all()
+            found.update({keys[row.term]: row.id for row in rows})
+        return found
+
+    @staticmethod
+    def _insert(session: Session, terms: list[str]) -> None:
+        """Insert `terms`, skipping any that another writer registered first."""
+        rows = [{"term": stored_term(term)} for term in terms]
+        dialect = session.get_bind().dialect.name
+        if dialect in {"sqlite", "postgresql"}:
+            insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            stmt = insert(EmbeddingVocabulary).on_conflict_do_nothing(index_elements=["term"])
+            for start in range(0, len(rows), _LOOKUP_BATCH):
+                session.execute(stmt, rows[start : start + _LOOKUP_BATCH])
+            return
+        # One savepoint per term, so a conflict on one term cannot discard the others.
+        for row in rows:
+            try:
+                with session.begin_nested():
+                    session.add(EmbeddingVocabulary(**row))
+            except IntegrityError:
+                pass
+
+    def lookup(self, session: Session, terms: Iterable[str]) -> dict[str, int]:
+        """Resolve known terms; unknown terms are omitted from the result."""
+        wanted = list(dict.fromkeys(terms))
+        with self._lock:
+            resolved = {term: self._ids[term] for term in wanted if term in self._ids}
+        missing = [term for term in wanted if term not in resolved]
+        if missing:
+            found = self._select(session, missing)
+            with self._lock:
+                self._ids.update(found)
+            resolved.update(found)
+        return resolved
+
+    def get_or_create(self, session: Session, terms: Iterable[str]) -> dict[str, int]:
+        wanted = list(dict.fromkeys(terms))
+        with self._lock:
+            resolved = {term: self._ids[term] for term in wanted if term in self._ids}
+        pending = [term for term in wanted if term not in resolved]
+        if not pending:
+            return resolved
+        resolved.update(self._select(session, pending))
+        missing = [term for term in pending if term not in resolved]
+        for _ in range(_CREATE_ATTEMPTS):
+            if not missing:
+                return resolved
+            self._insert(session, missing)
+            resolved.update(self._select(session, missing))
+            missing = [term for term in missing if term not in resolved]
+        if missing:
+            raise RuntimeError(f"could not register {len(missing)} vocabulary terms")
+        return resolved
+
+    def state(self) -> dict[str, np.ndarray]:
+        with self._lock:
+            return {
+                "terms": np.array(list(self._ids), dtype=np.str_),
+                "ids": np.fromiter(self._ids.values(), dtype=np.int64, count=len(self._ids)),
+            }
+
+    def prime(self, state: dict[str, np.ndarray]) -> None:
+        """Seed the cache with committed ids, e.g. from a snapshot."""
+        with self._lock:
+            self._ids.update(zip(state["terms"].tolist(), state["ids"].tolist(), strict=True))
+
+    def encode(self, session: Session, embedding: dict[str, float]) -> PackedSparseVector:
+        """Pack a query embedding, keeping the norm of the full term set."""
+        return self.encode_many(session, [embedding])[0]
+
+    def encode_many(
+        self, session: Session, embeddings: list[dict[str, float]]
+    ) -> list[PackedSparseVector]:
+        ids = self.lookup(session, [term for embedding in embeddings for term in embedding])
+        return [self._pack(embedding, ids) for embedding in embeddings]
+
+    @staticmethod
+    def _pack(embedding: dict[str, float], ids: dict[str, int]) -> PackedSparseVector:
+        known = [term for term in embedding if term in ids]
+        vector = PackedSparseVector.from_pairs(
+            [ids[term] for term in known], [embedding[term] for term in known]
+        )
+        weights = list(embedding.values())
+        norm = float(sum(w * w for w in weights)) ** 0.5
+        return PackedSparseVector(term_ids=vector.term_ids, weights=vector.weights, norm=norm)
+
+
+_vocabulary = Vocabulary()
+
+
+def get_vocabulary() -> Vocabulary:
+    return _vocabulary
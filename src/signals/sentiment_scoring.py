@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import json
-import re
 from dataclasses import dataclass
 from typing import Protocol
 
-import httpx
+from src.common.llm_gateway import get_llm_gateway
+from src.rag.tokenizer import get_tokenizer
 
 POSITIVE_WORDS = {
     "strong",
@@ -40,7 +40,7 @@ class SentimentScorer(Protocol):
 
 
 def _tokenize(text: str) -> list[str]:
-    return re.findall(r"[a-zA-Z]{3,}", text.lower())
+    return get_tokenizer("alpha").tokenize(text)
 
 
 class LexiconSentimentScorer:
@@ -89,12 +89,10 @@ class OpenAISentimentScorer:
             "response_format": {"type": "json_object"},
         }
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        url = f"{self.base_url}/chat/completions"
         try:
-            with httpx.Client(timeout=self.timeout_seconds) as client:
-                resp = client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()
-            body = resp.json()
+            body = get_llm_gateway(self.base_url).post_json(
+                "/chat/completions", payload, headers=headers, timeout=self.timeout_seconds
+            )
             choices = body.get("choices") or []
             if not choices:
                 return None
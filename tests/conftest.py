@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.common.settings import get_settings
+from src.rag.answer_cache import get_answer_cache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_settings_and_answer_cache():
+    get_settings.cache_clear()
+    # Answers for the same fixed questions must not carry over between tests.
+    get_answer_cache().clear()
+    yield
+    get_settings.cache_clear()
+
+
+class FakeOpenAI:
+    """Local OpenAI-compatible `/chat/completions` server.
+
+    `tokens` is the completion, sent whole or as streamed deltas. `fail_after` closes a
+    stream after that many deltas without the final `[DONE]`; `status` forces an HTTP
+    error, and `failures` answers only that many requests with 503 first. `delay` holds
+    each response that many seconds. Every request body is appended to `requests` and
+    the client address of every connection is added to `connections`.
+    """
+
+    def __init__(self) -> None:
+        self.tokens: list[str] = ["Margins ", "improved ", "[chunk]."]
+        self.fail_after: int | None = None
+        self.status = 200
+        self.failures = 0
+        self.delay = 0.0
+        self.requests: list[dict] = []
+        self.connections: set[tuple[str, int]] = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests.append(body)
+                fake.connections.add(self.client_address)
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if fake.failures > 0:
+                    fake.failures -= 1
+                    self._send(503, "application/json", b'{"error": "unavailable"}')
+                elif fake.status != 200:
+                    self._send(fake.status, "application/json", b'{"error": "unavailable"}')
+                elif body.get("stream"):
+                    self._stream()
+                else:
+                    message = {"role": "assistant", "content": "".join(fake.tokens)}
+                    payload = {"choices": [{"index": 0, "message": message}]}
+                    self._send(200, "application/json", json.dumps(payload).encode())
+
+            def _send(self, status: int, content_type: str, data: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for idx, token in enumerate(fake.tokens):
+                    if fake.fail_after is not None and idx >= fake.fail_after:
+                        self.close_connection = True
+                        return
+                    chunk = {"choices": [{"index": 0, "delta": {"content": token}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}/v1"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """A running `FakeOpenAI` configured as the QA answer provider."""
+    server = FakeOpenAI()
+    monkeypatch.setenv("QA_ANSWER_PROVIDER", "openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("QA_OPENAI_BASE_URL", server.base_url)
+    get_settings.cache_clear()
+    yield server
+    server.close()
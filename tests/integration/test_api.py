@@ -1,9 +1,14 @@
+import time
+import uuid
+
 from fastapi.testclient import TestClient
 from sqlalchemy import func, select
 
 from src.api.main import app
 from src.common.db import SessionLocal
+from src.common.settings import get_settings
 from src.core.models import Signal
+from src.rag.context_packing import estimate_prompt_tokens
 
 
 def test_health_endpoints():
@@ -31,7 +36,7 @@ def test_documents_ingest_endpoint():
     payload = {
         "documents": [
             {
-                "source": "unit-test-news",
+                "source": f"unit-test-news-{uuid.uuid4().hex[:8]}",
                 "ticker": "AAPL",
                 "title": "AAPL earnings momentum",
                 "content": "Apple revenue grew and margins improved. Guidance remained strong.",
@@ -45,6 +50,7 @@ def test_documents_ingest_endpoint():
         body = resp.json()
         assert body["documents_ingested"] == 1
         assert body["chunks_ingested"] >= 1
+        assert body["duplicate_documents"] == 0
 
 
 def test_qa_endpoint_returns_citations():
@@ -76,6 +82,140 @@ def test_qa_endpoint_returns_citations():
         assert body["answer_provider"] in {"deterministic", "deterministic-fallback", "openai"}
         assert len(body["citations"]) >= 1
 
+        exhaustive = client.post("/qa", json={**qa_payload, "exhaustive": True}).json()
+        assert exhaustive["scanned_rows"] >= 1
+        assert exhaustive["citations"][0]["chunk_id"] == body["citations"][0]["chunk_id"]
+
+
+def test_qa_batch_endpoint_preserves_order():
+    with TestClient(app) as client:
+        ingest_payload = {
+            "documents": [
+                {
+                    "source": "unit-test-qa-batch",
+                    "ticker": "NVDA",
+                    "title": "NVDA supply",
+                    "content": "NVIDIA supply of data center GPUs improved this quarter.",
+                }
+            ]
+        }
+        assert client.post("/documents/ingest", json=ingest_payload).status_code == 200
+
+        batch_payload = {
+            "items": [
+                {
+                    "question": "How did NVIDIA GPU supply change?",
+                    "ticker": "NVDA",
+                    "source": "unit-test-qa-batch",
+                },
+                {
+                    "question": "zzz unmatched question",
+                    "ticker": "NVDA",
+                    "source": "unit-test-qa-batch",
+                },
+            ]
+        }
+        resp = client.post("/qa/batch", json=batch_payload)
+        assert resp.status_code == 200
+        results = resp.json()["results"]
+        assert len(results) == 2
+        assert len(results[0]["citations"]) >= 1
+        assert results[1]["citations"] == []
+        assert results[1]["answer_provider"] == "none"
+
+        batch_payload["items"][0] |= {"exhaustive": True, "debug": True}
+        results = client.post("/qa/batch", json=batch_payload).json()["results"]
+        assert results[0]["scanned_rows"] >= 1
+        assert results[0]["debug_timings"]["qa.retrieve"] >= 0
+        assert results[1]["debug_timings"] is None
+
+
+def test_qa_batch_generates_answers_concurrently(fake_openai):
+    fake_openai.delay = 0.4
+    tickers = ["AAPL", "MSFT", "AMZN", "META", "TSLA", "ORCL"]
+    source = f"unit-test-qa-batch-{uuid.uuid4().hex[:8]}"
+    with TestClient(app) as client:
+        documents = [
+            {
+                "source": source,
+                "ticker": ticker,
+                "title": f"{ticker} outlook",
+                "content": f"{ticker} raised its full-year revenue outlook on strong demand.",
+            }
+            for ticker in tickers
+        ]
+        assert client.post("/documents/ingest", json={"documents": documents}).status_code == 200
+        items = [
+            {"question": f"What did {ticker} say about its outlook?", "ticker": ticker}
+            for ticker in tickers
+        ]
+        started = time.perf_counter()
+        resp = client.post("/qa/batch", json={"items": [{**i, "source": source} for i in items]})
+        elapsed = time.perf_counter() - started
+
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["citations"][0]["ticker"] for r in results] == tickers
+    assert all(r["answer_provider"] == "openai" for r in results)
+    assert all(r["latency_ms"] >= 400 for r in results)
+    # Six 0.4s answers in parallel, not 2.4s in sequence.
+    assert elapsed < 1.6
+    assert "qa.generate" in resp.headers["server-timing"]
+
+
+def test_qa_reports_prompt_size_of_packed_evidence(fake_openai):
+    source = f"unit-test-qa-pack-{uuid.uuid4().hex[:8]}"
+    content = " ".join(
+        f"Note {idx}: Broadcom AI networking revenue rose on custom accelerator demand."
+        for idx in range(40)
+    )
+    with TestClient(app) as client:
+        document = {"source": source, "ticker": "AVGO", "title": "AVGO AI", "content": content}
+        assert client.post("/documents/ingest", json={"documents": [document]}).status_code == 200
+        body = client.post(
+            "/qa",
+            json={"question": "What drove Broadcom AI networking revenue?", "source": source},
+        ).json()
+
+    messages = fake_openai.requests[-1]["messages"]
+    assert body["prompt_tokens"] == estimate_prompt_tokens(messages)
+    assert body["prompt_tokens"] <= get_settings().qa_context_token_budget
+    # Overlapping chunks of the one document arrive as a single evidence line, and only
+    # its lead chunk is cited.
+    evidence = messages[1]["content"].split("Evidence:\n", 1)[1].split("\n\n", 1)[0]
+    assert len(evidence.splitlines()) == 1
+    [citation] = body["citations"]
+    assert evidence.startswith(f"[{citation['chunk_id']}]")
+
+
+def test_metrics_exposes_retrieval_cache_counters():
+    with TestClient(app) as client:
+        qa_payload = {"question": "What do documents say about cloud demand?", "top_k": 3}
+        assert client.post("/qa", json=qa_payload).status_code == 200
+        assert client.post("/qa", json=qa_payload).status_code == 200
+        metrics = client.get("/metrics")
+        assert metrics.status_code == 200
+        assert 'finance_lm_retrieval_cache_total{cache="results",result="hit"}' in metrics.text
+
+
+def test_qa_reports_stage_timings():
+    with TestClient(app) as client:
+        qa_payload = {"question": "Which stages did a cold lookup of pipeline timings take?"}
+        plain = client.post("/qa", json=qa_payload)
+        assert plain.status_code == 200
+        assert plain.json()["debug_timings"] is None
+        stages = dict(
+            item.strip().split(";dur=") for item in plain.headers["server-timing"].split(",")
+        )
+        assert {"qa.retrieve", "retrieval.cache"} <= set(stages)
+        assert all(float(value) >= 0 for value in stages.values())
+
+        debug = client.post("/qa", json={**qa_payload, "debug": True}).json()
+        assert debug["debug_timings"]["qa.retrieve"] >= debug["debug_timings"]["retrieval.cache"]
+
+        metrics = client.get("/metrics").text
+        assert 'finance_lm_stage_latency_seconds_count{stage="qa.retrieve"}' in metrics
+
 
 def test_market_snapshot_endpoints():
     with TestClient(app) as client:
@@ -123,6 +263,10 @@ def test_qa_evaluate_endpoint():
         assert body["total_cases"] == 1
         assert body["citation_coverage"] >= 1.0
         assert body["cases"][0]["passed"] is True
+        assert body["cases"][0]["retrieval_ms"] >= 0
+        latency = body["generation_latency"]
+        assert 0 <= latency["p50_ms"] <= latency["p95_ms"] <= latency["p99_ms"]
+        assert set(body["retrieval_latency"]) == {"p50_ms", "p95_ms", "p99_ms"}
 
 
 def test_sentiment_compute_endpoint():
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+
+
+def _events(response) -> list[tuple[str, object]]:
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def _ingest(client: TestClient) -> dict:
+    source = f"qa-stream-{uuid.uuid4().hex[:8]}"
+    ingest = client.post(
+        "/documents/ingest",
+        json={
+            "documents": [
+                {
+                    "source": source,
+                    "ticker": "COST",
+                    "title": "Costco margins",
+                    "content": "Costco membership fee income lifted operating margins.",
+                }
+            ]
+        },
+    )
+    assert ingest.status_code == 200
+    return {"question": "What lifted Costco operating margins?", "source": source}
+
+
+def test_qa_stream_sends_citations_then_provider_tokens(fake_openai):
+    with TestClient(app) as client:
+        payload = _ingest(client)
+        response = client.post("/qa/stream", json=payload)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _events(response)
+
+    assert [name for name, _ in events] == ["citations", "token", "token", "token", "done"]
+    assert events[0][1][0]["ticker"] == "COST"
+    assert "".join(data for name, data in events if name == "token") == "Margins improved [chunk]."
+    done = events[-1][1]
+    assert done["answer_provider"] == "openai"
+    assert done["answer"] == "Margins improved [chunk]."
+    assert fake_openai.requests[-1]["stream"] is True
+
+
+def test_qa_stream_reuses_the_answer_for_a_reworded_question(fake_openai):
+    with TestClient(app) as client:
+        payload = _ingest(client)
+        first = _events(client.post("/qa/stream", json=payload))
+        calls = len(fake_openai.requests)
+        payload["question"] = "Costco operating margins: what lifted them"
+        second = _events(client.post("/qa/stream", json=payload))
+
+    assert first[-1][1]["cached"] is False
+    assert len(fake_openai.requests) == calls
+    assert [name for name, _ in second] == ["citations", "token", "done"]
+    assert second[-1][1]["cached"] is True
+    assert second[-1][1]["answer"] == "Margins improved [chunk]."
+    assert second[-1][1]["answer_provider"] == "openai"
+
+
+def test_qa_stream_falls_back_when_the_provider_breaks_mid_stream(fake_openai):
+    fake_openai.fail_after = 1
+    with TestClient(app) as client:
+        events = _events(client.post("/qa/stream", json=_ingest(client)))
+
+    names = [name for name, _ in events]
+    assert names[:3] == ["citations", "token", "fallback"]
+    assert events[2][1] == {"reason": "provider_error", "discarded": 1}
+    fallback_text = "".join(data for name, data in events[3:] if name == "token")
+    assert fallback_text.startswith("Grounded summary from retrieved documents:")
+    assert events[-1][1]["answer_provider"] == "deterministic-fallback"
+    assert events[-1][1]["answer"] == fallback_text.strip()
+
+
+def test_qa_stream_falls_back_before_any_token_on_http_error(fake_openai):
+    fake_openai.status = 503
+    with TestClient(app) as client:
+        events = _events(client.post("/qa/stream", json=_ingest(client)))
+
+    assert [name for name, _ in events[:2]] == ["citations", "fallback"]
+    assert events[1][1]["discarded"] == 0
+    assert events[-1][1]["answer_provider"] == "deterministic-fallback"
+
+
+def test_qa_stream_without_matches_answers_none():
+    with TestClient(app) as client:
+        events = _events(
+            client.post(
+                "/qa/stream",
+                json={"question": "Anything about zebras?", "source": f"none-{uuid.uuid4().hex}"},
+            )
+        )
+    assert [name for name, _ in events] == ["citations", "token", "done"]
+    assert events[0][1] == []
+    assert events[-1][1]["answer_provider"] == "none"
+
+
+def test_qa_stream_rejects_debug():
+    with TestClient(app) as client:
+        resp = client.post("/qa/stream", json={"question": "Any timings?", "debug": True})
+    assert resp.status_code == 422
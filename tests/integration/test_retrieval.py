@@ -1,15 +1,41 @@
 from __future__ import annotations
 
+import os
+import signal
 import uuid
+from datetime import datetime
 
+import numpy as np
 from sqlalchemy import select
 
 from src.common.db import SessionLocal
 from src.common.settings import get_settings
 from src.core.models import DocumentChunk, EmbeddingMetadata
+from src.data_ingestion.dedup import hamming_distance, simhash
 from src.data_ingestion.pipelines.document_ingestion import ingest_documents
 from src.data_ingestion.schemas import IngestDocumentInput
-from src.rag.retrieval import retrieve_chunks
+from src.rag.corpus import get_corpus_generation
+from src.rag.dense_index import get_dense_index, get_vector_store
+from src.rag.filters import RetrievalFilters
+from src.rag.inverted_index import get_inverted_index, set_inverted_index
+from src.rag.ivf_index import close_ivf_index, get_ivf_index
+from src.rag.reranker import Reranker
+from src.rag.retrieval import (
+    RetrievalStats,
+    _result_cache,
+    clear_retrieval_caches,
+    retrieve_chunks,
+    retrieve_chunks_batch,
+)
+from src.rag.sharded_index import get_sharded_index, shard_for_ticker
+from src.rag.snapshot import (
+    load_index_snapshot,
+    read_snapshot,
+    save_index_snapshot,
+    snapshot_matches_database,
+)
+from src.rag.sparse_codec import PackedSparseVector
+from src.rag.sparse_matrix import get_scoring_matrix, set_scoring_matrix
 
 
 def test_ingestion_stores_sparse_embedding_and_retrieval_uses_it(monkeypatch):
@@ -33,8 +59,11 @@ def test_ingestion_stores_sparse_embedding_and_retrieval_uses_it(monkeypatch):
             select(EmbeddingMetadata).order_by(EmbeddingMetadata.id.desc())
         ).first()
         assert row is not None
-        assert isinstance(row.payload.get("embedding"), dict)
-        assert len(row.payload.get("embedding", {})) > 0
+        assert "embedding" not in row.payload
+        assert row.vector_blob is not None
+        vector = PackedSparseVector.from_bytes(row.vector_blob)
+        assert len(vector) == row.payload["term_count"] > 0
+        assert list(vector.term_ids) == sorted(vector.term_ids)
 
     monkeypatch.setenv("RETRIEVAL_PROVIDER", "sparse-local")
     get_settings.cache_clear()
@@ -80,6 +109,602 @@ def test_retrieval_lexical_mode_fallback(monkeypatch):
     get_settings.cache_clear()
 
 
+def test_retrieval_bm25_inverted_index(monkeypatch):
+    test_source = f"retrieval-bm25-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="NVDA",
+                    title="NVDA supply",
+                    content="NVIDIA supply constraints eased while accelerator shipments grew.",
+                ),
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="NVDA",
+                    title="NVDA pricing",
+                    content="Gaming pricing stayed flat during the quarter.",
+                ),
+            ],
+        )
+
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "bm25")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(
+            session,
+            "Did NVIDIA supply constraints ease?",
+            top_k=3,
+            ticker="NVDA",
+            source=test_source,
+        )
+        assert len(chunks) == 1
+        assert "supply" in chunks[0].content
+        assert chunks[0].score > 0
+    get_settings.cache_clear()
+
+
+def test_retrieval_cache_hits_until_ingestion_bumps_generation(monkeypatch):
+    # The same story is ingested twice on purpose, to bump the corpus generation.
+    monkeypatch.setenv("INGEST_DEDUP", "off")
+    get_settings.cache_clear()
+    test_source = f"retrieval-cache-{uuid.uuid4().hex[:8]}"
+    doc = IngestDocumentInput(
+        source=test_source,
+        ticker="AMZN",
+        title="AWS backlog",
+        content="AWS backlog expanded as enterprise migrations continued.",
+    )
+    with SessionLocal() as session:
+        before = get_corpus_generation(session)
+        ingest_documents(session, [doc])
+        assert get_corpus_generation(session) == before + 1
+
+        query = "What happened to the AWS backlog?"
+        first = retrieve_chunks(session, query, ticker="AMZN", source=test_source)
+        cached_entries = len(_result_cache)
+        second = retrieve_chunks(
+            session, "aws BACKLOG what happened the", ticker="AMZN", source=test_source
+        )
+        assert [c.chunk_id for c in second] == [c.chunk_id for c in first]
+        assert len(_result_cache) == cached_entries
+
+        ingest_documents(session, [doc.model_copy(update={"title": "AWS backlog again"})])
+        third = retrieve_chunks(session, query, ticker="AMZN", source=test_source)
+        assert len(third) == 2
+    get_settings.cache_clear()
+
+
+def test_batch_retrieval_matches_single_query_results(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_CACHE_MAX_ENTRIES", "0")
+    get_settings.cache_clear()
+    test_source = f"retrieval-batch-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker=ticker,
+                    title=f"{ticker} update",
+                    content=content,
+                )
+                for ticker, content in [
+                    ("AAPL", "Apple services revenue grew while iPhone margins held steady."),
+                    ("AAPL", "Apple buyback authorization expanded alongside the dividend."),
+                    ("MSFT", "Microsoft Azure growth accelerated on AI services demand."),
+                ]
+            ],
+        )
+        queries = ["Apple services margins", "buyback and dividend", "Azure AI growth"]
+        filters = [
+            RetrievalFilters(ticker="AAPL", source=test_source),
+            RetrievalFilters(ticker="AAPL", source=test_source),
+            RetrievalFilters(ticker="MSFT", source=test_source),
+        ]
+        batched = retrieve_chunks_batch(session, queries, filters, top_k=[2, 1, 3])
+        assert len(batched) == 3
+        for query, query_filters, k, results in zip(
+            queries, filters, [2, 1, 3], batched, strict=True
+        ):
+            single = retrieve_chunks(
+                session, query, top_k=k, ticker=query_filters.ticker, source=test_source
+            )
+            assert [c.chunk_id for c in results] == [c.chunk_id for c in single]
+            assert [round(c.score, 6) for c in results] == [round(c.score, 6) for c in single]
+        assert "buyback" in batched[1][0].content
+    get_settings.cache_clear()
+
+
+def test_retrieval_segmented_provider_respects_date_window(monkeypatch):
+    test_source = f"retrieval-segments-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="TSLA",
+                    title=f"TSLA deliveries {month}",
+                    content=f"Tesla deliveries update for month {month} with factory output.",
+                    published_at=datetime(2025, month, 15),
+                )
+                for month in (1, 2, 3)
+            ],
+        )
+
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "segmented")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(
+            session,
+            "Tesla deliveries and factory output",
+            top_k=5,
+            source=test_source,
+            date_from=datetime(2025, 2, 1),
+            date_to=datetime(2025, 2, 28),
+        )
+        assert len(chunks) == 1
+        assert chunks[0].published_at == datetime(2025, 2, 15)
+    get_settings.cache_clear()
+
+
+def test_retrieval_dense_provider_ranks_by_hashed_vectors(monkeypatch):
+    test_source = f"retrieval-dense-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="AMD",
+                    title="AMD datacenter",
+                    content="AMD datacenter accelerator shipments doubled this quarter.",
+                ),
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="KO",
+                    title="Coca-Cola pricing",
+                    content="Coca-Cola raised beverage prices across emerging markets.",
+                ),
+            ],
+        )
+
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "dense")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(
+            session, "datacenter accelerator shipments", top_k=3, source=test_source
+        )
+        assert chunks
+        assert chunks[0].ticker == "AMD"
+        assert all(chunk.source == test_source for chunk in chunks)
+        assert retrieve_chunks(session, "beverage prices", top_k=3, ticker="MISSING") == []
+    get_settings.cache_clear()
+
+
+def test_retrieval_ivf_provider_persists_index(monkeypatch, tmp_path):
+    test_source = f"retrieval-ivf-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="INTC",
+                    title="Intel foundry",
+                    content="Intel foundry wafer capacity expansion announced in Ohio.",
+                )
+            ],
+        )
+
+    index_path = tmp_path / "ivf.npz"
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "ivf")
+    monkeypatch.setenv("IVF_INDEX_PATH", str(index_path))
+    monkeypatch.setattr("src.rag.ivf_index._ivf", None)
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(
+            session, "Intel foundry wafer capacity", top_k=3, source=test_source
+        )
+        assert [chunk.ticker for chunk in chunks] == ["INTC"]
+        ivf, _ = get_ivf_index(session)
+        # Training and saving run on the maintenance thread, never on the query.
+        ivf.maintain()
+        assert index_path.exists() and ivf.index is not None
+        chunks = retrieve_chunks(
+            session, "Intel foundry wafer capacity", top_k=3, source=test_source
+        )
+        assert [chunk.ticker for chunk in chunks] == ["INTC"]
+    close_ivf_index()
+    get_settings.cache_clear()
+
+
+def test_retrieval_pq_provider_reranks_quantized_candidates(monkeypatch, tmp_path):
+    test_source = f"retrieval-pq-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="MU",
+                    title="Micron memory",
+                    content="Micron high bandwidth memory supply is sold out for next year.",
+                )
+            ],
+        )
+
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "pq")
+    monkeypatch.setenv("PQ_SUBVECTORS", "32")
+    monkeypatch.setenv("PQ_SCRATCH_DIR", str(tmp_path))
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(
+            session, "high bandwidth memory supply", top_k=3, source=test_source
+        )
+        assert [chunk.ticker for chunk in chunks] == ["MU"]
+    get_settings.cache_clear()
+
+
+def test_ingestion_publishes_vector_store_version_used_by_dense_retrieval(
+    monkeypatch, tmp_path
+):
+    store_dir = tmp_path / "vector_store"
+    monkeypatch.setenv("VECTOR_STORE_DIR", str(store_dir))
+    monkeypatch.setenv("VECTOR_STORE_PUBLISH_ROWS", "1")
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "dense")
+    get_settings.cache_clear()
+    store = get_vector_store()
+    test_source = f"retrieval-store-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="ASML",
+                    title="ASML lithography",
+                    content="ASML extreme ultraviolet lithography backlog keeps growing.",
+                )
+            ],
+        )
+    first = store.current_version()
+    assert first is not None
+
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(
+            session, "ultraviolet lithography backlog", top_k=2, source=test_source
+        )
+        assert [chunk.ticker for chunk in chunks] == ["ASML"]
+        index = get_dense_index(session)
+        assert index.base_version == first
+        assert isinstance(index.base.vectors, np.memmap)
+        assert len(index.base) == len(index)
+
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="ASML",
+                    title="ASML orders",
+                    content="ASML order intake for ultraviolet systems beat expectations.",
+                )
+            ],
+        )
+    second = store.current_version()
+    assert second != first
+    with SessionLocal() as session:
+        assert get_dense_index(session).base_version == second
+        chunks = retrieve_chunks(session, "ultraviolet", top_k=5, source=test_source)
+        assert len(chunks) == 2
+
+    # Below the batch size, ingestion leaves the published version alone and readers
+    # embed the newer chunks themselves.
+    monkeypatch.setenv("VECTOR_STORE_PUBLISH_ROWS", "1000")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="ASML",
+                    title="ASML service",
+                    content="ASML ultraviolet service revenue grew with the installed base.",
+                )
+            ],
+        )
+        assert store.current_version() == second
+        chunks = retrieve_chunks(session, "ultraviolet", top_k=5, source=test_source)
+        assert len(chunks) == 3
+    get_settings.cache_clear()
+
+
+def test_index_snapshot_warm_start_replays_newer_chunks(monkeypatch, tmp_path):
+    test_source = f"retrieval-snapshot-{uuid.uuid4().hex[:8]}"
+    path = tmp_path / "index.snap"
+
+    def _doc(ticker: str, content: str) -> IngestDocumentInput:
+        return IngestDocumentInput(source=test_source, ticker=ticker, title=ticker, content=content)
+
+    with SessionLocal() as session:
+        ingest_documents(session, [_doc("TSM", "Foundry utilization recovered on advanced nodes.")])
+        save_index_snapshot(session, path)
+        snapshot_docs = len(get_inverted_index(session))
+
+        # A fresh process: no in-memory indexes, and a chunk ingested after the snapshot.
+        set_inverted_index(None)
+        set_scoring_matrix(None)
+        ingest_documents(session, [_doc("ASML", "Lithography foundry orders rose sharply.")])
+        newest = session.scalars(
+            select(DocumentChunk.chunk_id).order_by(DocumentChunk.id.desc()).limit(1)
+        ).one()
+        snapshot = read_snapshot(path)
+        assert snapshot_matches_database(snapshot, session)
+        assert snapshot.matrix.rows_for([newest]).tolist() == [-1]
+        # The row at the matrix's high-water mark must hold the chunk the snapshot saw.
+        snapshot.matrix.last_chunk_id = newest
+        assert not snapshot_matches_database(snapshot, session)
+
+        counts = load_index_snapshot(session, path)
+        assert counts["bm25_docs"] == snapshot_docs
+        assert counts["bm25_replayed"] >= 1
+        assert counts["matrix_replayed"] >= 1
+        assert get_scoring_matrix(session).rows_for([newest]).tolist() != [-1]
+
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "bm25")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(session, "foundry", top_k=5, source=test_source)
+        assert {chunk.ticker for chunk in chunks} == {"TSM", "ASML"}
+    get_settings.cache_clear()
+
+
+# Exactly one 200-character chunk, so the follow-up's first chunk repeats the story's.
+DIESEL_LEAD = (
+    "A refinery outage on the Gulf Coast lifted diesel cracks to a three month high on "
+    "Tuesday, and traders said distillate stocks were already rather tight before the crude "
+    "unit went down on Sunday night."
+)
+DIESEL_STORY = DIESEL_LEAD + (
+    " The plant's operator expects the crude unit to restart within ten days, but analysts "
+    "warned that hurricane season and low inventories leave little room for further "
+    "disruptions. Exxon shares rose two percent while refining margins across the region "
+    "widened sharply."
+)
+DIESEL_FOLLOW_UP = DIESEL_LEAD + (
+    " Separately, the company reported that its chemicals segment posted weaker earnings as "
+    "polyethylene prices slid, and it trimmed its capital spending plan for next year by half "
+    "a billion dollars to fund a bigger share repurchase program."
+)
+
+
+def test_ingestion_skips_exact_and_near_duplicate_stories(monkeypatch):
+    monkeypatch.setenv("INGEST_DEDUP", "near")
+    monkeypatch.setenv("INGEST_NEAR_DUPLICATE_DISTANCE", "6")
+    monkeypatch.setenv("CHUNK_MAX_CHARS", "200")
+    monkeypatch.setenv("CHUNK_OVERLAP_CHARS", "0")
+    get_settings.cache_clear()
+    edited = DIESEL_STORY.replace("refinery outage", "refinery shutdown")
+    assert hamming_distance(simhash(DIESEL_STORY), simhash(edited)) == 3
+    assert hamming_distance(simhash(DIESEL_STORY), simhash(DIESEL_FOLLOW_UP)) == 19
+    # Dedup is scoped to ticker and source, so a fresh source keeps earlier runs apart.
+    source = f"wire-{uuid.uuid4().hex[:8]}"
+
+    def _doc(content: str, ticker: str = "XOM") -> IngestDocumentInput:
+        return IngestDocumentInput(source=source, ticker=ticker, title="Diesel", content=content)
+
+    with SessionLocal() as session:
+        first = ingest_documents(session, [_doc(DIESEL_STORY)])
+        assert (first.documents_ingested, first.duplicate_documents) == (1, 0)
+
+        summary = ingest_documents(
+            session,
+            [
+                _doc(DIESEL_STORY.upper().replace(".", " .")),
+                _doc(edited),
+                _doc(DIESEL_FOLLOW_UP),
+                # The same words about another company are that company's story.
+                _doc(DIESEL_STORY, ticker="VLO"),
+            ],
+        )
+        assert summary.duplicate_documents == 1
+        assert summary.near_duplicate_documents == 1
+        assert summary.documents_ingested == 2
+        # The follow-up repeats the lead, whose first chunk is already stored.
+        assert summary.duplicate_chunks >= 1
+
+        stored = session.execute(
+            select(DocumentChunk.ticker, DocumentChunk.content_hash).where(
+                DocumentChunk.source == source
+            )
+        ).all()
+        assert len(stored) == len(set(stored)) == first.chunks_ingested + summary.chunks_ingested
+        assert {ticker for ticker, _ in stored} == {"XOM", "VLO"}
+    get_settings.cache_clear()
+
+
+def test_default_dedup_skips_exact_copies_only():
+    assert get_settings().ingest_dedup == "exact"
+    source = f"wire-{uuid.uuid4().hex[:8]}"
+    edited = DIESEL_STORY.replace("refinery outage", "refinery shutdown")
+
+    def _doc(content: str) -> IngestDocumentInput:
+        return IngestDocumentInput(source=source, ticker="XOM", title="Diesel", content=content)
+
+    with SessionLocal() as session:
+        ingest_documents(session, [_doc(DIESEL_STORY)])
+        summary = ingest_documents(session, [_doc(DIESEL_STORY), _doc(edited)])
+    assert (summary.duplicate_documents, summary.near_duplicate_documents) == (1, 0)
+    assert summary.documents_ingested == 1
+
+
+def test_two_stage_retrieval_reranks_within_budget(monkeypatch):
+    test_source = f"retrieval-rerank-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="AMD",
+                    title="Spread",
+                    content="Data center revenue grew; separately, the gross outlook on "
+                    "margin improved and pricing guidance held.",
+                ),
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="AMD",
+                    title="Phrase",
+                    content="Gross margin guidance improved on data center pricing.",
+                ),
+            ],
+        )
+
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "bm25")
+    monkeypatch.setenv("RERANK_CANDIDATES", "50")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        chunks = retrieve_chunks(
+            session, "gross margin guidance", top_k=2, source=test_source
+        )
+        assert [chunk.content.split()[0] for chunk in chunks] == ["Gross", "Data"]
+        assert all(0.0 < chunk.score <= 1.0 for chunk in chunks)
+
+        # A spent budget still returns the first-stage candidates.
+        clear_retrieval_caches()
+        hurried = retrieve_chunks(
+            session, "gross margin guidance", top_k=2, source=test_source, rerank_budget_ms=0
+        )
+        assert {chunk.chunk_id for chunk in hurried} == {chunk.chunk_id for chunk in chunks}
+    get_settings.cache_clear()
+
+
+def test_exhaustive_retrieval_scans_past_the_candidate_cap(monkeypatch):
+    test_source = f"retrieval-exhaustive-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="XOM",
+                    title=f"Filler {idx}",
+                    content=f"Refinery throughput update number {idx} for the quarter.",
+                )
+                for idx in range(310)
+            ]
+            + [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="XOM",
+                    title="Helium",
+                    content="Helium supply outlook tightened as refinery throughput fell.",
+                )
+            ],
+        )
+
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "lexical")
+    monkeypatch.setenv("RETRIEVAL_SCAN_BATCH_SIZE", "64")
+    get_settings.cache_clear()
+    query = "helium supply outlook refinery throughput"
+    with SessionLocal() as session:
+        capped_stats, exhaustive_stats = RetrievalStats(), RetrievalStats()
+        capped = retrieve_chunks(
+            session, query, top_k=3, source=test_source, stats=capped_stats
+        )
+        exhaustive = retrieve_chunks(
+            session, query, top_k=3, source=test_source, exhaustive=True, stats=exhaustive_stats
+        )
+        assert capped_stats.scanned_rows == 300
+        assert all("Helium" not in chunk.content for chunk in capped)
+        assert exhaustive_stats.scanned_rows == 311
+        assert exhaustive[0].content.startswith("Helium")
+
+        # Paging through the rows must not change the ranking, ties included.
+        clear_retrieval_caches()
+        monkeypatch.setenv("RETRIEVAL_SCAN_BATCH_SIZE", "1000")
+        get_settings.cache_clear()
+        single_batch = retrieve_chunks(
+            session, query, top_k=3, source=test_source, exhaustive=True
+        )
+        assert [chunk.chunk_id for chunk in single_batch] == [
+            chunk.chunk_id for chunk in exhaustive
+        ]
+
+        cached_stats = RetrievalStats()
+        retrieve_chunks(
+            session, query, top_k=3, source=test_source, exhaustive=True, stats=cached_stats
+        )
+        assert cached_stats.scanned_rows == 0
+    get_settings.cache_clear()
+
+
+def test_retrieval_lsm_provider_searches_fresh_ingestion(monkeypatch):
+    test_source = f"retrieval-lsm-{uuid.uuid4().hex[:8]}"
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "lsm")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        retrieve_chunks(session, "warm up the index", top_k=1)
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="ARM",
+                    title="Arm royalties",
+                    content="Arm royalty revenue climbed on smartphone chip designs.",
+                )
+            ],
+        )
+        chunks = retrieve_chunks(session, "royalty revenue chip designs", source=test_source)
+        assert [chunk.ticker for chunk in chunks] == ["ARM"]
+    get_settings.cache_clear()
+
+
+def test_retrieval_sharded_provider_routes_ticker_queries(monkeypatch):
+    test_source = f"retrieval-sharded-{uuid.uuid4().hex[:8]}"
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "sharded")
+    monkeypatch.setenv("RETRIEVAL_SHARDS", "2")
+    get_settings.cache_clear()
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker=ticker,
+                    title=f"{ticker} lithium",
+                    content=f"{ticker} lithium contract pricing reset lower this quarter.",
+                )
+                for ticker in ("ALB", "SQM", "LAC")
+            ],
+        )
+        everywhere = retrieve_chunks(
+            session, "lithium contract pricing", top_k=5, source=test_source
+        )
+        assert {chunk.ticker for chunk in everywhere} == {"ALB", "SQM", "LAC"}
+        only_sqm = retrieve_chunks(
+            session, "lithium contract pricing", top_k=5, source=test_source, ticker="SQM"
+        )
+        assert [chunk.ticker for chunk in only_sqm] == ["SQM"]
+
+        # A killed shard process is restarted and reloaded on the next query.
+        sharded = get_sharded_index()
+        worker = sharded._workers[shard_for_ticker("SQM", sharded.shards)]
+        os.kill(worker.submit(os.getpid).result(), signal.SIGKILL)
+        reloaded = retrieve_chunks(
+            session, "lithium pricing reset", top_k=5, source=test_source, ticker="SQM"
+        )
+        assert [chunk.ticker for chunk in reloaded] == ["SQM"]
+        assert not sharded._stale
+    get_settings.cache_clear()
+
+
 def test_ingestion_uses_token_chunker_when_configured(monkeypatch):
     monkeypatch.setenv("CHUNKER_PROVIDER", "token")
     monkeypatch.setenv("CHUNK_MAX_TOKENS", "8")
@@ -110,3 +735,54 @@ def test_ingestion_uses_token_chunker_when_configured(monkeypatch):
         assert chunk is not None
         assert chunk.metadata_json.get("chunker") == "token"
     get_settings.cache_clear()
+
+
+def test_rerank_settings_key_the_cache_and_each_query_gets_its_own_budget(monkeypatch):
+    test_source = f"retrieval-rerank-batch-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        ingest_documents(
+            session,
+            [
+                IngestDocumentInput(
+                    source=test_source,
+                    ticker="AMD",
+                    title=f"Margins {year}",
+                    content=f"Gross margin guidance for {year} improved on pricing.",
+                    published_at=datetime(year, 6, 1),
+                )
+                for year in (2023, 2024)
+            ],
+        )
+
+    class SteppingReranker(Reranker):
+        """Each clock read advances 1ms; the 2ms budget covers one query's candidates."""
+
+        outcomes: list = []
+
+        def __init__(self, **kwargs) -> None:
+            ticks = (step / 1000.0 for step in range(10**6))
+            super().__init__(clock=lambda: next(ticks), **kwargs)
+
+        def rerank(self, *args, **kwargs):
+            outcome = super().rerank(*args, **kwargs)
+            self.outcomes.append(outcome)
+            return outcome
+
+    monkeypatch.setattr("src.rag.retrieval.Reranker", SteppingReranker)
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "bm25")
+    monkeypatch.setenv("RERANK_CANDIDATES", "50")
+    monkeypatch.setenv("RERANK_BUDGET_MS", "2")
+    get_settings.cache_clear()
+    clear_retrieval_caches()
+    queries = ["gross margin guidance", "margin pricing", "guidance improved"]
+    with SessionLocal() as session:
+        retrieve_chunks_batch(session, queries, RetrievalFilters(source=test_source), top_k=2)
+        assert len(SteppingReranker.outcomes) == 3
+        assert not any(outcome.budget_exhausted for outcome in SteppingReranker.outcomes)
+
+        monkeypatch.setenv("RERANK_RECENCY_HALF_LIFE_DAYS", "1")
+        get_settings.cache_clear()
+        retrieve_chunks(session, queries[0], top_k=2, source=test_source)
+        # A new half-life misses the cache and reranks again.
+        assert len(SteppingReranker.outcomes) == 4
+    get_settings.cache_clear()
@@ -0,0 +1,110 @@
+from dataclasses import replace
+from datetime import datetime
+
+import numpy as np
+
+from src.rag.answer_cache import AnswerCache, CachedAnswer, normalize_question, question_guard
+from src.rag.embeddings import HashedDenseEmbeddingProvider
+from src.rag.retrieval import RetrievedChunk
+
+EMBED = HashedDenseEmbeddingProvider(dimension=256)
+CHUNKS = [
+    RetrievedChunk(
+        chunk_id=f"c{idx}",
+        document_id=idx,
+        content=f"Apple raised its services guidance {idx}.",
+        source="news",
+        ticker="AAPL",
+        published_at=datetime(2026, 5, idx + 1),
+        score=0.5,
+    )
+    for idx in range(3)
+]
+ANSWER = CachedAnswer("Apple guided higher [c0].", "openai")
+
+
+def _vec(text: str) -> np.ndarray:
+    return EMBED.embed(normalize_question(text))
+
+
+def _lookup(cache: AnswerCache, question: str, chunks, *, model: str = "m"):
+    return cache.lookup(model, question, _vec(question), chunks)
+
+
+def test_normalized_questions_ignore_filler_and_suffixes():
+    assert normalize_question("What did AAPL guide?") == normalize_question("AAPL guidance?")
+    assert normalize_question("Which margins improved?") == "margin improv"
+
+
+def test_questions_must_repeat_numbers_and_periods():
+    assert question_guard("AAPL revenue in Q3 fiscal 2023?") == "2023 q3"
+    assert question_guard("How did revenue change in the second half?") == "half second"
+
+
+def test_similar_question_with_same_citations_hits():
+    cache = AnswerCache(threshold=0.8)
+    cache.store("m", "AAPL guidance outlook?", _vec("AAPL guidance outlook?"), CHUNKS, ANSWER)
+    assert _lookup(cache, "what is the AAPL guidance outlook", CHUNKS[::-1]) == ANSWER
+    assert _lookup(cache, "AAPL dividend payout history", CHUNKS) is None
+    # A different citation set or model never matches, however close the wording.
+    assert _lookup(cache, "AAPL guidance outlook?", CHUNKS[:2]) is None
+    assert _lookup(cache, "AAPL guidance outlook?", CHUNKS, model="other") is None
+
+
+def test_default_threshold_separates_questions_one_term_apart():
+    cache = AnswerCache()
+    for question in (
+        "Did the gross margin increase in Q3 fiscal 2023 versus the prior year quarter?",
+        "How did data center revenue change in fiscal 2023?",
+    ):
+        cache.store("m", question, _vec(question), CHUNKS, ANSWER)
+    for question in (
+        "Did the gross margin decrease in Q3 fiscal 2023 versus the prior year quarter?",
+        "Did the gross margin increase in Q4 fiscal 2023 versus the prior year quarter?",
+        "How did data center revenue change in fiscal 2024?",
+    ):
+        assert _lookup(cache, question, CHUNKS) is None
+    reworded = "data center revenue: how did it change in fiscal 2023"
+    assert _lookup(cache, reworded, CHUNKS) == ANSWER
+
+
+def test_changed_cited_chunk_invalidates_entry():
+    cache = AnswerCache()
+    cache.store("m", "AAPL guidance?", _vec("AAPL guidance?"), CHUNKS, ANSWER)
+    edited = [replace(CHUNKS[0], content="Apple cut its services guidance."), *CHUNKS[1:]]
+    assert _lookup(cache, "AAPL guidance?", edited) is None
+    assert len(cache) == 0
+    assert _lookup(cache, "AAPL guidance?", CHUNKS) is None
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = AnswerCache(max_entries=2)
+    for idx in range(2):
+        question = f"question number{idx}"
+        cache.store("m", question, _vec(question), CHUNKS[idx : idx + 1], ANSWER)
+    assert _lookup(cache, "question number0", CHUNKS[0:1]) == ANSWER
+    cache.store("m", "question number2", _vec("question number2"), CHUNKS[2:3], ANSWER)
+    assert len(cache) == 2
+    assert _lookup(cache, "question number1", CHUNKS[1:2]) is None
+    assert _lookup(cache, "question number0", CHUNKS[0:1]) == ANSWER
+
+
+def test_persistent_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    first = AnswerCache(path=path)
+    first.store("m", "AAPL guidance?", _vec("AAPL guidance?"), CHUNKS, ANSWER)
+    first.close()
+
+    second = AnswerCache(path=path)
+    assert len(second) == 0
+    assert _lookup(second, "AAPL guidance?", CHUNKS) == ANSWER
+    assert len(second) == 1
+    edited = [replace(CHUNKS[1], ticker="MSFT"), CHUNKS[0], CHUNKS[2]]
+    second.clear()
+    second.store("m", "AAPL guidance?", _vec("AAPL guidance?"), CHUNKS, ANSWER)
+    second.close()
+
+    third = AnswerCache(path=path)
+    assert _lookup(third, "AAPL guidance?", edited) is None
+    assert _lookup(third, "AAPL guidance?", CHUNKS) is None
+    third.close()
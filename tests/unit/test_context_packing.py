@@ -0,0 +1,74 @@
+from src.rag.answer_generation import chat_messages, format_context
+from src.rag.chunking import SimpleChunker
+from src.rag.context_packing import estimate_prompt_tokens, estimate_tokens, pack_contexts
+from src.rag.retrieval import RetrievedChunk
+
+TEXT = " ".join(
+    f"Sentence {idx} says segment revenue grew {idx} percent on data center demand."
+    for idx in range(12)
+)
+
+
+def _retrieved(document_id: int, text: str, scores: list[float]) -> list[RetrievedChunk]:
+    chunks = SimpleChunker(max_chars=240, overlap_chars=80).chunk(document_id, text)
+    return [
+        RetrievedChunk(
+            chunk_id=chunk.chunk_id,
+            document_id=document_id,
+            content=chunk.content,
+            source="news",
+            ticker="NVDA",
+            published_at=None,
+            score=score,
+        )
+        for chunk, score in zip(chunks, scores, strict=False)
+    ]
+
+
+def test_overlapping_chunks_of_a_document_are_stitched_back_together():
+    retrieved = _retrieved(1, TEXT, [0.2, 0.9, 0.5, 0.4, 0.3, 0.8, 0.1, 0.6])
+    assert len(retrieved) > 3
+    packed = pack_contexts(retrieved, token_budget=10_000)
+
+    [context] = packed.contexts
+    assert context.excerpt == TEXT
+    assert context.chunk_id == retrieved[1].chunk_id
+    assert packed.merged_chunks == len(retrieved) - 1
+    assert packed.tokens < sum(estimate_tokens(chunk.content) for chunk in retrieved)
+
+
+def test_duplicate_text_is_sent_once():
+    first = _retrieved(1, TEXT, [0.9, 0.8])
+    syndicated = [
+        RetrievedChunk(**{**vars(chunk), "document_id": 2, "chunk_id": f"copy-{idx}"})
+        for idx, chunk in enumerate(first)
+    ]
+    packed = pack_contexts(first + syndicated, token_budget=10_000)
+    assert [ctx.chunk_id for ctx in packed.contexts] == [first[0].chunk_id]
+    assert packed.duplicate_chunks == 2
+
+
+def test_budget_keeps_best_chunks_and_truncates_a_lone_oversized_one():
+    retrieved = _retrieved(1, TEXT, [0.9]) + _retrieved(2, TEXT[::-1], [0.5]) + [
+        RetrievedChunk("short", 3, "Guidance was raised.", "news", "NVDA", None, 0.1)
+    ]
+    packed = pack_contexts(retrieved, token_budget=110)
+    assert [ctx.chunk_id for ctx in packed.contexts] == [retrieved[0].chunk_id, "short"]
+    assert packed.dropped_chunks == 1
+    assert packed.tokens <= 110
+    assert packed.tokens == sum(estimate_tokens(format_context(c)) + 1 for c in packed.contexts)
+
+    [lone] = pack_contexts(retrieved[:1], token_budget=30).contexts
+    assert retrieved[0].content.startswith(lone.excerpt)
+    assert 0 < len(lone.excerpt) < len(retrieved[0].content)
+
+
+def test_question_budget_covers_the_whole_prompt():
+    retrieved = _retrieved(1, TEXT, [0.9]) + _retrieved(2, TEXT[::-1], [0.5])
+    question = "What drove segment revenue growth?"
+    evidence_only = pack_contexts(retrieved, token_budget=200)
+    packed = pack_contexts(retrieved, token_budget=200, question=question)
+    assert len(evidence_only.contexts) == 2
+    assert [ctx.chunk_id for ctx in packed.contexts] == [retrieved[0].chunk_id]
+    assert packed.tokens == estimate_prompt_tokens(chat_messages(question, packed.contexts))
+    assert packed.tokens <= 200
@@ -0,0 +1,68 @@
+import random
+from datetime import UTC, datetime
+
+from src.data_ingestion.dedup import (
+    SimHashIndex,
+    content_hash,
+    dedup_scope,
+    hamming_distance,
+    normalize_content,
+    simhash,
+)
+
+STORY = (
+    "Shares of the chipmaker rose after quarterly revenue beat estimates, driven by data "
+    "center demand. Management raised full-year guidance and announced a larger buyback, "
+    "while gross margin expanded on a richer product mix and lower freight costs."
+)
+
+
+def test_content_hash_ignores_case_whitespace_and_punctuation():
+    variant = "  SHARES of the chipmaker rose -- after quarterly\nrevenue beat estimates; " + (
+        STORY.split("estimates, ", 1)[1].upper()
+    )
+    assert normalize_content(variant) == normalize_content(STORY)
+    assert content_hash(variant) == content_hash(STORY)
+    assert content_hash(STORY + " Updated.") != content_hash(STORY)
+
+
+def test_simhash_separates_near_duplicates_from_unrelated_text():
+    edited = STORY.replace("larger buyback", "bigger buyback")
+    unrelated = "Crude inventories fell for a third week as refinery runs climbed in the Gulf."
+    assert hamming_distance(simhash(STORY), simhash(edited)) <= 6
+    assert hamming_distance(simhash(STORY), simhash(unrelated)) > 12
+    assert -(2**63) <= simhash(STORY) < 2**63
+
+
+def test_simhash_index_finds_every_fingerprint_within_distance():
+    rng = random.Random(9)
+    index = SimHashIndex(max_distance=3)
+    stored = [rng.getrandbits(64) - 2**63 for _ in range(500)]
+    for doc_id, fingerprint in enumerate(stored):
+        index.add(doc_id, fingerprint)
+    assert len(index) == 500
+
+    for doc_id in rng.sample(range(500), 50):
+        flipped = stored[doc_id]
+        for bit in rng.sample(range(64), rng.randint(0, 3)):
+            flipped ^= 1 << bit
+        assert index.find(flipped) == doc_id
+
+    far = stored[0] ^ 0b11111
+    assert all(hamming_distance(far, fp) > 3 for fp in stored) == (index.find(far) is None)
+
+
+def test_dedup_scope_keeps_tickers_sources_and_days_apart():
+    morning = dedup_scope("AAPL", "news", datetime(2026, 4, 1, 9))
+    assert morning == dedup_scope("AAPL", "news", datetime(2026, 4, 1, 21, tzinfo=UTC))
+    others = [
+        dedup_scope("MSFT", "news", datetime(2026, 4, 1, 9)),
+        dedup_scope("AAPL", "filings", datetime(2026, 4, 1, 9)),
+        dedup_scope("AAPL", "news", datetime(2026, 4, 2, 9)),
+    ]
+    assert len({content_hash(STORY, scope) for scope in [morning, *others]}) == 4
+
+    index = SimHashIndex(max_distance=3)
+    index.add(1, simhash(STORY), morning)
+    assert index.find(simhash(STORY), morning) == 1
+    assert all(index.find(simhash(STORY), scope) is None for scope in others)
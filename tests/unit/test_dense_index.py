@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import numpy as np
+
+from src.rag.dense_index import DenseVectorIndex
+from src.rag.embeddings import (
+    DenseEmbeddingProvider,
+    HashedDenseEmbeddingProvider,
+    SparseEmbeddingProvider,
+    cosine_similarity_sparse,
+    get_embedding_provider,
+)
+from src.rag.filters import RetrievalFilters
+
+
+def test_hashed_dense_provider_is_deterministic_and_normalized():
+    provider = get_embedding_provider("hashed-dense", dimension=64)
+    assert isinstance(provider, DenseEmbeddingProvider)
+    assert not isinstance(get_embedding_provider("sparse-local"), DenseEmbeddingProvider)
+
+    vectors = provider.embed_many(["Revenue growth beat guidance", "revenue GROWTH", ""])
+    assert vectors.shape == (3, 64)
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors[:2], axis=1), 1.0, rtol=1e-6)
+    assert not vectors[2].any()
+    np.testing.assert_array_equal(
+        vectors[0], HashedDenseEmbeddingProvider(dimension=64).embed("revenue growth beat guidance")
+    )
+
+
+def test_hashed_dense_similarity_tracks_sparse_cosine():
+    provider = HashedDenseEmbeddingProvider(dimension=4096)
+    sparse = SparseEmbeddingProvider()
+    texts = ["apple iphone revenue growth", "apple iphone sales", "oil refinery output"]
+    dense = provider.embed_many(texts)
+    # With few collisions, hashed dot products approximate the exact sparse cosine.
+    for i, j in [(0, 1), (0, 2)]:
+        exact = cosine_similarity_sparse(sparse.embed(texts[i]), sparse.embed(texts[j]))
+        assert abs(float(dense[i] @ dense[j]) - exact) < 1e-5
+
+
+def test_dense_index_search_applies_filters_and_grows():
+    provider = HashedDenseEmbeddingProvider(dimension=128)
+    index = DenseVectorIndex(provider)
+    texts = [f"filler document number {i}" for i in range(1500)]
+    texts[7] = "nvidia datacenter revenue record"
+    texts[900] = "nvidia datacenter revenue outlook"
+    index.append(
+        [f"c{i}" for i in range(len(texts))],
+        provider.embed_many(texts),
+        tickers=["NVDA" if i in (7, 900) else "SPY" for i in range(len(texts))],
+        sources=["news" if i == 7 else "filing" for i in range(len(texts))],
+        published_ats=[datetime(2026, 1, 1) if i == 900 else None for i in range(len(texts))],
+    )
+    assert len(index) == 1500
+    assert index.vectors.shape == (1500, 128)
+
+    query = provider.embed("nvidia datacenter revenue")
+    assert [cid for cid, _ in index.search(query, top_k=2)] in (["c7", "c900"], ["c900", "c7"])
+    assert [cid for cid, _ in index.search(query, filters=RetrievalFilters(source="news"))][
+        0
+    ] == "c7"
+    dated = index.search(query, filters=RetrievalFilters(date_from=datetime(2025, 12, 1)))
+    assert [cid for cid, _ in dated] == ["c900"]
+    assert index.search(query, filters=RetrievalFilters(ticker="TSLA")) == []
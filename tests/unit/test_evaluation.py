@@ -0,0 +1,84 @@
+import threading
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+from src.common.db import SessionLocal, engine
+from src.data_ingestion.pipelines.document_ingestion import ingest_documents
+from src.data_ingestion.schemas import IngestDocumentInput
+from src.rag import evaluation
+from src.rag.evaluation import QaEvalCase, evaluate_qa_cases
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "META", "TSLA", "ORCL", "INTC"]
+
+
+def _cases(session) -> list[QaEvalCase]:
+    source = f"qa-eval-{uuid.uuid4().hex[:8]}"
+    ingest_documents(
+        session,
+        [
+            IngestDocumentInput(
+                source=source,
+                ticker=ticker,
+                title=f"{ticker} margins",
+                content=f"{ticker} gross margins expanded on pricing and a richer product mix.",
+            )
+            for ticker in TICKERS
+        ],
+    )
+    cases = [
+        QaEvalCase(question=f"How did {ticker} gross margins change?", ticker=ticker, source=source)
+        for ticker in TICKERS
+    ]
+    # Nothing is ingested under this source, so the case fails on citations.
+    cases.append(QaEvalCase(question="What did nobody report?", source=f"{source}-missing"))
+    return cases
+
+
+def test_cases_run_concurrently_with_latency_percentiles(fake_openai):
+    fake_openai.delay = 0.25
+    with SessionLocal() as session:
+        cases = _cases(session)
+        started = time.perf_counter()
+        summary = evaluate_qa_cases(session, cases, parallelism=len(cases))
+        elapsed = time.perf_counter() - started
+
+    # Eight 0.25s answers side by side instead of 2s in sequence.
+    assert elapsed < 1.5
+    assert [item.question for item in summary.cases] == [case.question for case in cases]
+    assert [item.passed for item in summary.cases] == [True] * len(TICKERS) + [False]
+    assert summary.pass_rate == round(len(TICKERS) / len(cases), 3)
+    assert all(item.generation_ms >= 250 for item in summary.cases[:-1])
+    for latency in (summary.retrieval_latency, summary.generation_latency):
+        assert 0 < latency.p50_ms <= latency.p95_ms <= latency.p99_ms
+    assert summary.generation_latency.p50_ms >= 250
+
+
+def test_serial_and_parallel_runs_agree():
+    with SessionLocal() as session:
+        cases = _cases(session)
+        serial = evaluate_qa_cases(session, cases, parallelism=1)
+        parallel = evaluate_qa_cases(session, cases, parallelism=3)
+    assert [(c.passed, c.citation_count) for c in serial.cases] == [
+        (c.passed, c.citation_count) for c in parallel.cases
+    ]
+    assert serial.avg_confidence == parallel.avg_confidence
+
+
+def test_connection_bound_session_runs_cases_serially(monkeypatch):
+    with SessionLocal() as session:
+        cases = _cases(session)
+    threads = []
+    run_case = evaluation._run_case
+
+    def recording_run_case(session, case):
+        threads.append(threading.current_thread())
+        return run_case(session, case)
+
+    monkeypatch.setattr(evaluation, "_run_case", recording_run_case)
+    # Worker sessions on the engine could not see a transaction open on the connection.
+    with engine.connect() as connection, Session(bind=connection) as session:
+        summary = evaluate_qa_cases(session, cases, parallelism=3)
+    assert set(threads) == {threading.current_thread()}
+    assert [item.passed for item in summary.cases] == [True] * len(TICKERS) + [False]
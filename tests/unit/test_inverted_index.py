@@ -0,0 +1,53 @@
+import random
+from datetime import datetime
+
+from src.rag.filters import RetrievalFilters
+from src.rag.inverted_index import InvertedIndex
+
+VOCAB = [
+    "revenue", "margin", "guidance", "cloud", "demand", "growth", "chip", "supply",
+    "inventory", "dividend", "buyback", "outlook", "pricing", "capex", "subscriber",
+]
+
+
+def _build_index(doc_count: int = 400) -> InvertedIndex:
+    rng = random.Random(7)
+    index = InvertedIndex()
+    for idx in range(doc_count):
+        words = [rng.choice(VOCAB) for _ in range(rng.randint(5, 40))]
+        index.add(
+            f"chunk-{idx}",
+            " ".join(words),
+            ticker="AAPL" if idx % 3 == 0 else "MSFT",
+            source="news",
+            published_at=datetime(2026, 1 + idx % 12, 1),
+        )
+    return index
+
+
+def test_maxscore_matches_exhaustive_ranking():
+    index = _build_index()
+    for query in ["cloud demand growth", "dividend buyback outlook pricing", "capex"]:
+        pruned = index.search(query, top_k=10)
+        exact = index.search_exhaustive(query, top_k=10)
+        assert [cid for cid, _ in pruned] == [cid for cid, _ in exact]
+        for (_, a), (_, b) in zip(pruned, exact, strict=True):
+            assert abs(a - b) < 1e-9
+
+
+def test_search_applies_filters():
+    index = _build_index()
+    filters = RetrievalFilters(ticker="AAPL", date_from=datetime(2026, 6, 1))
+    results = index.search("revenue margin guidance", top_k=20, filters=filters)
+    assert results
+    exact = index.search_exhaustive("revenue margin guidance", top_k=20, filters=filters)
+    assert [cid for cid, _ in results] == [cid for cid, _ in exact]
+    for chunk_id, _ in results:
+        idx = int(chunk_id.split("-")[1])
+        assert idx % 3 == 0
+        assert 1 + idx % 12 >= 6
+
+
+def test_unknown_terms_return_nothing():
+    index = _build_index(20)
+    assert index.search("zzzunknown", top_k=5) == []
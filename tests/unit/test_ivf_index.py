@@ -0,0 +1,123 @@
+import numpy as np
+
+from src.rag.ann_benchmark import benchmark_ivf
+from src.rag.dense_index import DenseVectorIndex
+from src.rag.embeddings import HashedDenseEmbeddingProvider
+from src.rag.filters import RetrievalFilters
+from src.rag.ivf_index import DenseIvfIndex, IvfIndex, spherical_kmeans
+from src.rag.sparse_matrix import top_k_indices
+
+
+def _clustered(rows: int = 2000, dim: int = 32, clusters: int = 8, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(rows, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32), labels
+
+
+def test_spherical_kmeans_recovers_clusters():
+    vectors, labels = _clustered()
+    centroids = spherical_kmeans(vectors, 8, seed=1)
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+    assigned = np.argmax(vectors @ centroids.T, axis=1)
+    # Every true cluster should map (almost) entirely onto one centroid.
+    for label in range(8):
+        counts = np.bincount(assigned[labels == label], minlength=8)
+        assert counts.max() / counts.sum() > 0.95
+
+
+def test_ivf_probing_every_list_matches_exhaustive_search():
+    vectors, _ = _clustered()
+    index = IvfIndex.build(vectors, n_lists=16, nprobe=2)
+    assert len(index) == vectors.shape[0]
+    assert index.list_sizes.sum() == vectors.shape[0]
+
+    query = vectors[17]
+    exact = top_k_indices(vectors @ query, 10).tolist()
+    full = index.search(query, top_k=10, nprobe=index.n_lists)[0]
+    assert [row for row, _ in full] == exact
+    assert index.search(query, top_k=10)[0][0][0] == 17
+
+
+def test_ivf_add_mask_and_save_load_round_trip(tmp_path):
+    vectors, _ = _clustered(rows=600)
+    index = IvfIndex.train(vectors[:400], n_lists=8, nprobe=8)
+    index.add(vectors[:400])
+    index.add(vectors[400:])
+    assert len(index) == 600
+
+    mask = np.zeros(600, dtype=bool)
+    mask[450:] = True
+    hits = index.search(vectors[500], top_k=5, mask=mask)[0]
+    assert hits[0][0] == 500
+    assert all(row >= 450 for row, _ in hits)
+
+    path = tmp_path / "ivf.npz"
+    index.save(path, chunk_ids=np.array([f"c{i}" for i in range(600)]))
+    loaded, extra = IvfIndex.load(path)
+    assert extra["chunk_ids"][599] == "c599"
+    assert loaded.nprobe == 8
+    np.testing.assert_array_equal(loaded.list_sizes, index.list_sizes)
+    assert loaded.search(vectors[:3], top_k=4) == index.search(vectors[:3], top_k=4)
+
+
+def test_selective_mask_widens_probing_until_enough_rows_pass():
+    vectors, labels = _clustered(rows=1200, clusters=8)
+    index = IvfIndex.build(vectors, n_lists=8, nprobe=1)
+    # Only a handful of rows from clusters far from the query pass the filter.
+    query = vectors[np.flatnonzero(labels == 0)[0]]
+    rare = np.flatnonzero(labels != 0)[:3]
+    mask = np.zeros(vectors.shape[0], dtype=bool)
+    mask[rare] = True
+    hits = index.search(query, top_k=5, mask=mask)[0]
+    assert sorted(row for row, _ in hits) == sorted(rare.tolist())
+
+
+def _dense_index(texts: list[str], tickers: list[str]) -> DenseVectorIndex:
+    provider = HashedDenseEmbeddingProvider(dimension=64)
+    dense = DenseVectorIndex(provider)
+    dense.append(
+        [f"c{i}" for i in range(len(texts))],
+        provider.embed_many(texts),
+        tickers=tickers,
+        sources=["news"] * len(texts),
+        published_ats=[None] * len(texts),
+    )
+    return dense
+
+
+def test_queries_never_train_and_fall_back_to_exact_search_until_maintained(tmp_path):
+    texts = [f"company {i} revenue guidance update quarter {i % 7}" for i in range(200)]
+    dense = _dense_index(texts, ["AAPL"] * 199 + ["RARE"])
+    path = tmp_path / "ivf.npz"
+    ivf = DenseIvfIndex(n_lists=8, nprobe=1, path=str(path), background=False)
+    queries = dense.provider.embed_many(["company 5 revenue guidance"])
+    filters = RetrievalFilters(ticker="RARE")
+
+    exact = dense.search_many(queries, top_ks=[3], filters=filters)
+    assert ivf.search_many(dense, queries, top_ks=[3], filters=filters) == exact
+    assert ivf.index is None and not path.exists()
+
+    ivf.maintain()
+    assert ivf.index is not None and ivf.trained_rows == 200 and path.exists()
+    assert ivf.search_many(dense, queries, top_ks=[3], filters=filters) == exact
+
+    saved = path.stat().st_mtime_ns
+    more = _dense_index(texts + ["company 200 buyback"], ["AAPL"] * 199 + ["RARE", "AAPL"])
+    ivf.search_many(more, queries, top_ks=[3], filters=filters)
+    assert len(ivf.index) == 201 and path.stat().st_mtime_ns == saved
+    ivf.maintain()
+    reloaded = DenseIvfIndex(n_lists=8, path=str(path), background=False)
+    assert reloaded.sync(more) is not None and len(reloaded.index) == 201
+
+
+def test_benchmark_ivf_reports_recall_per_nprobe():
+    vectors, _ = _clustered(rows=1500)
+    summary = benchmark_ivf(vectors, vectors[:20], top_k=5, nprobes=(1, 4, 64), n_lists=16)
+    assert summary.exhaustive.recall_at_k == 1.0
+    assert [point.nprobe for point in summary.points] == [1, 4, 16]
+    recalls = [point.recall_at_k for point in summary.points]
+    assert recalls == sorted(recalls)
+    assert recalls[-1] == 1.0
@@ -0,0 +1,119 @@
+import time
+
+import httpx
+import pytest
+
+from src.common.llm_gateway import (
+    CircuitBreaker,
+    CircuitOpenError,
+    GatewayBusyError,
+    LlmGateway,
+    TokenBucket,
+)
+from src.signals.sentiment_scoring import score_with_fallback
+
+PAYLOAD = {"model": "m", "messages": []}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def gateway(fake_openai):
+    gateway = LlmGateway(
+        fake_openai.base_url, max_retries=2, backoff_seconds=0.01, breaker_failures=3
+    )
+    yield gateway
+    gateway.close()
+
+
+def test_requests_reuse_one_pooled_connection(fake_openai, gateway):
+    for _ in range(5):
+        body = gateway.post_json("/chat/completions", PAYLOAD)
+        assert body["choices"][0]["message"]["content"] == "Margins improved [chunk]."
+    assert len(fake_openai.requests) == 5
+    assert len(fake_openai.connections) == 1
+
+
+def test_transient_errors_are_retried(fake_openai, gateway):
+    fake_openai.failures = 2
+    gateway.post_json("/chat/completions", PAYLOAD)
+    assert len(fake_openai.requests) == 3
+    assert gateway.breaker.state == "closed"
+
+
+def test_breaker_opens_and_fails_fast(fake_openai):
+    fake_openai.status = 503
+    gateway = LlmGateway(fake_openai.base_url, max_retries=5, breaker_failures=2)
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            gateway.post_json("/chat/completions", PAYLOAD)
+        # Retries stop as soon as the breaker opens.
+        assert len(fake_openai.requests) == 2
+        started = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            gateway.post_json("/chat/completions", PAYLOAD)
+        assert time.perf_counter() - started < 0.05
+        assert len(fake_openai.requests) == 2
+    finally:
+        gateway.close()
+
+
+def test_concurrency_cap_rejects_when_no_slot_frees_up(fake_openai):
+    gateway = LlmGateway(fake_openai.base_url, max_concurrency=1)
+    try:
+        stream = gateway.stream_lines("/chat/completions", {**PAYLOAD, "stream": True})
+        next(stream)
+        with pytest.raises(GatewayBusyError):
+            gateway.post_json("/chat/completions", PAYLOAD, timeout=0.05)
+        assert "data: [DONE]" in list(stream)
+        gateway.post_json("/chat/completions", PAYLOAD)
+    finally:
+        gateway.close()
+
+
+def test_half_open_breaker_allows_one_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(2, 10.0, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now = 10.0
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+    assert bucket.acquire(0) and bucket.acquire(0)
+    assert not bucket.acquire(0.1)
+    clock.now = 0.5
+    assert bucket.acquire(0)
+    assert TokenBucket(rate=0, burst=1).acquire(0)
+
+
+def test_sentiment_falls_back_to_lexicon_through_gateway(fake_openai):
+    fake_openai.status = 500
+    result = score_with_fallback(
+        "Strong growth accelerated.",
+        primary_provider="openai",
+        openai_api_key="test-key",
+        openai_model="gpt-4o-mini",
+        openai_base_url=fake_openai.base_url,
+        openai_timeout_seconds=5,
+    )
+    assert result.provider_used == "lexicon-fallback"
+    assert result.value > 0
@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.rag.embeddings import HashedDenseEmbeddingProvider
+from src.rag.filters import RetrievalFilters
+from src.rag.lsm_index import LsmVectorIndex
+
+PROVIDER = HashedDenseEmbeddingProvider(dimension=64)
+
+
+def _append(index: LsmVectorIndex, items: dict[str, str], *, ticker: str = "SPY", hwm=None):
+    index.append(
+        list(items),
+        PROVIDER.embed_many(list(items.values())),
+        tickers=[ticker] * len(items),
+        sources=["news"] * len(items),
+        published_ats=[None] * len(items),
+        high_water_mark=hwm,
+    )
+
+
+def _ids(index: LsmVectorIndex, text: str, top_k: int = 5, **filters) -> list[str]:
+    hits = index.search_many(
+        PROVIDER.embed_many([text]), top_ks=[top_k], filters=RetrievalFilters(**filters)
+    )[0]
+    return [chunk_id for chunk_id, _ in hits]
+
+
+def test_lsm_flushes_merges_and_matches_brute_force(tmp_path):
+    index = LsmVectorIndex(
+        PROVIDER, directory=str(tmp_path), memtable_rows=10, merge_factor=2, background=False
+    )
+    texts = {f"c{i}": f"topic{i % 7} report number{i} sector{i % 3} w{i * i}" for i in range(95)}
+    items = list(texts.items())
+    for start in range(0, len(items), 5):
+        _append(index, dict(items[start : start + 5]), hwm=start + 5)
+
+    assert len(index) == 95
+    assert index.memtable_size == 5
+    assert all(segment.path is not None for segment in index.segments)
+    assert isinstance(index.segments[0].vectors, np.memmap)
+    # Tiered merging keeps the segment count logarithmic in the corpus size.
+    assert len(index.segments) <= 4
+    assert sum(len(segment) for segment in index.segments) == 90
+
+    query = "topic3 report sector1"
+    vectors = PROVIDER.embed_many(list(texts.values()))
+    scores = vectors @ PROVIDER.embed(query)
+    hits = index.search_many(PROVIDER.embed_many([query]), top_ks=[5])[0]
+    np.testing.assert_allclose([score for _, score in hits], np.sort(scores)[::-1][:5], rtol=1e-6)
+    assert set(_ids(index, query, top_k=95)) == {f"c{i}" for i in np.flatnonzero(scores > 0)}
+
+
+def test_lsm_second_index_on_a_directory_is_read_only(tmp_path):
+    first = LsmVectorIndex(PROVIDER, directory=str(tmp_path), memtable_rows=2, background=False)
+    # A write that crashed before its manifest update left the next directory behind.
+    stale = first._segment_dir(1)
+    stale.mkdir(parents=True)
+    (stale / "vectors.npy").write_bytes(b"partial")
+    _append(first, {"a": "gold mining output", "b": "silver demand"}, hwm=2)
+    [written] = first.segments
+    assert written.path == stale and len(written) == 2
+
+    second = LsmVectorIndex(
+        PROVIDER, directory=str(tmp_path), memtable_rows=2, merge_factor=2, background=False
+    )
+    assert second.read_only and not first.read_only
+    assert second.high_water_mark == 2
+    # Merging the loaded segment with its own keeps the writer's files in place.
+    _append(second, {"c": "oil output", "d": "copper tariffs"}, hwm=4)
+    assert [segment.path for segment in second.segments] == [None]
+    assert written.path.exists()
+    assert _ids(second, "gold mining output", top_k=1) == ["a"]
+    assert _ids(second, "oil output", top_k=1) == ["c"]
+    assert sorted(path.name for path in tmp_path.glob("seg-*")) == [written.path.name]
+
+    first.close()
+    third = LsmVectorIndex(PROVIDER, directory=str(tmp_path), background=False)
+    assert not third.read_only and len(third) == 2
+    third.close()
+
+
+def test_lsm_rejects_deletes_and_replacements(tmp_path):
+    index = LsmVectorIndex(PROVIDER, memtable_rows=2, background=False)
+    _append(index, {"a": "gold mining output", "b": "silver demand"})
+    with pytest.raises(ValueError, match="append-only"):
+        _append(index, {"a": "gold mining output revised"})
+    with pytest.raises(NotImplementedError):
+        index.delete(["a"])
+    assert len(index) == 2
+
+
+def test_lsm_reload_restores_segments_and_high_water_mark(tmp_path):
+    index = LsmVectorIndex(
+        PROVIDER, directory=str(tmp_path), memtable_rows=3, merge_factor=4, background=False
+    )
+    _append(index, {"a": "bond yields rise", "b": "equity rally", "c": "dollar slides"}, hwm=3)
+    _append(index, {"d": "crypto volatility"}, hwm=4)
+
+    reopened = LsmVectorIndex(PROVIDER, directory=str(tmp_path), background=False)
+    assert reopened.high_water_mark == 3  # "d" lived only in the memtable
+    assert len(reopened) == 3
+    assert _ids(reopened, "bond yields rise", top_k=1) == ["a"]
+    assert "d" not in _ids(reopened, "crypto volatility")
+
+
+def test_lsm_background_thread_flushes_sealed_segments(tmp_path):
+    index = LsmVectorIndex(PROVIDER, directory=str(tmp_path), memtable_rows=2, merge_factor=8)
+    try:
+        _append(index, {"a": "first", "b": "second"})
+        assert _ids(index, "first", top_k=1) == ["a"]  # searchable before the flush
+        deadline = time.monotonic() + 5.0
+        while index.segments[0].path is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert index.segments[0].path is not None
+        assert (tmp_path / "MANIFEST.json").exists()
+    finally:
+        index.close()
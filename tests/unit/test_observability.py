@@ -0,0 +1,30 @@
+from src.common.observability import StageTimer, current_stage_timer, time_stage
+
+
+def test_stage_timer_accumulates_only_while_active():
+    with time_stage("test.outside"):
+        pass
+    with StageTimer() as timer:
+        assert current_stage_timer() is timer
+        for _ in range(3):
+            with time_stage("test.page"):
+                pass
+        with time_stage("test.sort"):
+            pass
+    assert current_stage_timer() is None
+    with time_stage("test.after"):
+        pass
+    assert list(timer.durations) == ["test.page", "test.sort"]
+    assert all(ms >= 0 for ms in timer.milliseconds().values())
+    header = timer.server_timing()
+    assert header.startswith("test.page;dur=") and ", test.sort;dur=" in header
+
+
+def test_time_stage_records_when_the_block_raises():
+    with StageTimer() as timer:
+        try:
+            with time_stage("test.failing"):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+    assert "test.failing" in timer.durations
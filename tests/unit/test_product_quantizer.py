@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.rag.ann_benchmark import benchmark_pq
+from src.rag.embeddings import HashedDenseEmbeddingProvider
+from src.rag.filters import RetrievalFilters
+from src.rag.product_quantizer import ProductQuantizer, QuantizedVectorIndex
+
+
+def _unit_vectors(rows: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_product_quantizer_adc_matches_decoded_inner_products():
+    vectors = _unit_vectors(1200)
+    quantizer = ProductQuantizer.train(vectors, m=8, ksub=64)
+    assert (quantizer.m, quantizer.ksub, quantizer.dimension) == (8, 64, 32)
+    assert quantizer.compression_ratio == 16.0
+
+    codes = quantizer.encode(vectors)
+    assert codes.shape == (1200, 8) and codes.dtype == np.uint8
+    decoded = quantizer.decode(codes)
+    # Reconstruction is lossy but much closer than a random unit vector would be.
+    assert np.mean(np.sum((decoded - vectors) ** 2, axis=1)) < 0.5
+
+    query = vectors[3]
+    adc = quantizer.adc_scores(quantizer.lookup_table(query), np.ascontiguousarray(codes.T))
+    np.testing.assert_allclose(adc, decoded @ query, rtol=1e-4, atol=1e-5)
+
+
+def test_product_quantizer_rejects_uneven_subvectors():
+    with pytest.raises(ValueError):
+        ProductQuantizer.train(_unit_vectors(10, dim=30), m=8)
+
+
+def test_quantized_index_reranks_with_full_precision_vectors(tmp_path):
+    provider = HashedDenseEmbeddingProvider(dimension=64)
+    index = QuantizedVectorIndex(provider, m=16, rerank=50, scratch_dir=str(tmp_path))
+    texts = [f"filler note {i} about topic {i % 37}" for i in range(800)]
+    texts[123] = "semiconductor export controls tighten"
+    index.append(
+        [f"c{i}" for i in range(800)],
+        provider.embed_many(texts),
+        tickers=["NVDA" if i == 123 else "SPY" for i in range(800)],
+        sources=["news"] * 800,
+        published_ats=[datetime(2026, 5, 1)] * 800,
+    )
+    assert index.memory_bytes == 800 * 16
+    np.testing.assert_allclose(index.full_vectors[123], provider.embed(texts[123]))
+
+    query = provider.embed_many(["semiconductor export controls"])
+    hits = index.search_many(query, top_ks=[3])[0]
+    assert hits[0][0] == "c123"
+    assert hits[0][1] == pytest.approx(float(provider.embed(texts[123]) @ query[0]), rel=1e-5)
+    assert index.search_many(query, top_ks=[3], filters=RetrievalFilters(ticker="AMD")) == [[]]
+    assert [cid for cid, _ in index.search_many(query, top_ks=[2], rerank=0)[0]][0] == "c123"
+
+
+def test_benchmark_pq_reports_recall_by_code_size():
+    vectors = _unit_vectors(600)
+    points = benchmark_pq(vectors, vectors[:10], top_k=5, subvectors=(4, 16), reranks=(0, 50))
+    assert [(p.subvectors, p.rerank) for p in points] == [(4, 0), (4, 50), (16, 0), (16, 50)]
+    by_key = {(p.subvectors, p.rerank): p.recall_at_k for p in points}
+    assert by_key[(16, 50)] >= by_key[(16, 0)]
+    assert by_key[(4, 50)] >= by_key[(4, 0)]
@@ -2,14 +2,23 @@ from __future__ import annotations
 
 import uuid
 
+import httpx
+import pytest
+
 from src.common.db import SessionLocal
 from src.common.settings import get_settings
 from src.data_ingestion.pipelines.document_ingestion import ingest_documents
 from src.data_ingestion.schemas import IngestDocumentInput
+from src.rag.answer_cache import get_answer_cache
+from src.rag.answer_generation import OpenAIAnswerGenerator, SourceContext
 from src.rag.qa import answer_question
 
 
-def test_qa_default_provider_is_deterministic():
+def test_qa_default_provider_is_deterministic(monkeypatch):
+    def no_embedding():
+        raise AssertionError("deterministic answers must not embed the question")
+
+    monkeypatch.setattr("src.rag.qa.get_dense_provider", no_embedding)
     get_settings.cache_clear()
     source = f"qa-provider-{uuid.uuid4().hex[:8]}"
     with SessionLocal() as session:
@@ -32,6 +41,7 @@ def test_qa_default_provider_is_deterministic():
         )
     assert result.answer_provider == "deterministic"
     assert len(result.citations) >= 1
+    assert len(get_answer_cache()) == 0
 
 
 def test_qa_openai_provider_falls_back_without_key(monkeypatch):
@@ -61,3 +71,24 @@ def test_qa_openai_provider_falls_back_without_key(monkeypatch):
     assert result.answer_provider == "deterministic-fallback"
     assert len(result.citations) >= 1
     get_settings.cache_clear()
+
+
+def test_openai_generator_streams_and_completes_against_fake_server(fake_openai):
+    generator = OpenAIAnswerGenerator(
+        api_key="test-key", model="gpt-4o-mini", base_url=fake_openai.base_url, timeout_seconds=5
+    )
+    contexts = [
+        SourceContext(
+            chunk_id="c1", source="news", ticker="AAPL", published_at=None, excerpt="Margins up."
+        )
+    ]
+    assert generator.generate("Why?", contexts) == "Margins improved [chunk]."
+    assert list(generator.stream("Why?", contexts)) == ["Margins ", "improved ", "[chunk]."]
+    assert list(generator.stream("Why?", [])) == []
+
+    fake_openai.fail_after = 2
+    pieces = []
+    with pytest.raises(httpx.HTTPError):
+        for piece in generator.stream("Why?", contexts):
+            pieces.append(piece)
+    assert pieces == ["Margins ", "improved "]
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from src.rag.reranker import Reranker, RerankWeights, phrase_score, proximity_score
+from src.rag.retrieval import RetrievedChunk
+
+NOW = datetime(2026, 3, 1)
+
+
+def _chunk(chunk_id: str, content: str, score: float, **kwargs) -> RetrievedChunk:
+    fields = {"document_id": 1, "source": "news", "ticker": None, "published_at": None}
+    return RetrievedChunk(chunk_id=chunk_id, content=content, score=score, **{**fields, **kwargs})
+
+
+def test_proximity_and_phrase_reward_adjacent_terms():
+    query = ["gross", "margin", "guidance"]
+    tight = "management raised gross margin guidance for the year".split()
+    loose = "gross sales rose while the margin outlook and later guidance slipped".split()
+    assert proximity_score(query, tight) == 1.0
+    assert 0.0 < proximity_score(query, loose) < proximity_score(query, tight)
+    assert proximity_score(query, ["unrelated", "words"]) == 0.0
+    assert phrase_score(query, tight) == 1.0
+    assert phrase_score(query, loose) == 0.0
+
+
+def test_rerank_prefers_phrase_recency_and_ticker_matches():
+    candidates = [
+        _chunk("spread", "margin pressure eased while gross bookings improved", 1.0),
+        _chunk("phrase", "gross margin improved on pricing", 0.9),
+        _chunk(
+            "fresh-ticker",
+            "gross margin improved on pricing",
+            0.9,
+            ticker="AMD",
+            published_at=NOW - timedelta(days=1),
+        ),
+    ]
+    outcome = Reranker().rerank(
+        "Did AMD gross margin improve?", candidates, top_k=3, now=NOW
+    )
+    assert [chunk.chunk_id for chunk in outcome.chunks] == ["fresh-ticker", "phrase", "spread"]
+    assert not outcome.budget_exhausted
+    assert all(0.0 <= chunk.score <= 1.0 for chunk in outcome.chunks)
+
+
+def test_rerank_stops_at_deadline_and_keeps_first_stage_order_for_the_rest():
+    ticks = iter(range(100))
+    reranker = Reranker(weights=RerankWeights(first_stage=0.0), clock=lambda: next(ticks))
+    candidates = [_chunk(f"c{i}", f"filler text number {i}", 1.0 - i / 10) for i in range(6)]
+    candidates[1] = _chunk("c1", "cloud demand accelerated", 0.9)
+
+    # The clock passes the deadline after two candidates have been rescored.
+    outcome = reranker.rerank("cloud demand", candidates, top_k=4, deadline=1)
+    assert (outcome.reranked, outcome.candidates) == (2, 6)
+    assert outcome.budget_exhausted
+    assert [chunk.chunk_id for chunk in outcome.chunks] == ["c1", "c0", "c2", "c3"]
+    assert outcome.chunks[2].score == candidates[2].score
@@ -0,0 +1,52 @@
+from itertools import islice
+
+from src.common.db import SessionLocal
+from src.data_ingestion.pipelines.document_ingestion import ingest_documents
+from src.rag.retrieval_benchmark import (
+    SOURCES,
+    TICKERS,
+    _with_ties,
+    exact_rankings,
+    measure_provider,
+    synthetic_documents,
+    synthetic_queries,
+)
+
+
+def test_synthetic_corpus_is_seeded_and_finance_shaped():
+    first = list(islice(synthetic_documents(7), 200))
+    assert first == list(islice(synthetic_documents(7), 200))
+    assert first != list(islice(synthetic_documents(8), 200))
+    assert {doc.source for doc in first} == set(SOURCES)
+    assert {doc.ticker for doc in first} <= set(TICKERS)
+    # Popular tickers dominate, as in real news flow.
+    tickers = [doc.ticker for doc in first]
+    assert tickers.count(TICKERS[0]) > tickers.count(TICKERS[-1])
+    assert all(2023 <= doc.published_at.year <= 2025 for doc in first)
+    news = [len(doc.content) for doc in first if doc.source == "news"]
+    filings = [len(doc.content) for doc in first if doc.source == "filings"]
+    assert max(news) < min(filings)
+    assert synthetic_queries(20, 7) == synthetic_queries(20, 7)
+
+
+def test_ties_at_the_cutoff_all_count_as_exact():
+    scored = [("a", 0.9), ("b", 0.5), ("c", 0.5), ("d", 0.5), ("e", 0.1)]
+    assert _with_ties(scored, 2) == ["a", "b", "c", "d"]
+    assert _with_ties(scored[:1], 2) == ["a"]
+
+
+def test_exact_index_has_full_recall(monkeypatch):
+    # measure_provider sets these for its run; monkeypatch puts them back afterwards.
+    monkeypatch.setenv("RETRIEVAL_PROVIDER", "bm25")
+    monkeypatch.setenv("DENSE_EMBEDDING_PROVIDER", "hashed-dense")
+    monkeypatch.setenv("RETRIEVAL_CACHE_MAX_ENTRIES", "0")
+    with SessionLocal() as session:
+        ingest_documents(session, list(islice(synthetic_documents(3), 30)))
+    queries = synthetic_queries(10, 3)
+    truth = exact_rankings("bm25", "hashed-dense", queries, 5)
+    point = measure_provider("bm25", "hashed-dense", queries, 5, truth)
+
+    assert point.provider == "bm25" and point.queries == 10
+    assert point.recall_at_k == 1.0
+    assert point.qps > 0 and 0 < point.p50_ms <= point.p99_ms
+    assert point.peak_rss_mb > 0
@@ -0,0 +1,36 @@
+import time
+
+from src.rag.retrieval import RetrievalCache
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RetrievalCache("unit-lru", max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cache_expires_entries_after_ttl():
+    cache = RetrievalCache("unit-ttl", max_entries=4, ttl_seconds=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_drops_entries_when_generation_changes():
+    cache = RetrievalCache("unit-generation", max_entries=4, ttl_seconds=60)
+    cache.put("a", 1, generation=3)
+    assert cache.get("a", generation=3) == 1
+    assert cache.get("a", generation=4) is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = RetrievalCache("unit-disabled", max_entries=0, ttl_seconds=60)
+    cache.put("a", 1)
+    assert cache.get("a") is None
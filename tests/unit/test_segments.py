@@ -0,0 +1,79 @@
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+from src.rag.filters import RetrievalFilters
+from src.rag.segments import SegmentedIndex
+from src.rag.sparse_codec import PackedSparseVector
+from src.rag.sparse_matrix import SparseScoringMatrix
+
+
+def _chunk(row_id, chunk_id, ticker, source, published_at):
+    return SimpleNamespace(
+        id=row_id, chunk_id=chunk_id, ticker=ticker, source=source, published_at=published_at
+    )
+
+
+def _build(segment_rows: int = 50_000) -> tuple[SegmentedIndex, SparseScoringMatrix]:
+    chunks = [
+        _chunk(1, "jan-aapl", "AAPL", "news", datetime(2026, 1, 10)),
+        _chunk(2, "jan-msft", "MSFT", "filing", datetime(2026, 1, 20)),
+        _chunk(3, "feb-aapl", "AAPL", "news", datetime(2026, 2, 5)),
+        _chunk(4, "mar-msft", "MSFT", "news", datetime(2026, 3, 15)),
+        _chunk(5, "undated", "AAPL", "news", None),
+    ]
+    matrix = SparseScoringMatrix()
+    matrix.append(
+        [c.chunk_id for c in chunks],
+        [PackedSparseVector.from_pairs([1], [1.0]) for _ in chunks],
+    )
+    index = SegmentedIndex(segment_rows=segment_rows)
+    index._add_rows(chunks[:3], matrix)
+    index._add_rows(chunks[3:], matrix)
+    return index, matrix
+
+
+def _chunk_ids(index: SegmentedIndex, matrix: SparseScoringMatrix, filters: RetrievalFilters):
+    rows, stats = index.candidate_rows(filters)
+    return sorted(matrix.chunk_ids[row] for row in rows), stats
+
+
+def test_segments_are_monthly_with_time_bounds():
+    index, _ = _build()
+    assert [s.key for s in index.segments] == ["2026-01", "2026-02", "2026-03", "undated"]
+    january = index.segments[0]
+    assert january.min_published_at == datetime(2026, 1, 10)
+    assert january.max_published_at == datetime(2026, 1, 20)
+    assert set(january.ticker_bitmaps) == {"AAPL", "MSFT"}
+
+
+def test_date_window_prunes_non_overlapping_segments():
+    index, matrix = _build()
+    filters = RetrievalFilters(
+        date_from=datetime(2026, 2, 1, tzinfo=UTC), date_to=datetime(2026, 2, 28)
+    )
+    chunk_ids, stats = _chunk_ids(index, matrix, filters)
+    assert chunk_ids == ["feb-aapl"]
+    assert stats.segments_total == 4
+    assert stats.segments_opened == 1
+    assert stats.segments_pruned == 3
+
+
+def test_ticker_and_source_bitmaps_select_rows():
+    index, matrix = _build()
+    chunk_ids, stats = _chunk_ids(index, matrix, RetrievalFilters(ticker="MSFT"))
+    assert chunk_ids == ["jan-msft", "mar-msft"]
+    assert stats.segments_opened == 2
+
+    chunk_ids, _ = _chunk_ids(index, matrix, RetrievalFilters(ticker="AAPL", source="news"))
+    assert chunk_ids == ["feb-aapl", "jan-aapl", "undated"]
+
+
+def test_small_segments_are_replaced_by_merged_copies_up_to_the_limit():
+    index, matrix = _build(segment_rows=2)
+    extra = _chunk(6, "jan-late", "NVDA", "news", datetime(2026, 1, 30))
+    matrix.append([extra.chunk_id], [PackedSparseVector.from_pairs([1], [1.0])])
+    first_january = index.segments[0]
+    index._add_rows([extra], matrix)
+    assert [s.key for s in index.segments].count("2026-01") == 2
+    assert index.segments[0] is first_january
+    assert len(first_january) == 2
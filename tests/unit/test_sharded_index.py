@@ -0,0 +1,81 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from src.rag.filters import RetrievalFilters
+from src.rag.inverted_index import InvertedIndex
+from src.rag.sharded_index import ShardedIndex, shard_for_ticker
+
+VOCAB = [
+    "revenue", "margin", "guidance", "cloud", "demand", "growth", "chip", "supply",
+    "inventory", "dividend", "buyback", "outlook", "pricing", "capex", "subscriber",
+]
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMD", "XOM", None]
+
+
+def _rows(count: int = 300):
+    rng = random.Random(11)
+    return [
+        (
+            f"chunk-{idx}",
+            " ".join(rng.choice(VOCAB) for _ in range(rng.randint(5, 40))),
+            TICKERS[idx % len(TICKERS)],
+            "news",
+            datetime(2026, 1 + idx % 12, 1),
+        )
+        for idx in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def indexes():
+    rows = _rows()
+    single = InvertedIndex()
+    for chunk_id, content, ticker, source, published_at in rows:
+        single.add(chunk_id, content, ticker=ticker, source=source, published_at=published_at)
+    sharded = ShardedIndex(3)
+    try:
+        assert sharded.add_rows(rows[:200]) + sharded.add_rows(rows[200:]) == len(rows)
+        # Re-adding known chunks is a no-op, as in a single index.
+        assert sharded.add_rows(rows[:10]) == 0
+        yield single, sharded
+    finally:
+        sharded.close()
+
+
+def _assert_same_hits(sharded_hits, single, query, top_k, filters=None):
+    everything = dict(single.search_exhaustive(query, top_k=10_000, filters=filters))
+    expected = single.search(query, top_k=top_k, filters=filters)
+    assert len(sharded_hits) == len(expected)
+    # Equal scores may tie-break differently across shards, so compare scores per id.
+    for (chunk_id, score), (_, expected_score) in zip(sharded_hits, expected, strict=True):
+        assert score == pytest.approx(expected_score)
+        assert everything[chunk_id] == pytest.approx(score)
+
+
+def test_sharded_scores_match_single_index(indexes):
+    single, sharded = indexes
+    assert len(sharded) == len(single)
+    assert sharded.corpus.total_length == round(single.avg_doc_len * len(single))
+    queries = ["cloud demand growth", "dividend buyback outlook pricing", "capex", "unknown"]
+    results = sharded.search_many(queries, top_ks=[10, 5, 20, 3])
+    for query, top_k, hits in zip(queries, [10, 5, 20, 3], results, strict=True):
+        _assert_same_hits(hits, single, query, top_k)
+
+
+def test_ticker_filter_visits_one_shard(indexes):
+    single, sharded = indexes
+    filters = RetrievalFilters(ticker="NVDA", date_from=datetime(2026, 4, 1))
+    assert sharded.shards_for(filters) == [shard_for_ticker("NVDA", 3)]
+    assert sharded.shards_for(RetrievalFilters(source="news")) == [0, 1, 2]
+    [hits] = sharded.search_many(["supply chip inventory"], top_ks=[8], filters=filters)
+    assert hits
+    _assert_same_hits(hits, single, "supply chip inventory", 8, filters)
+
+
+def test_shard_assignment_is_stable():
+    assert shard_for_ticker("AAPL", 4) == shard_for_ticker("AAPL", 4)
+    assert {shard_for_ticker(ticker, 4) for ticker in TICKERS} <= {0, 1, 2, 3}
+    with pytest.raises(ValueError):
+        ShardedIndex(0)
@@ -0,0 +1,83 @@
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.rag.filters import RetrievalFilters
+from src.rag.inverted_index import InvertedIndex
+from src.rag.snapshot import SnapshotError, read_snapshot, write_snapshot
+from src.rag.sparse_codec import PackedSparseVector
+from src.rag.sparse_matrix import SparseScoringMatrix
+
+VOCAB = ["revenue", "margin", "guidance", "cloud", "demand", "growth", "chip", "supply"]
+
+
+def _build(doc_count: int = 200) -> tuple[SparseScoringMatrix, InvertedIndex]:
+    rng = random.Random(5)
+    index = InvertedIndex(k1=1.5, b=0.6)
+    matrix = SparseScoringMatrix()
+    for idx in range(doc_count):
+        index.add(
+            f"chunk-{idx}",
+            " ".join(rng.choice(VOCAB) for _ in range(rng.randint(3, 30))),
+            ticker=None if idx % 5 == 0 else ("AAPL" if idx % 2 else "MSFT"),
+            source="news",
+            published_at=None if idx % 7 == 0 else datetime(2026, 1 + idx % 12, 3, 9, 30),
+        )
+        ids = rng.sample(range(1, 80), rng.randint(1, 10))
+        matrix.append([f"chunk-{idx}"], [PackedSparseVector.from_pairs(ids, [1.0] * len(ids))])
+    index.high_water_mark = doc_count
+    matrix.high_water_mark = doc_count
+    matrix.last_chunk_id = f"chunk-{doc_count - 1}"
+    return matrix, index
+
+
+def test_snapshot_round_trip_preserves_rankings(tmp_path):
+    matrix, index = _build()
+    path = tmp_path / "index.snap"
+    assert write_snapshot(path, matrix, index) == path.stat().st_size
+
+    snapshot = read_snapshot(path)
+    restored = snapshot.inverted_index
+    assert (restored.k1, restored.b, restored.high_water_mark) == (1.5, 0.6, 200)
+    assert restored.avg_doc_len == index.avg_doc_len
+    filters = RetrievalFilters(ticker="AAPL", date_from=datetime(2026, 4, 1))
+    for query in ["cloud demand", "chip supply growth margin"]:
+        assert restored.search(query, top_k=10) == index.search(query, top_k=10)
+        assert restored.search(query, top_k=10, filters=filters) == index.search(
+            query, top_k=10, filters=filters
+        )
+
+    query = PackedSparseVector.from_pairs([3, 17, 40], [1.0, 0.5, 2.0])
+    assert snapshot.matrix.chunk_ids == matrix.chunk_ids
+    assert snapshot.matrix.last_chunk_id == "chunk-199"
+    assert np.array_equal(snapshot.matrix.score(query), matrix.score(query))
+
+    # Restored indexes keep accepting appends (and keep their statistics in step).
+    for target in (restored, index):
+        target.add("chunk-new", "cloud cloud cloud demand", ticker="NVDA")
+    assert restored.search("cloud demand", top_k=5) == index.search("cloud demand", top_k=5)
+
+
+def test_snapshot_rejects_corruption(tmp_path):
+    matrix, index = _build(20)
+    path = tmp_path / "index.snap"
+    write_snapshot(path, matrix, index)
+    raw = bytearray(path.read_bytes())
+
+    raw[-10] ^= 0xFF
+    path.write_bytes(bytes(raw))
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_snapshot(path)
+
+    path.write_bytes(bytes(raw[:-10]))
+    with pytest.raises(SnapshotError, match="expected"):
+        read_snapshot(path)
+
+    path.write_bytes(b"not a snapshot" * 8)
+    with pytest.raises(SnapshotError, match="format"):
+        read_snapshot(path)
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(tmp_path / "missing.snap")
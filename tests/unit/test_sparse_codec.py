@@ -0,0 +1,25 @@
+import numpy as np
+
+from src.rag.embeddings import cosine_similarity_sparse
+from src.rag.sparse_codec import PackedSparseVector, cosine_similarity_packed
+
+
+def test_packed_vector_round_trips_through_bytes():
+    vector = PackedSparseVector.from_pairs([42, 7, 19], [0.5, 0.25, 0.25])
+    blob = vector.to_bytes()
+    assert len(blob) == 3 * 8
+    decoded = PackedSparseVector.from_bytes(blob)
+    assert decoded.term_ids.tolist() == [7, 19, 42]
+    assert np.allclose(decoded.weights, [0.25, 0.25, 0.5])
+    assert abs(decoded.norm - vector.norm) < 1e-9
+
+
+def test_packed_cosine_matches_dict_cosine():
+    a = {"revenue": 0.5, "margin": 0.25, "guidance": 0.25}
+    b = {"margin": 0.4, "guidance": 0.2, "cloud": 0.4}
+    ids = {"revenue": 1, "margin": 2, "guidance": 3, "cloud": 4}
+    packed_a = PackedSparseVector.from_pairs([ids[t] for t in a], list(a.values()))
+    packed_b = PackedSparseVector.from_pairs([ids[t] for t in b], list(b.values()))
+    expected = cosine_similarity_sparse(a, b)
+    assert abs(cosine_similarity_packed(packed_a, packed_b) - expected) < 1e-6
+    assert cosine_similarity_packed(packed_a, None) == 0.0
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from src.rag.sparse_codec import PackedSparseVector, cosine_similarity_packed
+from src.rag.sparse_matrix import SparseScoringMatrix, top_k_indices
+
+
+def _random_vector(rng: random.Random) -> PackedSparseVector:
+    ids = rng.sample(range(1, 60), rng.randint(1, 12))
+    return PackedSparseVector.from_pairs(ids, [rng.random() for _ in ids])
+
+
+def test_matrix_scores_match_pairwise_cosine():
+    rng = random.Random(3)
+    vectors = [_random_vector(rng) for _ in range(50)]
+    matrix = SparseScoringMatrix()
+    matrix.append([f"c{i}" for i in range(30)], vectors[:30])
+    matrix.append([f"c{i}" for i in range(30, 50)], vectors[30:])
+    query = _random_vector(rng)
+
+    expected = np.array([cosine_similarity_packed(query, v) for v in vectors])
+    assert np.allclose(matrix.score(query), expected, atol=1e-6)
+
+    rows = matrix.rows_for(["c7", "missing", "c42", "c0"])
+    assert rows.tolist() == [7, -1, 42, 0]
+    subset = matrix.score(query, rows)
+    assert np.allclose(subset, [expected[7], 0.0, expected[42], expected[0]], atol=1e-6)
+
+
+def test_score_many_matches_single_query_scoring():
+    rng = random.Random(11)
+    matrix = SparseScoringMatrix()
+    matrix.append([f"c{i}" for i in range(40)], [_random_vector(rng) for _ in range(40)])
+    queries = [_random_vector(rng) for _ in range(6)]
+    rows = matrix.rows_for(["c3", "c39", "missing", "c10", "c3"])
+    block = matrix.score_many(queries, rows)
+    assert block.shape == (6, 5)
+    for qi, query in enumerate(queries):
+        assert np.allclose(block[qi], matrix.score(query, rows), atol=1e-6)
+
+
+def test_search_returns_best_rows_within_mask():
+    matrix = SparseScoringMatrix()
+    matrix.append(
+        ["a", "b", "c"],
+        [
+            PackedSparseVector.from_pairs([1, 2], [1.0, 1.0]),
+            PackedSparseVector.from_pairs([1], [1.0]),
+            PackedSparseVector.from_pairs([3], [1.0]),
+        ],
+    )
+    query = PackedSparseVector.from_pairs([1], [1.0])
+    assert [cid for cid, _ in matrix.search(query, top_k=5)] == ["b", "a"]
+    mask = np.array([True, False, True])
+    assert [cid for cid, _ in matrix.search(query, top_k=5, mask=mask)] == ["a"]
+
+
+def test_top_k_indices_orders_best_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+    assert top_k_indices(scores, 2).tolist() == [1, 3]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 0]
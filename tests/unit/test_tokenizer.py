@@ -0,0 +1,62 @@
+import re
+
+from src.rag.tokenizer import Tokenizer, get_tokenizer, term_counts_many, tokenize
+
+TEXTS = [
+    "Apple (AAPL) raised FY2025 guidance; revenue up 12% y/y.",
+    "Café résumé naïve — Zürich-based ETF ÄÖÜ flows",
+    "a an the of to in Q3 EPS $1.25 beat",
+    "",
+    "snake_case and-hyphen dot.separated MiXeD",
+]
+
+
+def test_alnum_tokenizer_matches_legacy_regex() -> None:
+    for text in TEXTS:
+        assert tokenize(text) == re.findall(r"[a-zA-Z0-9]{3,}", text.lower())
+
+
+def test_alpha_tokenizer_matches_letters_only_regex() -> None:
+    tokenizer = get_tokenizer("alpha")
+    for text in TEXTS:
+        assert tokenizer.tokenize(text) == re.findall(r"[a-zA-Z]{3,}", text.lower())
+
+
+def test_term_counts_and_batches() -> None:
+    counts = term_counts_many(["beat beat miss", "guidance"])
+    assert counts == [{"beat": 2, "miss": 1}, {"guidance": 1}]
+    tokenizer = Tokenizer()
+    assert tokenizer.tokenize_many(TEXTS) == [tokenizer.tokenize(text) for text in TEXTS]
+
+
+def test_short_strings_are_cached_and_long_ones_are_not() -> None:
+    tokenizer = Tokenizer(cache_max_chars=16)
+    tokenizer.tokenize("revenue guidance")
+    first = tokenizer.tokenize("revenue guidance")
+    first.append("mutated")
+    assert tokenizer.tokenize("revenue guidance") == ["revenue", "guidance"]
+    assert tokenizer.cache_info().hits == 2
+    tokenizer.tokenize("a much longer piece of filing text")
+    assert tokenizer.cache_info().currsize == 1
+
+
+def test_intern_assigns_stable_dense_ids() -> None:
+    tokenizer = Tokenizer()
+    ids = tokenizer.intern(["beat", "miss", "beat"])
+    assert ids.tolist() == [0, 1, 0]
+    assert tokenizer.intern(["miss", "guidance"]).tolist() == [1, 2]
+    assert tokenizer.term(2) == "guidance"
+    assert tokenizer.vocabulary_size == 3
+    [query_ids] = tokenizer.term_ids_many(["beat guidance"])
+    assert query_ids.tolist() == [0, 2]
+
+
+def test_full_intern_table_starts_over_for_the_next_batch() -> None:
+    tokenizer = Tokenizer(max_terms=4)
+    tokenizer.intern(["beat", "miss", "guidance"])
+    first, second = tokenizer.term_ids_many(["revenue beat", "margin miss"])
+    assert tokenizer.resets == 1
+    assert tokenizer.vocabulary_size == 4
+    # Ids within the batch stay consistent and dense.
+    assert sorted([*first.tolist(), *second.tolist()]) == [0, 1, 2, 3]
+    assert [tokenizer.term(int(term_id)) for term_id in second] == ["margin", "miss"]
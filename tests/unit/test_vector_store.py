@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.rag.dense_index import DenseVectorIndex
+from src.rag.embeddings import HashedDenseEmbeddingProvider
+from src.rag.filters import ChunkAttributes, RetrievalFilters
+from src.rag.vector_store import MemmapVectorStore
+
+
+def _attributes(rows: int, ticker: str = "AAPL") -> ChunkAttributes:
+    attributes = ChunkAttributes()
+    attributes.append([ticker] * rows, ["news"] * rows, [datetime(2026, 4, 1)] * rows)
+    return attributes
+
+
+def test_publish_swaps_current_pointer_and_prunes(tmp_path):
+    store = MemmapVectorStore(tmp_path / "store", keep_versions=2)
+    assert store.open() is None
+
+    vectors = np.eye(4, dtype=np.float32)
+    first = store.publish(
+        ["a", "b", "c", "d"], vectors, _attributes(4), model_name="m", high_water_mark=4
+    )
+    snapshot = store.open()
+    assert snapshot.version == first
+    assert isinstance(snapshot.vectors, np.memmap)
+    assert not snapshot.vectors.flags.writeable
+    np.testing.assert_array_equal(snapshot.vectors, vectors)
+    assert snapshot.chunk_ids == ["a", "b", "c", "d"]
+    assert snapshot.high_water_mark == 4
+    assert snapshot.attributes.mask(RetrievalFilters(ticker="AAPL")).all()
+
+    second = store.publish(["a"], vectors[:1], _attributes(1), model_name="m", high_water_mark=1)
+    third = store.publish(["b"], vectors[1:2], _attributes(1), model_name="m", high_water_mark=2)
+    assert store.current_version() == third
+    assert store.versions() == [second, third]
+    # A reader that mapped a pruned version keeps working off the unlinked file.
+    np.testing.assert_array_equal(snapshot.vectors, vectors)
+    assert not list(store.root.glob(".*"))
+
+
+def test_publish_writes_row_blocks_and_open_survives_a_concurrent_prune(tmp_path):
+    store = MemmapVectorStore(tmp_path, keep_versions=1)
+    vectors = np.eye(4, dtype=np.float32)
+    first = store.publish(
+        ["a", "b", "c", "d"],
+        [vectors[:3], vectors[3:]],
+        _attributes(4),
+        model_name="m",
+        high_water_mark=4,
+    )
+    np.testing.assert_array_equal(store.open(first).vectors, vectors)
+
+    second = store.publish(["a"], vectors[:1], _attributes(1), model_name="m", high_water_mark=1)
+    # A reader that saw `first` as current only gets to map it after it was pruned.
+    assert store.versions() == [second]
+    snapshot = store.open(first)
+    assert snapshot is not None and snapshot.version == second
+
+
+def test_publish_rejects_mismatched_rows(tmp_path):
+    store = MemmapVectorStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.publish(
+            ["a"], np.zeros((2, 4), np.float32), _attributes(2), model_name="m", high_water_mark=0
+        )
+
+
+def test_dense_index_searches_snapshot_and_newer_rows(tmp_path):
+    provider = HashedDenseEmbeddingProvider(dimension=64)
+    store = MemmapVectorStore(tmp_path)
+    base_texts = ["copper mine output", "lithium price slump"]
+    store.publish(
+        ["c1", "c2"],
+        provider.embed_many(base_texts),
+        _attributes(2, ticker="FCX"),
+        model_name=provider.model_name,
+        high_water_mark=2,
+    )
+    index = DenseVectorIndex(provider, base=store.open())
+    index.append(
+        ["c3"],
+        provider.embed_many(["copper smelter output"]),
+        tickers=["SCCO"],
+        sources=["news"],
+        published_ats=[None],
+    )
+    assert len(index) == 3
+    assert index.vectors.shape == (3, 64)
+    np.testing.assert_array_equal(index.vectors_from(2)[0], provider.embed("copper smelter output"))
+
+    query = provider.embed("copper output")
+    assert {cid for cid, _ in index.search(query, top_k=2)} == {"c1", "c3"}
+    assert [cid for cid, _ in index.search(query, filters=RetrievalFilters(ticker="SCCO"))] == [
+        "c3"
+    ]
@@ -0,0 +1,40 @@
+import uuid
+
+from src.common.db import SessionLocal
+from src.core.models import EmbeddingVocabulary
+from src.rag.vocabulary import MAX_TERM_LENGTH, Vocabulary, stored_term
+
+
+def test_terms_registered_by_another_writer_do_not_drop_the_rest(monkeypatch):
+    prefix = uuid.uuid4().hex[:8]
+    terms = [f"{prefix}alpha", f"{prefix}beta", f"{prefix}gamma"]
+    with SessionLocal() as other:
+        other.add(EmbeddingVocabulary(term=terms[1]))
+        other.commit()
+
+    vocabulary = Vocabulary()
+    select = vocabulary._select
+    calls = []
+
+    def stale_first_read(session, wanted):
+        # The other writer commits between our lookup and our insert.
+        calls.append(wanted)
+        return {} if len(calls) == 1 else select(session, wanted)
+
+    monkeypatch.setattr(vocabulary, "_select", stale_first_read)
+    with SessionLocal() as session:
+        ids = vocabulary.get_or_create(session, terms)
+        session.commit()
+    assert sorted(ids) == sorted(terms)
+    assert len(set(ids.values())) == 3
+
+
+def test_long_terms_fit_the_column_and_stay_distinct():
+    base = uuid.uuid4().hex * 8
+    long_terms = [base + "a", base + "b"]
+    assert all(len(stored_term(term)) <= MAX_TERM_LENGTH for term in long_terms)
+    with SessionLocal() as session:
+        ids = Vocabulary().get_or_create(session, long_terms)
+        session.commit()
+        assert Vocabulary().lookup(session, long_terms) == ids
+    assert len(set(ids.values())) == 2